@@ -0,0 +1,321 @@
+from .base_model import BaseModel
+from .rag_history_model import RAGHistoryModel
+import json
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+_NON_WORD_RE = re.compile(r"[^\w\s]+", re.UNICODE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalise_question(question: str) -> str:
+    """Lower-cased words of a question, punctuation and extra spaces removed."""
+    return _SPACE_RE.sub(" ", _NON_WORD_RE.sub(" ", (question or "").lower())).strip()
+
+
+def cache_scope(rbac_namespaces: Iterable[str] = None) -> str:
+    """Cache partition for a namespace selection; answers never cross scopes."""
+    return "*" if rbac_namespaces is None else ",".join(sorted(set(rbac_namespaces)))
+
+
+class AnswerCache(BaseModel):
+    """
+    Semantic cache of RAG answers, in answer_cache.
+
+    A lookup first tries the normalised question text. It then tries the
+    cached question embeddings of the same scope, accepting the most similar
+    one at cosine >= `threshold`. Entries expire after `ttl_seconds`. Beyond
+    `max_entries` the least recently used ones are evicted. answer_cache_sources
+    maps every entry to the documents its answer was built from, so
+    re-ingesting a document drops the answers that cited it. Entries whose
+    sources are unknown (an API that does not report them) are dropped by
+    invalidate_unsourced() whenever any document is added.
+    """
+
+    table = 'answer_cache'
+    fields = [
+        'cache_id', 'scope', 'question_key', 'question', 'answer', 'sources_json',
+        'embedding', 'embedding_model', 'hits', 'created_at', 'last_used_at', 'expires_at'
+    ]
+    primary_key = 'cache_id'
+
+    schema = [
+        """
+        CREATE TABLE IF NOT EXISTS answer_cache (
+            cache_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scope TEXT NOT NULL,
+            question_key TEXT NOT NULL,
+            question TEXT,
+            answer TEXT NOT NULL,
+            sources_json TEXT,
+            embedding BLOB,
+            embedding_model TEXT,
+            hits INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT,
+            last_used_at TEXT,
+            expires_at TEXT,
+            UNIQUE (scope, question_key)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_answer_cache_semantic ON answer_cache (scope, embedding_model, expires_at)",
+        "CREATE INDEX IF NOT EXISTS idx_answer_cache_lru ON answer_cache (last_used_at)",
+        """
+        CREATE TABLE IF NOT EXISTS answer_cache_sources (
+            doc_id TEXT NOT NULL,
+            cache_id INTEGER NOT NULL,
+            PRIMARY KEY (doc_id, cache_id)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_answer_cache_sources_entry ON answer_cache_sources (cache_id)",
+    ]
+
+    def __init__(self, conn=None, threshold: float = 0.92, ttl_seconds: int = 3600,
+                 max_entries: int = 1000, history: RAGHistoryModel = None,
+                 agent_id: str = "answer_cache"):
+        super().__init__(conn)
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.agent_id = agent_id
+        self.history = history or RAGHistoryModel(None if self._pooled else self.conn)
+
+    def ensure_schema(self) -> None:
+        if not self.columns():
+            self.apply_migration(self.schema)
+
+    # --- Lookup ---
+
+    def lookup(self, question: str, vector=None, embedding_model: str = None,
+               rbac_namespaces: Iterable[str] = None, log: bool = True,
+               user_id: str = None, session_id: str = None) -> Optional[Dict]:
+        """
+        Cached answer for `question` in the scope of `rbac_namespaces`, or None.
+        Pass the question's embedding (`vector`, from `embedding_model`) to
+        enable near matches. A hit is returned as {"cache_id", "answer",
+        "sources", "match" ('exact' | 'semantic'), "similarity"}. Hits and
+        misses are logged as QUERY events when `log` is set; a caller that logs
+        the whole request itself passes log=False and folds in metrics().
+        """
+        started = time.perf_counter()
+        hit = None
+        try:
+            self.ensure_schema()
+            scope = cache_scope(rbac_namespaces)
+            now_iso = datetime.now().isoformat()
+
+            row = self.conn.execute(f"""
+                SELECT cache_id, answer, sources_json FROM {self.table}
+                WHERE scope = ? AND question_key = ? AND expires_at > ?
+            """, (scope, normalise_question(question), now_iso)).fetchone()
+            if row is not None:
+                hit = {"cache_id": row[0], "answer": row[1], "sources": _loads(row[2]),
+                       "match": "exact", "similarity": 1.0}
+            elif vector is not None and embedding_model:
+                hit = self._nearest(scope, np.asarray(vector, dtype=np.float32), embedding_model, now_iso)
+
+            if hit is not None:
+                self._execute_write(f"""
+                    UPDATE {self.table} SET hits = hits + 1, last_used_at = ?
+                    WHERE cache_id = ?
+                """, (now_iso, hit["cache_id"]))
+
+        except Exception as e:
+            print(f"Error looking up answer cache: {e}")
+            hit = None
+
+        if log:
+            self._log(question, hit, (time.perf_counter() - started) * 1000, rbac_namespaces, user_id, session_id)
+        return hit
+
+    def _nearest(self, scope: str, vector: np.ndarray, embedding_model: str, now_iso: str) -> Optional[Dict]:
+        rows = self.conn.execute(f"""
+            SELECT cache_id, embedding FROM {self.table}
+            WHERE scope = ? AND embedding_model = ? AND expires_at > ? AND embedding IS NOT NULL
+        """, (scope, embedding_model, now_iso)).fetchall()
+        rows = [row for row in rows if len(row[1]) == vector.nbytes]
+        if not rows:
+            return None
+
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        matrix = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+        # Stored embeddings are already unit length
+        scores = matrix @ (vector / norm)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+
+        row = self.conn.execute(
+            f"SELECT cache_id, answer, sources_json FROM {self.table} WHERE cache_id = ?", (rows[best][0],)
+        ).fetchone()
+        return {"cache_id": row[0], "answer": row[1], "sources": _loads(row[2]),
+                "match": "semantic", "similarity": float(scores[best])}
+
+    # --- Writes ---
+
+    def put(self, question: str, answer: str, sources: Sequence[Dict] = (), vector=None,
+            embedding_model: str = None, rbac_namespaces: Iterable[str] = None) -> Optional[int]:
+        """
+        Cache `answer` for `question`. `sources` are the retrieved chunks
+        ({"chunk_id", "doc_id", ...}), kept without their text; their doc_ids
+        drive invalidation. Returns the cache_id.
+        """
+        try:
+            self.ensure_schema()
+            now = datetime.now()
+            now_iso = now.isoformat()
+            expires_iso = (now + timedelta(seconds=self.ttl_seconds)).isoformat()
+            embedding = None
+            if vector is not None:
+                vector = np.asarray(vector, dtype=np.float32).ravel()
+                norm = np.linalg.norm(vector)
+                embedding = (vector / norm).tobytes() if norm else None
+            sources = [{k: v for k, v in s.items() if k != "chunk_text"} for s in sources]
+            doc_ids = sorted({s["doc_id"] for s in sources if s.get("doc_id")})
+
+            def work(conn):
+                conn.execute(f"""
+                    INSERT INTO {self.table} (scope, question_key, question, answer, sources_json, embedding,
+                                              embedding_model, hits, created_at, last_used_at, expires_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?, ?, ?)
+                    ON CONFLICT (scope, question_key) DO UPDATE SET
+                        question = excluded.question,
+                        answer = excluded.answer,
+                        sources_json = excluded.sources_json,
+                        embedding = excluded.embedding,
+                        embedding_model = excluded.embedding_model,
+                        created_at = excluded.created_at,
+                        last_used_at = excluded.last_used_at,
+                        expires_at = excluded.expires_at
+                """, (cache_scope(rbac_namespaces), normalise_question(question), question, answer,
+                      json.dumps(sources), embedding, embedding_model if embedding else None,
+                      now_iso, now_iso, expires_iso))
+                cache_id = conn.execute(
+                    f"SELECT cache_id FROM {self.table} WHERE scope = ? AND question_key = ?",
+                    (cache_scope(rbac_namespaces), normalise_question(question))
+                ).fetchone()[0]
+                conn.execute("DELETE FROM answer_cache_sources WHERE cache_id = ?", (cache_id,))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO answer_cache_sources (doc_id, cache_id) VALUES (?, ?)",
+                    [(doc_id, cache_id) for doc_id in doc_ids]
+                )
+                self._evict(conn, now_iso)
+                return cache_id
+
+            return self._run_write(work)
+
+        except Exception as e:
+            print(f"Error caching answer: {e}")
+            return None
+
+    def _evict(self, conn, now_iso: str) -> None:
+        """Drop expired entries, then the least recently used ones beyond max_entries."""
+        expired = [row[0] for row in conn.execute(
+            f"SELECT cache_id FROM {self.table} WHERE expires_at <= ?", (now_iso,)
+        ).fetchall()]
+        overflow = [row[0] for row in conn.execute(f"""
+            SELECT cache_id FROM {self.table} WHERE expires_at > ?
+            ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+        """, (now_iso, self.max_entries)).fetchall()]
+        self._delete_entries(conn, expired + overflow)
+
+    def _delete_entries(self, conn, cache_ids: List[int]) -> int:
+        deleted = 0
+        for start in range(0, len(cache_ids), 500):
+            batch = cache_ids[start:start + 500]
+            placeholders = ', '.join('?' for _ in batch)
+            conn.execute(f"DELETE FROM answer_cache_sources WHERE cache_id IN ({placeholders})", batch)
+            deleted += conn.execute(f"DELETE FROM {self.table} WHERE cache_id IN ({placeholders})", batch).rowcount
+        return deleted
+
+    def invalidate_docs(self, doc_ids: Sequence[str]) -> int:
+        """Drop every cached answer built from any of `doc_ids`; returns how many."""
+        if not doc_ids:
+            return 0
+        try:
+            self.ensure_schema()
+
+            def work(conn):
+                cache_ids = set()
+                for start in range(0, len(doc_ids), 500):
+                    batch = list(doc_ids[start:start + 500])
+                    cache_ids.update(row[0] for row in conn.execute(f"""
+                        SELECT cache_id FROM answer_cache_sources
+                        WHERE doc_id IN ({', '.join('?' for _ in batch)})
+                    """, batch).fetchall())
+                return self._delete_entries(conn, sorted(cache_ids))
+
+            return self._run_write(work)
+
+        except Exception as e:
+            print(f"Error invalidating answer cache: {e}")
+            return 0
+
+    def invalidate_unsourced(self) -> int:
+        """Drop every cached answer with no recorded source documents; returns how many."""
+        try:
+            self.ensure_schema()
+
+            def work(conn):
+                cache_ids = [row[0] for row in conn.execute(f"""
+                    SELECT cache_id FROM {self.table} c
+                    WHERE NOT EXISTS (SELECT 1 FROM answer_cache_sources s WHERE s.cache_id = c.cache_id)
+                """).fetchall()]
+                return self._delete_entries(conn, cache_ids)
+
+            return self._run_write(work)
+
+        except Exception as e:
+            print(f"Error invalidating answer cache: {e}")
+            return 0
+
+    def clear(self) -> None:
+        self.ensure_schema()
+        self.apply_migration([f"DELETE FROM {self.table}", "DELETE FROM answer_cache_sources"])
+
+    def stats(self) -> Dict:
+        self.ensure_schema()
+        row = self.conn.execute(f"""
+            SELECT COUNT(*), COALESCE(SUM(hits), 0), SUM(expires_at <= ?) FROM {self.table}
+        """, (datetime.now().isoformat(),)).fetchone()
+        return {"entries": row[0], "hits": row[1], "expired": row[2] or 0, "max_entries": self.max_entries}
+
+    @staticmethod
+    def metrics(hit: Optional[Dict], lookup_ms: float) -> Dict:
+        """cache_hit, cache_lookup_ms and (on a hit) cache_similarity of one lookup."""
+        metrics = {
+            "cache_hit": 1 if hit else 0,
+            "cache_lookup_ms": round(lookup_ms, 2),
+        }
+        if hit:
+            metrics["cache_similarity"] = round(hit["similarity"], 4)
+        return metrics
+
+    def _log(self, question: str, hit: Optional[Dict], lookup_ms: float, rbac_namespaces,
+             user_id: str, session_id: str) -> None:
+        metrics = self.metrics(hit, lookup_ms)
+        context = {"cache_scope": cache_scope(rbac_namespaces)}
+        if hit:
+            context.update(cache_match=hit["match"], cache_id=hit["cache_id"])
+        sources = (hit or {}).get("sources") or []
+        self.history.log_query(
+            query_text=question,
+            target_doc_id=sources[0]["doc_id"] if sources else None,
+            metrics_json=json.dumps(metrics),
+            context_json=json.dumps(context),
+            agent_id=self.agent_id,
+            user_id=user_id,
+            session_id=session_id,
+        )
+
+
+def _loads(value) -> list:
+    try:
+        return json.loads(value) if value else []
+    except (TypeError, ValueError):
+        return []
@@ -1,57 +1,281 @@
-from typing import List, Dict, Any, Optional
+import threading
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence, Union
+from .connection_pool import get_pool, get_pooled_connection
+from .write_queue import get_write_queue
 
 class BaseModel:
     table: str = ''
     fields: List[str] = []
+    primary_key: str = 'id'
+    # Rows per executemany/commit in the bulk write helpers
+    bulk_chunk_size: int = 500
+    # Rows pulled per fetchmany by the streaming readers
+    fetch_batch_size: int = 500
 
-    def __init__(self, conn):
-        self.conn = conn
+    # (database file, table) -> column names, filled once per process and shared by every model
+    _schema_cache: Dict[tuple, List[str]] = {}
+    _schema_lock = threading.Lock()
+
+    def __init__(self, conn=None):
+        # Without an explicit connection, reuse this thread's pooled one. A
+        # connection handed in from the pool counts as pooled too.
+        self.conn = conn if conn is not None else get_pooled_connection()
+        self._pooled = conn is None or get_pool().owns(conn)
 
     def all(self) -> List[Dict[str, Any]]:
-        cur = self.conn.execute(f"SELECT * FROM {self.table}")
-        return [dict(r) for r in cur.fetchall()]
+        return list(self.iter_all())
+
+    # --- Streaming readers ---
+
+    def _row_to_dict(self, row) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        if hasattr(row, 'keys'):
+            return dict(row)
+        return dict(zip(self.fields, row))
+
+    def iter_query(self, sql: str, params: Sequence = (),
+                   batch_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yield rows of an arbitrary SELECT as dicts, fetchmany() at a time."""
+        batch_size = batch_size or self.fetch_batch_size
+        cur = self.conn.execute(sql, params)
+        try:
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._row_to_dict(row)
+        finally:
+            cur.close()
+
+    def iter_all(self, batch_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Stream every row of the table with constant memory."""
+        return self.iter_query(f"SELECT * FROM {self.table}", (), batch_size)
+
+    def iter_where(self, where: str, params: Sequence = (), order_by: Optional[str] = None,
+                   batch_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Stream rows matching a parameterised WHERE clause."""
+        sql = f"SELECT * FROM {self.table} WHERE {where}"
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+        return self.iter_query(sql, params, batch_size)
 
     def find(self, record_id: int) -> Optional[Dict[str, Any]]:
         cur = self.conn.execute(f"SELECT * FROM {self.table} WHERE id = ?", (record_id,))
         row = cur.fetchone()
         return dict(row) if row else None
 
+    def page_after(self, last_id: Any = None, limit: int = 50, order_by: Optional[str] = None,
+                   descending: bool = False) -> List[Dict[str, Any]]:
+        """
+        Keyset (seek) pagination: the `limit` rows that follow the row whose
+        primary key is `last_id` in `order_by` order. Cost depends on the page
+        size, not on how deep the page is.
+        """
+        pk = self.primary_key
+        order_by = order_by or pk
+        self.validate_columns([order_by])
+        op, direction = ('<', 'DESC') if descending else ('>', 'ASC')
+
+        if last_id is None:
+            where, params = "1 = 1", ()
+        elif order_by == pk:
+            where, params = f"{pk} {op} ?", (last_id,)
+        else:
+            # Tie-break on the primary key so non-unique sort columns don't skip rows
+            where = (f"({order_by}, {pk}) {op} "
+                     f"((SELECT {order_by} FROM {self.table} WHERE {pk} = ?), ?)")
+            params = (last_id, last_id)
+
+        sql = (f"SELECT * FROM {self.table} WHERE {where} "
+               f"ORDER BY {order_by} {direction}, {pk} {direction} LIMIT ?")
+        cur = self.conn.execute(sql, params + (limit,))
+        return [self._row_to_dict(r) for r in cur.fetchall()]
+
+    # --- Writes ---
+
+    def _run_write(self, work):
+        """
+        Run `work(conn)` as one committed transaction and return its result.
+        Models on a pooled connection hand the work to the single writer queue;
+        models bound to any other connection (a shard, a test database) write
+        on it directly.
+        """
+        writer = get_write_queue() if self._pooled else None
+        if writer is not None:
+            return writer.run(work)
+        try:
+            result = work(self.conn)
+            self.conn.commit()
+            return result
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def _execute_write(self, sql: str, params: Sequence = ()):
+        """Single-statement write; returns (lastrowid, rowcount)."""
+        def work(conn):
+            cur = conn.execute(sql, params)
+            return cur.lastrowid, cur.rowcount
+        return self._run_write(work)
+
+    # --- Schema introspection ---
+
+    def database_key(self) -> str:
+        """
+        File of the database behind this model's connection. Process-wide
+        schema caches and readiness flags are keyed by it, since namespace
+        shards and the primary database hold tables of the same name.
+        """
+        key = getattr(self, '_database_key', None)
+        if key is None:
+            path = self.conn.execute("PRAGMA database_list").fetchone()[2]
+            # In-memory databases have no file; each connection is a database of its own
+            key = self._database_key = path or f":memory:{id(self.conn)}"
+        return key
+
+    def columns(self) -> List[str]:
+        """Column names of this model's table, cached after the first PRAGMA."""
+        cache_key = (self.database_key(), self.table)
+        cols = BaseModel._schema_cache.get(cache_key)
+        if cols is None:
+            # table_xinfo also lists generated columns; hidden == 1 marks virtual-table internals
+            cur = self.conn.execute(f"PRAGMA table_xinfo({self.table})")
+            cols = [row[1] for row in cur.fetchall() if row[6] != 1]
+            # Don't cache a missing table; it may be created by a later migration
+            if cols:
+                with BaseModel._schema_lock:
+                    BaseModel._schema_cache[cache_key] = cols
+        return cols
+
+    def has_column(self, name: str) -> bool:
+        return name in self.columns()
+
+    def validate_columns(self, keys: Iterable[str]) -> None:
+        """Raise ValueError if any key is not a column of this table."""
+        known = set(self.columns())
+        unknown = [k for k in keys if k not in known]
+        if known and unknown:
+            raise ValueError(f"Unknown column(s) for {self.table}: {', '.join(unknown)}")
+
+    @classmethod
+    def invalidate_schema(cls, table: Optional[str] = None) -> None:
+        """Forget cached columns for one table (or all) in every database; call after any DDL."""
+        with BaseModel._schema_lock:
+            if table is None:
+                BaseModel._schema_cache.clear()
+            else:
+                for key in [k for k in BaseModel._schema_cache if k[1] == table]:
+                    del BaseModel._schema_cache[key]
+
+    def apply_migration(self, statements: Iterable[str]) -> None:
+        """Run DDL statements in one transaction and drop the stale schema cache."""
+        statements = list(statements)
+
+        def work(conn):
+            for sql in statements:
+                conn.execute(sql)
+
+        try:
+            self._run_write(work)
+        finally:
+            BaseModel.invalidate_schema()
+
+    # --- CRUD ---
+
     def insert(self, payload: Dict[str, Any]) -> int:
+        self.validate_columns(payload.keys())
         keys = ','.join(payload.keys())
         placeholders = ','.join('?' for _ in payload)
         values = tuple(payload.values())
-        cur = self.conn.execute(f"INSERT INTO {self.table} ({keys}) VALUES ({placeholders})", values)
-        self.conn.commit()
-        return cur.lastrowid
+        lastrowid, _ = self._execute_write(f"INSERT INTO {self.table} ({keys}) VALUES ({placeholders})", values)
+        return lastrowid
+
+    def insert_many(self, rows: Iterable[Union[Dict[str, Any], Sequence]],
+                    columns: Optional[List[str]] = None,
+                    chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Insert many rows with executemany, committing once per chunk.
+        Rows may be dicts (keys taken from the first row) or tuples ordered as
+        `columns` (defaults to `fields`). Returns {"count": n, "ids": [...]}.
+        """
+        return self._write_many("INSERT", rows, columns, chunk_size)
+
+    def upsert_many(self, rows: Iterable[Union[Dict[str, Any], Sequence]],
+                    columns: Optional[List[str]] = None,
+                    chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """Same as insert_many but with INSERT OR REPLACE semantics."""
+        return self._write_many("INSERT OR REPLACE", rows, columns, chunk_size)
+
+    def _write_many(self, verb: str, rows, columns, chunk_size) -> Dict[str, Any]:
+        chunk_size = chunk_size or self.bulk_chunk_size
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return {"count": 0, "ids": []}
+
+        as_dicts = isinstance(first, dict)
+        if columns is None:
+            columns = list(first.keys()) if as_dicts else list(self.fields)
+        self.validate_columns(columns)
+
+        sql = (f"{verb} INTO {self.table} ({', '.join(columns)}) "
+               f"VALUES ({', '.join('?' for _ in columns)})")
+        pk_pos = columns.index(self.primary_key) if self.primary_key in columns else None
+
+        def to_tuple(row):
+            return tuple(row.get(c) for c in columns) if as_dicts else tuple(row)
+
+        total, ids = 0, []
+        pending = [to_tuple(first)]
+        while True:
+            pending.extend(to_tuple(r) for r in islice(rows, chunk_size - len(pending)))
+            if not pending:
+                break
+            def work(conn, batch=pending):
+                conn.executemany(sql, batch)
+                return conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+            last = self._run_write(work)
+            if pk_pos is not None:
+                ids.extend(r[pk_pos] for r in pending)
+            elif verb == "INSERT":
+                # Plain inserts in one transaction get consecutive rowids
+                ids.extend(range(last - len(pending) + 1, last + 1))
+            total += len(pending)
+            pending = []
+
+        return {"count": total, "ids": ids}
 
     def update(self, record_id: int, payload: Dict[str, Any]) -> None:
+        self.validate_columns(payload.keys())
         assignments = ','.join([f"{k} = ?" for k in payload.keys()])
         values = tuple(payload.values()) + (record_id,)
 
         # Only include updated_at if the table has it
-        cur = self.conn.execute(f"PRAGMA table_info({self.table})")
-        columns = [row['name'] for row in cur.fetchall()]
-        if 'updated_at' in columns:
+        if self.has_column('updated_at'):
             sql = f"UPDATE {self.table} SET {assignments}, updated_at = datetime('now') WHERE id = ?"
         else:
             sql = f"UPDATE {self.table} SET {assignments} WHERE id = ?"
 
-        self.conn.execute(sql, values)
-        self.conn.commit()
+        self._execute_write(sql, values)
 
 
     def delete(self, record_id: int) -> None:
-        self.conn.execute(f"DELETE FROM {self.table} WHERE id = ?", (record_id,))
-        self.conn.commit()
+        self._execute_write(f"DELETE FROM {self.table} WHERE id = ?", (record_id,))
 
     # def raw_execute(self, query_string, query_values):
     #     self.conn.execute(query_string, query_values)
     #     self.conn.commit()
 
     def raw_execute(self, query_string, query_values=()):
-        cur = self.conn.execute(query_string, query_values)
         if query_string.strip().upper().startswith("SELECT"):
+            cur = self.conn.execute(query_string, query_values)
             return cur.fetchall()  # return all rows for select query
         else:
-            self.conn.commit()
+            self._execute_write(query_string, query_values)
+            if query_string.strip().upper().startswith(("ALTER", "CREATE", "DROP")):
+                BaseModel.invalidate_schema()
             return None
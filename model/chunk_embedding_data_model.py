@@ -1,8 +1,10 @@
 from .base_model import BaseModel 
+from .fts import match_any
+from .vector_store import VectorStore
 import json
 import sqlite3
+import threading
 from datetime import datetime
-from epoch_explorer.database.db.connection import get_connection
 import pandas as pd
 
 class ChunkEmbeddingDataModel(BaseModel):
@@ -18,11 +20,56 @@ class ChunkEmbeddingDataModel(BaseModel):
         'quality_score', 'reindex_count', 'healing_suggestions', 
         'created_at', 'last_healed'
     ]
-    def __init__(self, conn=None):
-        """Initialize with optional connection. If none provided, create default connection."""
-        if conn is None:
-            conn = get_connection()
+    primary_key = 'chunk_id'
+
+    def __init__(self, conn=None, vector_store_path: str = None):
+        """Initialize with optional connection. If none provided, use the pooled connection."""
         super().__init__(conn)
+        self.vector_store_path = vector_store_path
+
+    def ensure_text_column(self) -> None:
+        """Add chunk_text, the source text that re-embedding reads, to older databases."""
+        if not self.has_column('chunk_text'):
+            self.apply_migration([f"ALTER TABLE {self.table} ADD COLUMN chunk_text TEXT"])
+
+    def ensure_hash_column(self) -> None:
+        """Add content_hash (fingerprint of chunk_text) and its lookup index to older databases."""
+        if not self.has_column('content_hash'):
+            self.apply_migration([
+                f"ALTER TABLE {self.table} ADD COLUMN content_hash TEXT",
+                f"CREATE INDEX IF NOT EXISTS idx_chunk_embedding_hash ON {self.table} (content_hash)",
+            ])
+
+    def get_content_hashes(self, chunk_ids: list) -> dict:
+        """{chunk_id: content_hash} for the given chunks that exist."""
+        hashes = {}
+        for start in range(0, len(chunk_ids), 500):
+            batch = chunk_ids[start:start + 500]
+            cur = self.conn.execute(f"""
+                SELECT chunk_id, content_hash FROM {self.table}
+                WHERE chunk_id IN ({', '.join('?' for _ in batch)})
+            """, batch)
+            hashes.update((row[0], row[1]) for row in cur.fetchall())
+        return hashes
+
+    indexes = [
+        # Worst-first candidate scans (healing, low-quality reports) seek on this
+        "CREATE INDEX IF NOT EXISTS idx_chunk_embedding_quality ON chunk_embedding_data (quality_score, chunk_id)",
+        # Per-document and per-model/version statistics read quality straight from these
+        "CREATE INDEX IF NOT EXISTS idx_chunk_embedding_doc ON chunk_embedding_data (doc_id, quality_score)",
+        "CREATE INDEX IF NOT EXISTS idx_chunk_embedding_model_version "
+        "ON chunk_embedding_data (embedding_model, embedding_version, quality_score)",
+        "CREATE INDEX IF NOT EXISTS idx_chunk_embedding_created ON chunk_embedding_data (created_at)",
+    ]
+    # Database files whose indexes were created by this process
+    _indexes_ready: set = set()
+
+    def ensure_indexes(self) -> None:
+        """Create the statistics / scheduling indexes once per process and database."""
+        database = self.database_key()
+        if database not in ChunkEmbeddingDataModel._indexes_ready:
+            self.apply_migration(self.indexes)
+            ChunkEmbeddingDataModel._indexes_ready.add(database)
 
     def get_all_chunks(self) -> pd.DataFrame:
         query = """
@@ -70,18 +117,39 @@ class ChunkEmbeddingDataModel(BaseModel):
             columns = ", ".join(self.fields)
             placeholders = ", ".join(["?"] * len(self.fields))
             
-            self.conn.execute(f"""
+            self._execute_write(f"""
                 INSERT OR REPLACE INTO {self.table}
                 ({columns})
                 VALUES ({placeholders})
             """, data)
-            self.conn.commit()
             return True
             
         except Exception as e:
             print(f"Error creating chunk embedding data: {e}")
             return False
     
+    def create_many(self, records, chunk_size: int = None) -> dict:
+        """
+        Bulk INSERT OR REPLACE of chunk records (dicts with the same keys as `create`,
+        plus optional chunk_text / content_hash), committed once per chunk.
+        Returns {"count": n, "ids": [chunk_id, ...]}.
+        """
+        now_iso = datetime.now().isoformat()
+        extra = [c for c in ('chunk_text', 'content_hash') if self.has_column(c)]
+        rows = (
+            (
+                r["chunk_id"], r["doc_id"], r["embedding_model"],
+                r.get("embedding_version", "1.0"), r.get("quality_score", 0.8),
+                r.get("reindex_count", 0),
+                r.get("healing_suggestions") or json.dumps({}),
+                now_iso,
+                None # last_healed is NULL initially
+            ) + tuple(r.get(c) for c in extra)
+            for r in records
+        )
+        columns = self.fields + extra
+        return self.upsert_many(rows, columns=columns, chunk_size=chunk_size)
+
     # --- Data Retrieval Methods ---
 
     def get_by_id(self, chunk_id: str) -> dict | None:
@@ -118,35 +186,199 @@ class ChunkEmbeddingDataModel(BaseModel):
             print(f"Error getting chunks by doc_id: {e}")
             return []
     
+    def iter_low_quality_chunks(self, threshold: float = 0.6, batch_size: int = None):
+        """Stream chunks with quality score below the threshold, worst first."""
+        fields_str = ', '.join(self.fields)
+        return self.iter_query(f"""
+            SELECT {fields_str}
+            FROM {self.table}
+            WHERE quality_score < ?
+            ORDER BY quality_score ASC
+        """, (threshold,), batch_size)
+
     def get_low_quality_chunks(self, threshold: float = 0.6) -> list[dict]:
         """Get chunks with quality score below the given threshold."""
         try:
+            return list(self.iter_low_quality_chunks(threshold))
+            
+        except Exception as e:
+            print(f"Error getting low quality chunks: {e}")
+            return []
+
+    # --- Vector Search ---
+
+    def vectors(self) -> VectorStore:
+        """Local vector store holding the embeddings of these chunks."""
+        return VectorStore(None if self._pooled else self.conn, self.vector_store_path)
+
+    def search_similar(self, vector, k: int = 10, rbac_namespace: str = None,
+                       doc_id: str = None) -> list[dict]:
+        """
+        Top-k chunks closest to `vector` in the local vector store, each with its
+        embedding metadata and a `score` (cosine similarity). With RBAC_SHARDING
+        on, a namespace-filtered search only reads that namespace's shard.
+        """
+        if self._pooled and rbac_namespace:
+            from .namespace_shards import get_shards, sharding_enabled
+            if sharding_enabled():
+                return get_shards().search_similar(vector, k, [rbac_namespace], doc_id)
+        try:
+            hits = self.vectors().search(vector, k, rbac_namespace=rbac_namespace,
+                                         doc_ids=[doc_id] if doc_id else None)
+            if not hits:
+                return []
+
             fields_str = ', '.join(self.fields)
+            placeholders = ', '.join('?' for _ in hits)
             cur = self.conn.execute(f"""
                 SELECT {fields_str}
                 FROM {self.table}
-                WHERE quality_score < ?
-                ORDER BY quality_score ASC
-            """, (threshold,))
-            
-            return [self._row_to_dict(row) for row in cur.fetchall()]
-            
+                WHERE chunk_id IN ({placeholders})
+            """, [hit["chunk_id"] for hit in hits])
+            by_id = {chunk["chunk_id"]: chunk for chunk in map(self._row_to_dict, cur.fetchall())}
+
+            return [
+                {**by_id.get(hit["chunk_id"], {"chunk_id": hit["chunk_id"], "doc_id": hit["doc_id"]}),
+                 "score": hit["score"]}
+                for hit in hits
+            ]
+
         except Exception as e:
-            print(f"Error getting low quality chunks: {e}")
+            print(f"Error searching similar chunks: {e}")
+            return []
+
+    def similar_chunk_ids(self, queries, k: int = 10, rbac_namespace: str = None,
+                          doc_id: str = None) -> list[list[str]]:
+        """
+        Top-k chunk_ids for each row of an (N x D) query matrix, using one
+        blocked matrix product per block of stored vectors.
+        """
+        try:
+            results = self.vectors().search_batch(queries, k, rbac_namespace=rbac_namespace,
+                                                  doc_ids=[doc_id] if doc_id else None)
+            return [[hit["chunk_id"] for hit in hits] for hits in results]
+
+        except Exception as e:
+            print(f"Error in batch similarity search: {e}")
+            return []
+
+    # --- Lexical Search ---
+
+    # External-content FTS5 index over chunk_text. Chunks are written with
+    # INSERT OR REPLACE, whose implicit delete fires no trigger (recursive
+    # triggers are off), so the old entry is dropped BEFORE INSERT instead.
+    text_search_schema = [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS chunk_text_fts USING fts5(
+            chunk_text, content='chunk_embedding_data', content_rowid='rowid',
+            tokenize='porter unicode61'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_chunk_text_fts_replace
+        BEFORE INSERT ON chunk_embedding_data BEGIN
+            INSERT INTO chunk_text_fts (chunk_text_fts, rowid, chunk_text)
+            SELECT 'delete', rowid, chunk_text FROM chunk_embedding_data WHERE chunk_id = NEW.chunk_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_chunk_text_fts_insert
+        AFTER INSERT ON chunk_embedding_data BEGIN
+            INSERT INTO chunk_text_fts (rowid, chunk_text) VALUES (NEW.rowid, NEW.chunk_text);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_chunk_text_fts_delete
+        AFTER DELETE ON chunk_embedding_data BEGIN
+            INSERT INTO chunk_text_fts (chunk_text_fts, rowid, chunk_text) VALUES ('delete', OLD.rowid, OLD.chunk_text);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_chunk_text_fts_update
+        AFTER UPDATE OF chunk_text ON chunk_embedding_data BEGIN
+            INSERT INTO chunk_text_fts (chunk_text_fts, rowid, chunk_text) VALUES ('delete', OLD.rowid, OLD.chunk_text);
+            INSERT INTO chunk_text_fts (rowid, chunk_text) VALUES (NEW.rowid, NEW.chunk_text);
+        END
+        """,
+    ]
+    # Database files whose chunk_text_fts is known to exist; namespace shards are separate files
+    _text_search_ready: set = set()
+    _text_search_lock = threading.Lock()
+
+    def ensure_text_search_index(self) -> None:
+        """Create chunk_text_fts and its triggers, built from the existing chunks, once per database."""
+        database = self.database_key()
+        if database in ChunkEmbeddingDataModel._text_search_ready:
+            return
+        with ChunkEmbeddingDataModel._text_search_lock:
+            exists = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_chunk_text_fts_update'"
+            ).fetchone()
+            if not exists:
+                self.ensure_text_column()
+                self.apply_migration(self.text_search_schema + [
+                    "INSERT INTO chunk_text_fts (chunk_text_fts) VALUES ('rebuild')",
+                ])
+            ChunkEmbeddingDataModel._text_search_ready.add(database)
+
+    def search_text(self, query: str, k: int = 50, rbac_namespace: str = None,
+                    doc_id: str = None) -> list[dict]:
+        """
+        Top-k chunks by BM25 over chunk_text for any word of `query`, best
+        first, as [{'chunk_id', 'doc_id', 'score'}] (higher score is better).
+        """
+        try:
+            self.ensure_text_search_index()
+            expression = match_any(query)
+            if expression is None:
+                return []
+
+            joins, where, params = "", "chunk_text_fts MATCH ?", [expression]
+            if rbac_namespace:
+                joins = "JOIN document_metadata d ON d.doc_id = c.doc_id"
+                where += " AND d.rbac_namespace = ?"
+                params.append(rbac_namespace)
+            if doc_id:
+                where += " AND c.doc_id = ?"
+                params.append(doc_id)
+
+            cur = self.conn.execute(f"""
+                SELECT c.chunk_id, c.doc_id, -bm25(chunk_text_fts) AS score
+                FROM chunk_text_fts
+                JOIN {self.table} c ON c.rowid = chunk_text_fts.rowid
+                {joins}
+                WHERE {where}
+                ORDER BY bm25(chunk_text_fts)
+                LIMIT ?
+            """, params + [k])
+            return [dict(chunk_id=row[0], doc_id=row[1], score=row[2]) for row in cur.fetchall()]
+
+        except Exception as e:
+            print(f"Error in chunk text search: {e}")
             return []
 
+    def get_texts(self, chunk_ids: list) -> dict:
+        """{chunk_id: chunk_text} for the given chunks."""
+        texts = {}
+        for start in range(0, len(chunk_ids), 500):
+            batch = chunk_ids[start:start + 500]
+            cur = self.conn.execute(f"""
+                SELECT chunk_id, chunk_text FROM {self.table}
+                WHERE chunk_id IN ({', '.join('?' for _ in batch)})
+            """, batch)
+            texts.update((row[0], row[1]) for row in cur.fetchall())
+        return texts
+
     # --- Update Methods ---
 
     def update_quality_score(self, chunk_id: str, quality_score: float) -> bool:
         """Update quality score for a chunk."""
         try:
-            self.conn.execute(f"""
+            self._execute_write(f"""
                 UPDATE {self.table}
                 SET quality_score = ?
                 WHERE chunk_id = ?
             """, (quality_score, chunk_id))
-            
-            self.conn.commit()
             return True
             
         except Exception as e:
@@ -157,14 +389,12 @@ class ChunkEmbeddingDataModel(BaseModel):
         """Increment reindex count and update last_healed timestamp for a chunk."""
         try:
             now_iso = datetime.now().isoformat()
-            self.conn.execute(f"""
+            self._execute_write(f"""
                 UPDATE {self.table}
                 SET reindex_count = reindex_count + 1,
                     last_healed = ?
                 WHERE chunk_id = ?
             """, (now_iso, chunk_id))
-            
-            self.conn.commit()
             return True
             
         except Exception as e:
@@ -172,6 +402,139 @@ class ChunkEmbeddingDataModel(BaseModel):
             return False
 
     # --- Statistics Method ---
+
+    def _stat_filters(self, doc_id: str = None, embedding_models: list = None,
+                      embedding_versions: list = None, scored_only: bool = True) -> tuple:
+        where, params = ("WHERE quality_score IS NOT NULL" if scored_only else "WHERE 1 = 1"), []
+        if doc_id:
+            where += " AND doc_id = ?"
+            params.append(doc_id)
+        if embedding_models:
+            where += f" AND embedding_model IN ({', '.join('?' for _ in embedding_models)})"
+            params.extend(embedding_models)
+        if embedding_versions:
+            where += f" AND embedding_version IN ({', '.join('?' for _ in embedding_versions)})"
+            params.extend(embedding_versions)
+        return where, params
+
+    def get_model_versions(self) -> pd.DataFrame:
+        """Distinct (embedding_model, embedding_version) pairs with their chunk counts."""
+        self.ensure_indexes()
+        return pd.read_sql_query(f"""
+            SELECT embedding_model, embedding_version, COUNT(*) AS chunk_count
+            FROM {self.table}
+            GROUP BY embedding_model, embedding_version
+            ORDER BY embedding_model, embedding_version
+        """, self.conn)
+
+    def get_quality_histogram(self, bins: int = 20, doc_id: str = None, embedding_models: list = None,
+                              embedding_versions: list = None, low: float = 0.0,
+                              high: float = 1.0) -> pd.DataFrame:
+        """
+        Chunk counts in `bins` fixed-width quality buckets over [low, high],
+        computed in SQL. Empty buckets are included with a count of 0.
+        """
+        self.ensure_indexes()
+        where, params = self._stat_filters(doc_id, embedding_models, embedding_versions)
+        width = (high - low) / bins
+        # Rounded before the cast: 0.15 / 0.05 is 2.999..., which would truncate a bucket low
+        cur = self.conn.execute(f"""
+            SELECT MIN(MAX(CAST(ROUND((quality_score - ?) / ?, 9) AS INTEGER), 0), ?) AS bucket, COUNT(*)
+            FROM {self.table}
+            {where}
+            GROUP BY bucket
+        """, [low, width, bins - 1] + params)
+        counts = {row[0]: row[1] for row in cur.fetchall()}
+        return pd.DataFrame({
+            "bucket_start": [round(low + i * width, 6) for i in range(bins)],
+            "bucket_end": [round(low + (i + 1) * width, 6) for i in range(bins)],
+            "count": [counts.get(i, 0) for i in range(bins)],
+        })
+
+    def get_quality_percentiles(self, percentiles=(0.5, 0.9, 0.99), doc_id: str = None,
+                                embedding_models: list = None, embedding_versions: list = None) -> dict:
+        """
+        Nearest-rank quality percentiles, e.g. {"count": n, "p50": .., "p90": .., "p99": ..}.
+        Each percentile is one LIMIT 1 OFFSET query along the quality_score
+        index. Ranks above the median are read from the top end, so no query
+        steps over more than half of the matching rows.
+        """
+        self.ensure_indexes()
+        where, params = self._stat_filters(doc_id, embedding_models, embedding_versions)
+        count = self.conn.execute(f"SELECT COUNT(*) FROM {self.table} {where}", params).fetchone()[0]
+        result = {"count": count}
+        for p in percentiles:
+            key = f"p{p * 100:g}"
+            if not count:
+                result[key] = None
+                continue
+            rank = min(max(int(-(-p * count // 1)) - 1, 0), count - 1)
+            direction, offset = ("ASC", rank) if rank < count / 2 else ("DESC", count - 1 - rank)
+            row = self.conn.execute(f"""
+                SELECT quality_score FROM {self.table} {where}
+                ORDER BY quality_score {direction} LIMIT 1 OFFSET ?
+            """, params + [offset]).fetchone()
+            result[key] = row[0]
+        return result
+
+    def get_group_quality_stats(self, group_by: str = "embedding_model", doc_id: str = None,
+                                embedding_models: list = None,
+                                embedding_versions: list = None) -> pd.DataFrame:
+        """
+        Count, mean, min, max and p50/p90/p99 quality per group, where group_by
+        is 'doc_id', 'embedding_model' or 'model_version'. One pass in SQL.
+        """
+        group_exprs = {
+            "doc_id": "doc_id",
+            "embedding_model": "embedding_model",
+            "model_version": "embedding_model || ' / ' || COALESCE(embedding_version, '')",
+        }
+        if group_by not in group_exprs:
+            raise ValueError(f"group_by must be one of: {', '.join(group_exprs)}")
+        self.ensure_indexes()
+        where, params = self._stat_filters(doc_id, embedding_models, embedding_versions)
+        return pd.read_sql_query(f"""
+            SELECT grp AS "{group_by}", COUNT(*) AS chunk_count,
+                   AVG(quality_score) AS avg_quality,
+                   MIN(quality_score) AS min_quality, MAX(quality_score) AS max_quality,
+                   MIN(CASE WHEN rn >= 0.50 * n THEN quality_score END) AS p50,
+                   MIN(CASE WHEN rn >= 0.90 * n THEN quality_score END) AS p90,
+                   MIN(CASE WHEN rn >= 0.99 * n THEN quality_score END) AS p99,
+                   AVG(reindex_count) AS avg_reindex_count
+            FROM (
+                SELECT {group_exprs[group_by]} AS grp, quality_score, reindex_count,
+                       ROW_NUMBER() OVER (PARTITION BY {group_exprs[group_by]} ORDER BY quality_score) AS rn,
+                       COUNT(*) OVER (PARTITION BY {group_exprs[group_by]}) AS n
+                FROM {self.table}
+                {where}
+            )
+            GROUP BY grp
+            ORDER BY chunk_count DESC
+        """, self.conn, params=params)
+
+    def get_reindex_histogram(self, doc_id: str = None, embedding_models: list = None,
+                              embedding_versions: list = None) -> pd.DataFrame:
+        where, params = self._stat_filters(doc_id, embedding_models, embedding_versions, scored_only=False)
+        return pd.read_sql_query(f"""
+            SELECT COALESCE(reindex_count, 0) AS reindex_count, COUNT(*) AS count
+            FROM {self.table}
+            {where}
+            GROUP BY 1
+            ORDER BY 1
+        """, self.conn, params=params)
+
+    def get_recent_chunks(self, limit: int = 10, embedding_models: list = None,
+                          embedding_versions: list = None) -> pd.DataFrame:
+        """Most recently created chunks, newest first, read along the created_at index."""
+        self.ensure_indexes()
+        where, params = self._stat_filters(None, embedding_models, embedding_versions, scored_only=False)
+        return pd.read_sql_query(f"""
+            SELECT {', '.join(self.fields)}
+            FROM {self.table}
+            {where}
+            ORDER BY created_at DESC
+            LIMIT ?
+        """, self.conn, params=params + [limit])
     
     def get_statistics(self, doc_id: str = None) -> dict:
         """Get statistics (count, avg/min/max quality) for chunks, optionally filtered by doc_id."""
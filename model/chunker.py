@@ -0,0 +1,92 @@
+from typing import Dict, Iterable, Iterator, Union
+
+# Separators tried by the recursive splitter, most to least preferred
+RECURSIVE_SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+# Characters pulled from file-like inputs per read
+READ_SIZE = 64 * 1024
+
+
+def iter_text(source: Union[str, Iterable[str]], read_size: int = READ_SIZE) -> Iterator[str]:
+    """
+    Normalise a text source into a stream of pieces: a str is sliced, a
+    file-like object is read `read_size` characters at a time, and any other
+    iterable of strings (lines, generator) is passed through.
+    """
+    if isinstance(source, str):
+        for start in range(0, len(source), read_size):
+            yield source[start:start + read_size]
+    elif hasattr(source, "read"):
+        while True:
+            piece = source.read(read_size)
+            if not piece:
+                break
+            yield piece.decode("utf-8", errors="replace") if isinstance(piece, bytes) else piece
+    else:
+        yield from source
+
+
+def _simple_cut(buffer: str, chunk_size: int, min_end: int = 1) -> int:
+    return min(chunk_size, len(buffer))
+
+
+def _recursive_cut(buffer: str, chunk_size: int, min_end: int = 1) -> int:
+    """
+    Split point inside buffer[:chunk_size], preferring paragraph, line,
+    sentence, then word breaks. Breaks ending before `min_end` are skipped.
+    """
+    window = buffer[:chunk_size]
+    if len(window) < chunk_size:
+        return len(window)
+    for min_pos in (chunk_size // 2, 1):
+        for separator in RECURSIVE_SEPARATORS:
+            pos = window.rfind(separator)
+            if pos >= min_pos and pos + len(separator) >= min_end:
+                return pos + len(separator)
+    return chunk_size
+
+
+_CUTTERS = {
+    "simple_splitter": _simple_cut,
+    "recursive_splitter": _recursive_cut,
+}
+
+
+def chunk_stream(source: Union[str, Iterable[str]], chunk_strategy: str = "recursive_splitter",
+                 chunk_size_char: int = 512, overlap_char: int = 50) -> Iterator[Dict]:
+    """
+    Split a text stream into chunks of at most `chunk_size_char` characters,
+    each starting `overlap_char` characters before the previous one ended.
+
+    Yields {"chunk_index", "text", "start_char", "end_char"} as soon as each
+    chunk is complete. Only about one chunk plus one read of text is held at a
+    time, so memory stays flat however long the document is.
+    """
+    if chunk_strategy not in _CUTTERS:
+        raise ValueError(f"Unknown chunk_strategy '{chunk_strategy}'. Available: {', '.join(_CUTTERS)}")
+    if chunk_size_char <= 0:
+        raise ValueError("chunk_size_char must be positive")
+    overlap_char = max(0, min(overlap_char, chunk_size_char - 1))
+    cut = _CUTTERS[chunk_strategy]
+
+    buffer, offset, index = "", 0, 0
+    # Absolute end of the last emitted chunk; the tail must reach past it
+    emitted_end = 0
+
+    for piece in iter_text(source):
+        buffer += piece
+        # Keep one full window of look-ahead so the splitter sees complete separators
+        while len(buffer) > chunk_size_char:
+            # A chunk must end past the previous one, or overlapping windows repeat it
+            end = cut(buffer, chunk_size_char, max(emitted_end - offset + 1, 1))
+            text = buffer[:end]
+            if text.strip():
+                yield {"chunk_index": index, "text": text, "start_char": offset, "end_char": offset + end}
+                index += 1
+                emitted_end = offset + end
+            # A cut no longer than the overlap is taken whole; stepping back would creep
+            step = end - overlap_char if end > overlap_char else end
+            buffer, offset = buffer[step:], offset + step
+
+    if buffer.strip() and offset + len(buffer) > emitted_end:
+        yield {"chunk_index": index, "text": buffer, "start_char": offset, "end_char": offset + len(buffer)}
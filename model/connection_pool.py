@@ -0,0 +1,302 @@
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+
+def _default_factory():
+    # Imported lazily so the models package stays importable without the db package
+    from ..db.connection import get_connection
+    # Pooled connections move from one script-run thread to the next, so they are
+    # opened without sqlite3's same-thread check; get_connection does the rest of
+    # the setup as usual
+    try:
+        return get_connection(check_same_thread=False)
+    except TypeError as e:
+        raise TypeError(
+            "db.connection.get_connection must accept check_same_thread for pooled "
+            "connections; otherwise install a factory with set_connection_factory()"
+        ) from e
+
+
+def sqlite_pragmas() -> Dict[str, str]:
+    """Connection PRAGMAs, overridable through the environment."""
+    return {
+        "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "mmap_size": os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+        # Negative values are KiB, so this is a 64 MiB page cache
+        "cache_size": os.getenv("SQLITE_CACHE_SIZE", "-65536"),
+        "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"),
+    }
+
+
+def configure_connection(conn):
+    """Apply the tuned PRAGMAs to a freshly opened connection."""
+    for name, value in sqlite_pragmas().items():
+        if value != "":
+            conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+class PoolTimeoutError(RuntimeError):
+    """Raised when no connection frees up within the pool timeout."""
+
+
+class _Lease:
+    """Marks a thread's checkout; when the thread ends its connection returns to the pool."""
+
+
+class ConnectionPool:
+    """
+    Checkout/return SQLite connection pool.
+
+    A thread checks out one connection and keeps it for as long as it runs,
+    so every model built during a Streamlit script run shares it. When the
+    thread ends (or calls `release`), the connection goes back to the idle
+    queue and the next script run, on a new thread, picks it up already
+    opened and tuned. At most `max_size` connections exist; a caller finding
+    none idle at the cap waits up to `timeout` seconds for one to return.
+
+    Connections change threads, so the factory must open them with
+    check_same_thread=False. Each is only ever used by one thread at a time.
+    """
+
+    def __init__(self, factory: Callable = None, max_size: int = 16,
+                 timeout: float = 30.0, health_check_interval: float = 30.0):
+        self.factory = factory or _default_factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._idle: deque = deque()
+        # id(conn) -> conn, for every live connection, idle or checked out
+        self._connections: Dict[int, Any] = {}
+        # id(conn) -> monotonic time of its last health check
+        self._checked_at: Dict[int, float] = {}
+        self._closed = False
+
+        self._stats = {
+            "acquired": 0,
+            "reused": 0,
+            "recycled": 0,
+            "created": 0,
+            "returned": 0,
+            "health_failures": 0,
+            "waits": 0,
+            "total_wait_s": 0.0,
+            "max_wait_s": 0.0,
+        }
+
+    # --- Public API ---
+
+    def acquire(self):
+        """Return the calling thread's connection, checking one out if it has none."""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            with self._cond:
+                self._stats["acquired"] += 1
+                self._stats["reused"] += 1
+            return conn
+
+        conn = self._checkout()
+        lease = _Lease()
+        # Runs when the thread's locals are cleared, i.e. when the thread ends
+        lease.finalizer = weakref.finalize(lease, self._checkin, conn)
+        self._local.conn = conn
+        self._local.lease = lease
+        return conn
+
+    def create_connection(self):
+        """Open a new, tuned connection outside the pool's bookkeeping."""
+        return configure_connection(self.factory())
+
+    def release(self) -> None:
+        """Return the calling thread's connection to the pool now."""
+        lease = getattr(self._local, "lease", None)
+        self._local.conn = None
+        self._local.lease = None
+        if lease is not None:
+            lease.finalizer()
+
+    def owns(self, conn) -> bool:
+        """True if `conn` was opened by this pool and is still live."""
+        with self._cond:
+            return self._connections.get(id(conn)) is conn
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool counters, including wait-time metrics."""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot["open"] = len(self._connections)
+            snapshot["idle"] = len(self._idle)
+            snapshot["in_use"] = len(self._connections) - len(self._idle)
+            snapshot["max_size"] = self.max_size
+        snapshot["avg_wait_s"] = (
+            snapshot["total_wait_s"] / snapshot["waits"] if snapshot["waits"] else 0.0
+        )
+        return snapshot
+
+    def close_all(self) -> None:
+        """Close idle connections and stop handing any out; used on shutdown."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            for conn in idle:
+                self._forget(conn)
+            self._cond.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
+
+    # --- Internals ---
+
+    def _checkout(self):
+        started = time.monotonic()
+        waited = False
+        while True:
+            with self._cond:
+                while not self._idle and len(self._connections) >= self.max_size:
+                    remaining = self.timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"No connection available after {self.timeout:.1f}s "
+                            f"(max_size={self.max_size})"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+                    if self._closed:
+                        raise RuntimeError("Connection pool is closed")
+
+                if waited:
+                    wait_s = time.monotonic() - started
+                    self._stats["waits"] += 1
+                    self._stats["total_wait_s"] += wait_s
+                    self._stats["max_wait_s"] = max(self._stats["max_wait_s"], wait_s)
+                    waited = False
+
+                conn = self._idle.popleft() if self._idle else None
+                if conn is None:
+                    # Placeholder keeps the slot counted while the factory runs
+                    placeholder = object()
+                    self._connections[id(placeholder)] = placeholder
+
+            if conn is None:
+                try:
+                    conn = self.create_connection()
+                except Exception:
+                    with self._cond:
+                        self._connections.pop(id(placeholder), None)
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._connections.pop(id(placeholder), None)
+                    self._connections[id(conn)] = conn
+                    self._checked_at[id(conn)] = time.monotonic()
+                    self._stats["acquired"] += 1
+                    self._stats["created"] += 1
+                return conn
+
+            if self._is_healthy(conn):
+                with self._cond:
+                    self._stats["acquired"] += 1
+                    self._stats["recycled"] += 1
+                return conn
+            with self._cond:
+                self._forget(conn)
+                self._cond.notify()
+            self._close_quietly(conn)
+
+    def _checkin(self, conn) -> None:
+        with self._cond:
+            if self._connections.get(id(conn)) is not conn:
+                return
+            if self._closed:
+                self._forget(conn)
+            else:
+                try:
+                    # A script run that stopped mid-transaction must not hand it on
+                    if conn.in_transaction:
+                        conn.rollback()
+                except Exception:
+                    self._forget(conn)
+                    self._cond.notify()
+                    return
+                self._idle.append(conn)
+                self._stats["returned"] += 1
+            self._cond.notify()
+        if self._closed:
+            self._close_quietly(conn)
+
+    def _forget(self, conn) -> None:
+        """Drop `conn` from the bookkeeping. Caller must hold the lock."""
+        self._connections.pop(id(conn), None)
+        self._checked_at.pop(id(conn), None)
+
+    def _is_healthy(self, conn) -> bool:
+        now = time.monotonic()
+        if now - self._checked_at.get(id(conn), 0.0) < self.health_check_interval:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            self._checked_at[id(conn)] = now
+            return True
+        except Exception:
+            with self._cond:
+                self._stats["health_failures"] += 1
+            return False
+
+    @staticmethod
+    def _close_quietly(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_default_pool: Optional[ConnectionPool] = None
+_default_pool_lock = threading.Lock()
+
+
+_connection_factory: Optional[Callable] = None
+
+
+def set_connection_factory(factory: Callable) -> None:
+    """
+    Open pooled (and writer-queue) connections with `factory` instead of
+    db.connection.get_connection. The factory must open them with
+    check_same_thread=False. Connections already open are kept.
+    """
+    global _connection_factory
+    with _default_pool_lock:
+        _connection_factory = factory
+        if _default_pool is not None:
+            _default_pool.factory = factory
+
+
+def get_pool() -> ConnectionPool:
+    """Process-wide pool shared by every model and page."""
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = ConnectionPool(
+                    factory=_connection_factory,
+                    max_size=int(os.getenv("DB_POOL_SIZE", "16")),
+                    timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+                    health_check_interval=float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30")),
+                )
+    return _default_pool
+
+
+def get_pooled_connection():
+    """Drop-in replacement for `get_connection()`: the calling thread's pooled connection."""
+    return get_pool().acquire()
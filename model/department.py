@@ -19,3 +19,22 @@ class DepartmentModel(BaseModel):
         '''
         cur = self.conn.execute(sql)
         return [dict(row) for row in cur.fetchall()]
+
+    def for_company_with_name_page(self, last_id=None, limit=50):
+        """Keyset page of departments with company names, ordered by department id"""
+        sql = '''
+        SELECT 
+            d.id AS department_id,
+            c.name AS company_name,
+            d.name AS department_name,
+            d.created_at
+        FROM 
+            departments d
+        JOIN 
+            companies c ON d.company_id = c.id
+        WHERE d.id > ?
+        ORDER BY d.id
+        LIMIT ?
+        '''
+        cur = self.conn.execute(sql, (last_id if last_id is not None else 0, limit))
+        return [dict(row) for row in cur.fetchall()]
@@ -0,0 +1,251 @@
+from .answer_cache import AnswerCache
+from .chunk_embedding_data_model import ChunkEmbeddingDataModel
+from .chunker import chunk_stream, iter_text
+from .document_metadata_model import DocumentMetadataModel
+from .embedders import get_embedder
+from .near_duplicate_index import NearDuplicateIndex
+from .vector_store import VectorStore
+import hashlib
+from itertools import islice
+from typing import Dict, Iterable, Iterator, Union
+
+import numpy as np
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class DocumentIngestor:
+    """
+    Streams a document through the chunker into chunk_embedding_data.
+
+    The chunk settings (chunk_strategy, chunk_size_char, overlap_char) come
+    from the document's document_metadata row; a new document is registered
+    with the settings passed to `ingest`. Chunks are written `batch_size` at a
+    time together with their chunk_text and, when `embed` is on, their vectors
+    in the local vector store. So only one batch of chunks is ever held in
+    memory.
+
+    Re-ingestion is incremental. A document whose content hash matches the
+    stored one is skipped outright. Otherwise only chunks whose content_hash
+    changed are rewritten. A changed chunk whose exact text is already stored
+    elsewhere reuses that chunk's vector instead of being embedded again.
+
+    With `dedup` set, every written chunk is checked against a MinHash/LSH
+    index. A chunk whose estimated Jaccard similarity to an existing
+    canonical chunk is at least `dedup_threshold` is linked to that chunk.
+    'flag' records the link only. 'skip' also leaves the duplicate out of the
+    vector store, so retrieval finds its canonical chunk instead.
+
+    Cached answers built from a document are dropped from `answer_cache`
+    (an AnswerCache on `conn` by default) whenever the document changes.
+    """
+
+    def __init__(self, conn=None, batch_size: int = 200, embedder=None, embed: bool = True,
+                 dedup: str = None, dedup_threshold: float = 0.9, store_path: str = None,
+                 answer_cache: AnswerCache = None):
+        if dedup not in (None, 'flag', 'skip'):
+            raise ValueError("dedup must be None, 'flag' or 'skip'")
+        self.batch_size = batch_size
+        self.embed = embed
+        self.embedder = (embedder or get_embedder()) if embed else None
+        self.dedup = dedup
+        self.dedup_threshold = dedup_threshold
+        self.dedup_index = NearDuplicateIndex(conn) if dedup else None
+
+        self.documents = DocumentMetadataModel(conn)
+        self.documents.ensure_hash_column()
+        self.chunks = ChunkEmbeddingDataModel(conn)
+        self.chunks.ensure_text_column()
+        self.chunks.ensure_hash_column()
+        self.chunks.ensure_indexes()
+        self.store = VectorStore(conn, store_path) if embed else None
+        self.answer_cache = answer_cache or AnswerCache(conn)
+
+    @staticmethod
+    def chunk_id(doc_id: str, chunk_index: int) -> str:
+        return f"{doc_id}_CHUNK_{chunk_index:06d}"
+
+    def ingest(self, doc_id: str, source: Union[str, Iterable[str]], title: str = None,
+               source_hash: str = None, **metadata) -> Dict:
+        """
+        Chunk and store `source` (a str, file-like object or iterable of text
+        pieces) for `doc_id`. `source_hash` lets a caller that already knows
+        the content fingerprint (e.g. a revision id) skip unchanged documents
+        without reading them. For str sources it is computed up front.
+        Chunks left over from a previous, longer version are removed.
+
+        Returns {"doc_id", "chunks", "written", "embedded", "duplicates",
+        "removed", "unchanged"}.
+        """
+        document = self.documents.get_by_id(doc_id)
+        if document is None:
+            self.documents.create(doc_id, title or doc_id, **metadata)
+            document = self.documents.get_by_id(doc_id)
+
+        if source_hash is None and isinstance(source, str):
+            source_hash = content_hash(source)
+        if source_hash is not None and source_hash == self.documents.get_content_hash(doc_id):
+            return {"doc_id": doc_id, "chunks": self._chunk_count(doc_id), "written": 0,
+                    "embedded": 0, "duplicates": 0, "removed": 0, "unchanged": True}
+
+        hasher = hashlib.sha256()
+        chunks = chunk_stream(
+            self._hashed(iter_text(source), hasher),
+            document.get("chunk_strategy") or "recursive_splitter",
+            document.get("chunk_size_char") or 512,
+            document.get("overlap_char") or 0,
+        )
+
+        totals = {"chunks": 0, "written": 0, "embedded": 0, "duplicates": 0}
+        while True:
+            batch = list(islice(chunks, self.batch_size))
+            if not batch:
+                break
+            totals["chunks"] += len(batch)
+            for key, value in self._write_batch(document, batch).items():
+                totals[key] += value
+
+        removed = self._remove_stale_chunks(doc_id, totals["chunks"])
+        # Streamed sources are fingerprinted as they are read
+        changed = self.documents.update_ingestion_time(doc_id, source_hash or hasher.hexdigest())
+        unchanged = not (changed or totals["written"] or removed)
+        if not unchanged:
+            self.answer_cache.invalidate_docs([doc_id])
+        return {"doc_id": doc_id, **totals, "removed": removed, "unchanged": unchanged}
+
+    @staticmethod
+    def _hashed(pieces: Iterator[str], hasher) -> Iterator[str]:
+        for piece in pieces:
+            hasher.update(piece.encode("utf-8"))
+            yield piece
+
+    def _chunk_count(self, doc_id: str) -> int:
+        return self.chunks.conn.execute(
+            f"SELECT COUNT(*) FROM {self.chunks.table} WHERE doc_id = ?", (doc_id,)
+        ).fetchone()[0]
+
+    def _write_batch(self, document: Dict, batch: list) -> Dict[str, int]:
+        """Write the chunks of `batch` whose hash changed; returns the counts."""
+        doc_id = document["doc_id"]
+        for chunk in batch:
+            chunk["chunk_id"] = self.chunk_id(doc_id, chunk["chunk_index"])
+            chunk["content_hash"] = content_hash(chunk["text"])
+
+        stored = self.chunks.get_content_hashes([c["chunk_id"] for c in batch])
+        changed = [c for c in batch if stored.get(c["chunk_id"]) != c["content_hash"]]
+        if not changed:
+            return {"written": 0, "embedded": 0, "duplicates": 0}
+
+        duplicates = self._link_duplicates(changed) if self.dedup else 0
+        to_embed = [c for c in changed if not (self.dedup == 'skip' and c.get("canonical_chunk_id"))]
+
+        embedded = 0
+        if self.embed and to_embed:
+            vectors = self._reusable_vectors(to_embed)
+            missing = [i for i, vector in enumerate(vectors) if vector is None]
+            if missing:
+                fresh = self.embedder.embed([to_embed[i]["text"] for i in missing])
+                for i, vector in zip(missing, fresh):
+                    vectors[i] = vector
+                embedded = len(missing)
+            # Vectors first, so every stored chunk row already has its vector
+            self.store.add_vectors(
+                [c["chunk_id"] for c in to_embed], np.vstack(vectors),
+                doc_ids=[doc_id] * len(to_embed),
+                rbac_namespaces=[document.get("rbac_namespace")] * len(to_embed),
+            )
+        if self.embed and self.dedup == 'skip':
+            # A chunk that became a duplicate must not keep its old vector
+            skipped = [c["chunk_id"] for c in changed if c.get("canonical_chunk_id")]
+            if skipped:
+                self.store.delete_vectors(skipped)
+
+        self.chunks.create_many(
+            {
+                "chunk_id": c["chunk_id"],
+                "doc_id": doc_id,
+                "embedding_model": self.embedder.name if self.embed else None,
+                "embedding_version": self.embedder.version if self.embed else None,
+                "chunk_text": c["text"],
+                "content_hash": c["content_hash"],
+            }
+            for c in changed
+        )
+        return {"written": len(changed), "embedded": embedded, "duplicates": duplicates}
+
+    def _link_duplicates(self, changed: list) -> int:
+        """Index the changed chunks' MinHash signatures and link near-duplicates to their canonical chunk."""
+        self._requeue_orphans(self.dedup_index.remove([c["chunk_id"] for c in changed]))
+        index = self.dedup_index
+        matches = index.index_many([(c["chunk_id"], index.signature(c["text"])) for c in changed],
+                                   self.dedup_threshold)
+        duplicates = 0
+        for chunk, match in zip(changed, matches):
+            if match:
+                chunk["canonical_chunk_id"] = match[0]
+                duplicates += 1
+        return duplicates
+
+    def _requeue_orphans(self, orphaned: list) -> None:
+        """
+        Duplicates whose canonical chunk changed or went away stand on their own
+        again. Those stored without a vector are reset to no embedding model,
+        so EmbeddingMigrator picks them up as pending.
+        """
+        if not orphaned or self.store is None:
+            return
+        missing = [chunk_id for chunk_id in orphaned if self.store.get_vector(chunk_id) is None]
+        for start in range(0, len(missing), 500):
+            batch = missing[start:start + 500]
+            self.chunks._execute_write(f"""
+                UPDATE {self.chunks.table} SET embedding_model = NULL, embedding_version = NULL
+                WHERE chunk_id IN ({', '.join('?' for _ in batch)})
+            """, batch)
+
+    def _reusable_vectors(self, changed: list) -> list:
+        """
+        Stored vectors of identical text embedded by the same model, aligned
+        with `changed`. They are copied out before the batch writes anything,
+        so a chunk id about to be overwritten can still be the source: when
+        text shifts every later chunk to the next id, each one finds its
+        vector under its old id.
+        """
+        hashes = sorted({c["content_hash"] for c in changed})
+        cur = self.chunks.conn.execute(f"""
+            SELECT content_hash, chunk_id FROM {self.chunks.table}
+            WHERE content_hash IN ({', '.join('?' for _ in hashes)})
+              AND embedding_model IS ? AND embedding_version IS ?
+        """, hashes + [self.embedder.name, self.embedder.version])
+        source = {}
+        for row in cur.fetchall():
+            source.setdefault(row[0], row[1])
+
+        vectors = []
+        for chunk in changed:
+            chunk_id = source.get(chunk["content_hash"])
+            vectors.append(self.store.get_vector(chunk_id) if chunk_id else None)
+        return vectors
+
+    def _remove_stale_chunks(self, doc_id: str, chunk_count: int) -> int:
+        # Chunk ids are zero-padded indexes, so everything past the last one is stale
+        where, params = "doc_id = ?", [doc_id]
+        if chunk_count:
+            where += " AND chunk_id > ?"
+            params.append(self.chunk_id(doc_id, chunk_count - 1))
+        stale = [
+            row["chunk_id"] for row in self.chunks.iter_query(
+                f"SELECT chunk_id FROM {self.chunks.table} WHERE {where}", params
+            )
+        ]
+        for start in range(0, len(stale), 500):
+            batch = stale[start:start + 500]
+            self.chunks._execute_write(
+                f"DELETE FROM {self.chunks.table} WHERE chunk_id IN ({', '.join('?' for _ in batch)})", batch
+            )
+        if stale and self.store is not None:
+            self.store.delete_vectors(stale)
+        if stale and self.dedup:
+            self._requeue_orphans(self.dedup_index.remove(stale))
+        return len(stale)
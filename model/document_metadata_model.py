@@ -2,9 +2,27 @@ from .base_model import BaseModel
 import json
 import sqlite3
 from datetime import datetime
-from epoch_explorer.database.db.connection import get_connection
 import pandas as pd
 
+
+def _metadata_terms_select(doc_id: str, metadata_json: str, rows_from: str = "") -> str:
+    """
+    SELECT of (key, value, doc_id) rows for a metadata_json expression:
+    scalar top-level values as they are, and arrays one row per element.
+    `rows_from` ("table alias, ") names the rows being read, if any.
+    """
+    # Nested CASE: json_type() raises on invalid JSON, so test json_valid() first
+    source = (f"CASE WHEN json_valid({metadata_json}) THEN "
+              f"CASE WHEN json_type({metadata_json}) = 'object' THEN {metadata_json} END END")
+    return f"""
+        SELECT t.key, t.value, {doc_id} FROM {rows_from}json_each({source}) t
+        WHERE t.type IN ('text', 'integer', 'real')
+        UNION ALL
+        SELECT t.key, a.value, {doc_id} FROM {rows_from}json_each({source}) t, json_each(t.value) a
+        WHERE t.type = 'array' AND a.type IN ('text', 'integer', 'real')
+    """
+
+
 class DocumentMetadataModel(BaseModel):
     """
     Model for document_metadata table in optimized schema.
@@ -18,6 +36,47 @@ class DocumentMetadataModel(BaseModel):
         'rbac_namespace', 'chunk_strategy', 'chunk_size_char', 
         'overlap_char', 'metadata_json', 'last_ingested'
     ]
+    primary_key = 'doc_id'
+
+    # (key, value, doc_id) rows of metadata_json kept in step by triggers, so
+    # tag / keyword / doc_type lookups are index seeks instead of JSON scans
+    terms_table = 'document_metadata_terms'
+    terms_schema = [
+        f"""
+        CREATE TABLE IF NOT EXISTS document_metadata_terms (
+            key TEXT NOT NULL,
+            value TEXT NOT NULL COLLATE NOCASE,
+            doc_id TEXT NOT NULL,
+            PRIMARY KEY (key, value, doc_id)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_document_metadata_terms_doc ON document_metadata_terms (doc_id)",
+        # INSERT OR REPLACE does not fire the delete trigger, so inserts clear old terms too
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_document_metadata_terms_insert
+        AFTER INSERT ON document_metadata BEGIN
+            DELETE FROM document_metadata_terms WHERE doc_id = NEW.doc_id;
+            INSERT OR IGNORE INTO document_metadata_terms (key, value, doc_id)
+            {_metadata_terms_select("NEW.doc_id", "NEW.metadata_json")};
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_document_metadata_terms_update
+        AFTER UPDATE OF doc_id, metadata_json ON document_metadata BEGIN
+            DELETE FROM document_metadata_terms WHERE doc_id = OLD.doc_id;
+            INSERT OR IGNORE INTO document_metadata_terms (key, value, doc_id)
+            {_metadata_terms_select("NEW.doc_id", "NEW.metadata_json")};
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_document_metadata_terms_delete
+        AFTER DELETE ON document_metadata BEGIN
+            DELETE FROM document_metadata_terms WHERE doc_id = OLD.doc_id;
+        END
+        """,
+    ]
+    # Database files whose term index is known to exist
+    _terms_ready: set = set()
 
     def get_all_documents(self) -> pd.DataFrame:
         """
@@ -31,9 +90,7 @@ class DocumentMetadataModel(BaseModel):
         return df
     
     def __init__(self, conn=None):
-        """Initialize with optional connection. If none provided, create default connection."""
-        if conn is None:
-            conn = get_connection()
+        """Initialize with optional connection. If none provided, use the pooled connection."""
         super().__init__(conn)
 
     def create(self, doc_id: str, title: str, author: str = None, 
@@ -67,19 +124,41 @@ class DocumentMetadataModel(BaseModel):
             # Construct placeholders for the values
             placeholders = ", ".join(["?"] * len(self.fields))
             
-            self.conn.execute(f"""
+            self._execute_write(f"""
                 INSERT OR REPLACE INTO {self.table}
                 ({columns})
                 VALUES ({placeholders})
             """, data)
-            
-            self.conn.commit()
             return True
             
         except Exception as e:
             print(f"Error creating document metadata: {e}")
             return False
 
+    def create_many(self, records, chunk_size: int = None) -> dict:
+        """
+        Bulk INSERT OR REPLACE of document records (dicts with the same keys as `create`),
+        committed once per chunk. Returns {"count": n, "ids": [doc_id, ...]}.
+        """
+        now_iso = datetime.now().isoformat()
+        rows = (
+            (
+                r["doc_id"],
+                r["title"],
+                r.get("author") or "unknown",
+                r.get("source") or "ingestion",
+                r.get("summary") or "",
+                r.get("rbac_namespace", "general"),
+                r.get("chunk_strategy", "recursive_splitter"),
+                r.get("chunk_size_char", 512),
+                r.get("overlap_char", 50),
+                r.get("metadata_json") or json.dumps({}),
+                now_iso
+            )
+            for r in records
+        )
+        return self.upsert_many(rows, columns=self.fields, chunk_size=chunk_size)
+
     def _row_to_dict(self, row) -> dict | None:
         """Helper to convert sqlite3.Row or tuple to dictionary."""
         if row is None:
@@ -124,7 +203,11 @@ class DocumentMetadataModel(BaseModel):
             return []
 
     def get_by_namespace(self, rbac_namespace: str) -> list[dict]:
-        """Get document metadata by RBAC namespace."""
+        """Get document metadata by RBAC namespace (from its shard when RBAC_SHARDING is on)."""
+        if self._pooled:
+            from .namespace_shards import get_shards, sharding_enabled
+            if sharding_enabled():
+                return get_shards().get_by_namespace(rbac_namespace)
         try:
             cur = self.conn.execute(f"""
                 SELECT {', '.join(self.fields)}
@@ -139,39 +222,153 @@ class DocumentMetadataModel(BaseModel):
             print(f"Error getting documents by namespace: {e}")
             return []
 
+    def get_namespaces(self) -> list[str]:
+        """Distinct RBAC namespaces in use."""
+        try:
+            cur = self.conn.execute(f"""
+                SELECT DISTINCT rbac_namespace FROM {self.table}
+                WHERE rbac_namespace IS NOT NULL
+                ORDER BY rbac_namespace
+            """)
+            return [row[0] for row in cur.fetchall()]
+
+        except Exception as e:
+            print(f"Error getting namespaces: {e}")
+            return []
+
     def update_summary(self, doc_id: str, summary: str) -> bool:
         """Update the summary for a document."""
         try:
-            self.conn.execute(f"""
+            self._execute_write(f"""
                 UPDATE {self.table}
                 SET summary = ?
                 WHERE doc_id = ?
             """, (summary, doc_id))
-            
-            self.conn.commit()
             return True
             
         except Exception as e:
             print(f"Error updating summary: {e}")
             return False
 
-    def update_ingestion_time(self, doc_id: str) -> bool:
-        """Update the last_ingested timestamp for a document."""
+    def update_ingestion_time(self, doc_id: str, content_hash: str = None) -> bool:
+        """
+        Update the last_ingested timestamp for a document. With `content_hash`,
+        the row (timestamp and stored hash) is only touched when the hash differs.
+        Returns True if the row was updated.
+        """
         try:
             now_iso = datetime.now().isoformat()
-            self.conn.execute(f"""
-                UPDATE {self.table}
-                SET last_ingested = ?
-                WHERE doc_id = ?
-            """, (now_iso, doc_id))
-            
-            self.conn.commit()
-            return True
+            if content_hash is None:
+                _, rowcount = self._execute_write(f"""
+                    UPDATE {self.table}
+                    SET last_ingested = ?
+                    WHERE doc_id = ?
+                """, (now_iso, doc_id))
+            else:
+                self.ensure_hash_column()
+                _, rowcount = self._execute_write(f"""
+                    UPDATE {self.table}
+                    SET last_ingested = ?, content_hash = ?
+                    WHERE doc_id = ? AND content_hash IS NOT ?
+                """, (now_iso, content_hash, doc_id, content_hash))
+            return rowcount > 0
             
         except Exception as e:
             print(f"Error updating ingestion time: {e}")
             return False
 
+    def ensure_hash_column(self) -> None:
+        """Add content_hash, the fingerprint of the last ingested content, to older databases."""
+        if not self.has_column('content_hash'):
+            self.apply_migration([f"ALTER TABLE {self.table} ADD COLUMN content_hash TEXT"])
+
+    def get_content_hash(self, doc_id: str) -> str | None:
+        self.ensure_hash_column()
+        row = self.conn.execute(
+            f"SELECT content_hash FROM {self.table} WHERE doc_id = ?", (doc_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    # --- Metadata term index ---
+
+    def ensure_terms_index(self) -> None:
+        """
+        Create document_metadata_terms and its triggers, backfilled from the
+        existing rows, the first time it is needed (checked once per process
+        and database).
+        """
+        database = self.database_key()
+        if database in DocumentMetadataModel._terms_ready:
+            return
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_document_metadata_terms_delete'"
+        ).fetchone()
+        if not exists:
+            self.apply_migration(self.terms_schema + [
+                f"DELETE FROM {self.terms_table}",
+                f"""
+                INSERT OR IGNORE INTO {self.terms_table} (key, value, doc_id)
+                {_metadata_terms_select("d.doc_id", "d.metadata_json", f"{self.table} d, ")}
+                """,
+            ])
+        DocumentMetadataModel._terms_ready.add(database)
+
+    def find_by_term(self, key: str, value, rbac_namespace: str = None) -> list[dict]:
+        """
+        Documents whose metadata_json has `value` under `key`, either as the
+        value itself or as an element of a list (case-insensitive).
+        """
+        try:
+            self.ensure_terms_index()
+            where, params = "t.key = ? AND t.value = ?", [key, str(value)]
+            if rbac_namespace is not None:
+                where += " AND d.rbac_namespace = ?"
+                params.append(rbac_namespace)
+            cur = self.conn.execute(f"""
+                SELECT {', '.join('d.' + f for f in self.fields)}
+                FROM {self.terms_table} t
+                JOIN {self.table} d ON d.doc_id = t.doc_id
+                WHERE {where}
+                ORDER BY d.last_ingested DESC
+            """, params)
+            return [self._row_to_dict(row) for row in cur.fetchall()]
+
+        except Exception as e:
+            print(f"Error finding documents by {key}: {e}")
+            return []
+
+    def find_by_tag(self, tag: str, rbac_namespace: str = None) -> list[dict]:
+        """Get documents tagged with `tag`."""
+        return self.find_by_term('tags', tag, rbac_namespace)
+
+    def find_by_keyword(self, keyword: str, rbac_namespace: str = None) -> list[dict]:
+        """Get documents listing `keyword` in their keywords."""
+        return self.find_by_term('keywords', keyword, rbac_namespace)
+
+    def find_by_doc_type(self, doc_type: str, rbac_namespace: str = None) -> list[dict]:
+        """Get documents of the given doc_type."""
+        return self.find_by_term('doc_type', doc_type, rbac_namespace)
+
+    def find_by_category(self, category: str, rbac_namespace: str = None) -> list[dict]:
+        """Get documents in the given category."""
+        return self.find_by_term('categories', category, rbac_namespace)
+
+    def get_term_counts(self, key: str) -> dict:
+        """{value: document count} for one metadata key, e.g. all tags in use."""
+        try:
+            self.ensure_terms_index()
+            cur = self.conn.execute(f"""
+                SELECT value, COUNT(*) FROM {self.terms_table}
+                WHERE key = ?
+                GROUP BY value
+                ORDER BY COUNT(*) DESC, value
+            """, (key,))
+            return {row[0]: row[1] for row in cur.fetchall()}
+
+        except Exception as e:
+            print(f"Error counting metadata {key}: {e}")
+            return {}
+
     def get_total_count(self) -> int:
         """Get the total count of documents in the database."""
         try:
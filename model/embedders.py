@@ -0,0 +1,88 @@
+import hashlib
+import os
+import re
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbedder:
+    """
+    Deterministic, dependency-free text embedder.
+
+    Word unigrams and bigrams are hashed into `dim` buckets with a signed
+    feature-hashing trick and the result is L2-normalised. It has no model
+    weights and needs no network, so it doubles as an offline embedder for the
+    local vector store and as a reproducible stand-in in tests.
+    """
+
+    name = 'local-hashing'
+    version = '1'
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        tokens = _TOKEN_RE.findall((text or "").lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dim] += 1.0 if (value >> 63) else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed a batch of texts into an (N x dim) float32 matrix."""
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.vstack([self.embed_one(text) for text in texts])
+
+
+class SentenceTransformerEmbedder:
+    """Local sentence-transformers model; needs the optional sentence-transformers package."""
+
+    name = 'local-sentence-transformer'
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+        self.version = model_name
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(list(texts), normalize_embeddings=True), dtype=np.float32)
+
+    def embed_one(self, text: str) -> np.ndarray:
+        return self.embed([text])[0]
+
+
+# name -> factory(**options); anything with .name, .version, .dim and .embed(texts) fits
+EMBEDDERS: Dict[str, Callable] = {
+    HashingEmbedder.name: HashingEmbedder,
+    SentenceTransformerEmbedder.name: SentenceTransformerEmbedder,
+}
+
+
+def register_embedder(name: str, factory: Callable) -> None:
+    EMBEDDERS[name] = factory
+
+
+def create_embedder(name: str, **options):
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder '{name}'. Available: {', '.join(sorted(EMBEDDERS))}")
+    return EMBEDDERS[name](**options)
+
+
+def get_embedder():
+    """Embedder used for local retrieval, chosen by EMBEDDING_BACKEND."""
+    name = os.getenv("EMBEDDING_BACKEND", HashingEmbedder.name)
+    if name == HashingEmbedder.name:
+        return HashingEmbedder(dim=int(os.getenv("EMBEDDING_DIM", "384")))
+    return create_embedder(name)
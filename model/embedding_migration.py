@@ -0,0 +1,269 @@
+from .base_model import BaseModel
+from .chunk_embedding_data_model import ChunkEmbeddingDataModel
+from .embedders import create_embedder
+from .vector_store import VectorStore
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+class EmbeddingMigrationModel(BaseModel):
+    """
+    Model for embedding_migrations: one row per target (model, version) with
+    the progress counters of the re-embedding runs that move chunks onto it.
+    """
+
+    table = 'embedding_migrations'
+    fields = [
+        'migration_id', 'target_model', 'target_version', 'status', 'pending_at_start',
+        'processed', 'failed', 'skipped', 'last_chunk_id', 'started_at', 'updated_at', 'finished_at'
+    ]
+    primary_key = 'migration_id'
+
+    schema = [
+        """
+        CREATE TABLE IF NOT EXISTS embedding_migrations (
+            migration_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            target_model TEXT NOT NULL,
+            target_version TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            pending_at_start INTEGER NOT NULL DEFAULT 0,
+            processed INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            skipped INTEGER NOT NULL DEFAULT 0,
+            last_chunk_id TEXT,
+            started_at TEXT,
+            updated_at TEXT,
+            finished_at TEXT,
+            UNIQUE (target_model, target_version)
+        )
+        """,
+    ]
+
+    def ensure_schema(self) -> None:
+        if not self.columns():
+            self.apply_migration(self.schema)
+
+    def start(self, target_model: str, target_version: str, pending: int) -> int:
+        """Open (or reopen, keeping its counters) the migration to a target; returns its id."""
+        self.ensure_schema()
+        now_iso = datetime.now().isoformat()
+
+        def work(conn):
+            conn.execute(f"""
+                INSERT INTO {self.table} (target_model, target_version, status, pending_at_start,
+                                          started_at, updated_at)
+                VALUES (?, ?, 'running', ?, ?, ?)
+                ON CONFLICT (target_model, target_version) DO UPDATE SET
+                    status = 'running',
+                    pending_at_start = excluded.pending_at_start,
+                    updated_at = excluded.updated_at,
+                    finished_at = NULL
+            """, (target_model, target_version, pending, now_iso, now_iso))
+            return conn.execute(
+                f"SELECT migration_id FROM {self.table} WHERE target_model = ? AND target_version = ?",
+                (target_model, target_version)
+            ).fetchone()[0]
+
+        return self._run_write(work)
+
+    def record_progress(self, conn, migration_id: int, processed: int = 0, failed: int = 0,
+                        skipped: int = 0, last_chunk_id: str = None) -> None:
+        """Bump the counters inside the caller's transaction."""
+        conn.execute(f"""
+            UPDATE {self.table}
+            SET processed = processed + ?, failed = failed + ?, skipped = skipped + ?,
+                last_chunk_id = COALESCE(?, last_chunk_id), updated_at = ?
+            WHERE migration_id = ?
+        """, (processed, failed, skipped, last_chunk_id, datetime.now().isoformat(), migration_id))
+
+    def finish(self, migration_id: int, status: str = 'completed') -> None:
+        now_iso = datetime.now().isoformat()
+        self._execute_write(f"""
+            UPDATE {self.table} SET status = ?, updated_at = ?, finished_at = ?
+            WHERE migration_id = ?
+        """, (status, now_iso, now_iso, migration_id))
+
+    def get_by_target(self, target_model: str, target_version: str) -> Optional[Dict]:
+        self.ensure_schema()
+        cur = self.conn.execute(
+            f"SELECT * FROM {self.table} WHERE target_model = ? AND target_version = ?",
+            (target_model, target_version)
+        )
+        return self._row_to_dict(cur.fetchone())
+
+
+# Embedder owned by each pool worker process, built once by _init_worker
+_worker_embedder = None
+
+
+def _init_worker(name: str, options: Dict) -> None:
+    global _worker_embedder
+    _worker_embedder = create_embedder(name, **options)
+
+
+def _embed_batch(texts: List[str]):
+    return _worker_embedder.embed(texts)
+
+
+class EmbeddingMigrator:
+    """
+    Re-embeds every chunk whose embedding_model / embedding_version differs
+    from the target embedder's.
+
+    Pending chunks are read in chunk_id order, `batch_size` at a time, and
+    embedded in a process pool of `workers` processes (0 embeds in-process).
+    Each finished batch has its vectors written to the vector store first. Its
+    chunk rows are then moved to the target model / version in one
+    transaction. Those columns are the checkpoint: a restarted run only picks
+    up the chunks that were not finished. Chunks without chunk_text are
+    counted as skipped.
+    """
+
+    def __init__(self, embedder_name: str, embedder_options: Dict = None,
+                 target_version: str = None, conn=None, workers: int = None,
+                 batch_size: int = 64, store_path: str = None):
+        self.embedder_name = embedder_name
+        self.embedder_options = embedder_options or {}
+        self.embedder = create_embedder(embedder_name, **self.embedder_options)
+        self.target_model = self.embedder.name
+        self.target_version = target_version or self.embedder.version
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.batch_size = batch_size
+
+        self.chunks = ChunkEmbeddingDataModel(conn)
+        self.store = VectorStore(conn, store_path)
+        self.migrations = EmbeddingMigrationModel(conn)
+
+    # --- Progress ---
+
+    def _pending_filter(self) -> str:
+        return "(c.embedding_model IS NOT ? OR c.embedding_version IS NOT ?)"
+
+    def pending_count(self) -> int:
+        cur = self.chunks.conn.execute(f"""
+            SELECT COUNT(*) FROM {self.chunks.table} c WHERE {self._pending_filter()}
+        """, (self.target_model, self.target_version))
+        return cur.fetchone()[0]
+
+    def _iter_batches(self, limit: int = None) -> Iterator[List[Dict]]:
+        # Keyset over chunk_id so failed or skipped chunks are not re-read in this run
+        last_id, remaining = '', limit
+        while remaining is None or remaining > 0:
+            size = self.batch_size if remaining is None else min(self.batch_size, remaining)
+            rows = list(self.chunks.iter_query(f"""
+                SELECT c.chunk_id, c.doc_id, c.chunk_text, d.rbac_namespace
+                FROM {self.chunks.table} c
+                LEFT JOIN document_metadata d ON d.doc_id = c.doc_id
+                WHERE c.chunk_id > ? AND {self._pending_filter()}
+                ORDER BY c.chunk_id
+                LIMIT ?
+            """, (last_id, self.target_model, self.target_version, size)))
+            if not rows:
+                return
+            last_id = rows[-1]['chunk_id']
+            if remaining is not None:
+                remaining -= len(rows)
+            yield rows
+
+    # --- Run ---
+
+    def run(self, limit: int = None, progress: Callable[[Dict], None] = None) -> Dict:
+        """
+        Migrate up to `limit` pending chunks (all by default). `progress` is
+        called with the running totals after every batch. Returns the totals.
+        """
+        self.chunks.ensure_text_column()
+        if self.store.file.dim not in (None, self.embedder.dim):
+            raise ValueError(
+                f"Vector store at {self.store.path} holds {self.store.file.dim}-d vectors; "
+                f"{self.target_model} produces {self.embedder.dim}-d. Use a new store_path."
+            )
+
+        migration_id = self.migrations.start(self.target_model, self.target_version, self.pending_count())
+        totals = {"processed": 0, "failed": 0, "skipped": 0}
+
+        def handle(rows, vectors=None, error=None):
+            if error is not None:
+                print(f"Error re-embedding batch ending at {rows[-1]['chunk_id']}: {error}")
+                self._record(migration_id, rows, failed=len(rows))
+                totals["failed"] += len(rows)
+            else:
+                self._commit(migration_id, rows, vectors)
+                totals["processed"] += len(rows)
+            if progress:
+                progress(dict(totals))
+
+        try:
+            batches = self._with_text(self._iter_batches(limit), migration_id, totals)
+            if self.workers == 0:
+                for rows in batches:
+                    try:
+                        vectors = self.embedder.embed([r['chunk_text'] for r in rows])
+                    except Exception as e:
+                        handle(rows, error=e)
+                        continue
+                    handle(rows, vectors)
+            else:
+                with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                         initargs=(self.embedder_name, self.embedder_options)) as pool:
+                    in_flight = {}
+                    for rows in batches:
+                        # Bounded look-ahead keeps memory flat on large corpora
+                        while len(in_flight) >= self.workers * 2:
+                            self._drain(in_flight, handle, FIRST_COMPLETED)
+                        in_flight[pool.submit(_embed_batch, [r['chunk_text'] for r in rows])] = rows
+                    while in_flight:
+                        self._drain(in_flight, handle, FIRST_COMPLETED)
+        except BaseException:
+            self.migrations.finish(migration_id, 'interrupted')
+            raise
+
+        self.migrations.finish(migration_id, 'completed' if self.pending_count() == 0 else 'partial')
+        return totals
+
+    @staticmethod
+    def _drain(in_flight: Dict, handle: Callable, return_when) -> None:
+        done, _ = wait(list(in_flight), return_when=return_when)
+        for future in done:
+            rows = in_flight.pop(future)
+            try:
+                vectors = future.result()
+            except Exception as e:
+                handle(rows, error=e)
+                continue
+            handle(rows, vectors)
+
+    def _with_text(self, batches: Iterator[List[Dict]], migration_id: int, totals: Dict) -> Iterator[List[Dict]]:
+        for rows in batches:
+            with_text = [r for r in rows if r['chunk_text']]
+            skipped = len(rows) - len(with_text)
+            if skipped:
+                self._record(migration_id, rows, skipped=skipped)
+                totals["skipped"] += skipped
+            if with_text:
+                yield with_text
+
+    def _record(self, migration_id: int, rows: List[Dict], **counts) -> None:
+        self.chunks._run_write(
+            lambda conn: self.migrations.record_progress(conn, migration_id, last_chunk_id=rows[-1]['chunk_id'], **counts)
+        )
+
+    def _commit(self, migration_id: int, rows: List[Dict], vectors) -> None:
+        chunk_ids = [r['chunk_id'] for r in rows]
+        # Vectors first: a crash before the row update just re-embeds this batch
+        self.store.add_vectors(chunk_ids, vectors,
+                               doc_ids=[r['doc_id'] for r in rows],
+                               rbac_namespaces=[r['rbac_namespace'] for r in rows])
+
+        def work(conn):
+            conn.executemany(f"""
+                UPDATE {self.chunks.table}
+                SET embedding_model = ?, embedding_version = ?
+                WHERE chunk_id = ?
+            """, [(self.target_model, self.target_version, chunk_id) for chunk_id in chunk_ids])
+            self.migrations.record_progress(conn, migration_id, processed=len(chunk_ids),
+                                            last_chunk_id=chunk_ids[-1])
+
+        self.chunks._run_write(work)
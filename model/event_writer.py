@@ -0,0 +1,140 @@
+import atexit
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class EventWriter:
+    """
+    Background, bounded-queue batch writer for telemetry events.
+
+    `submit` only enqueues, so the caller pays for a queue put rather than an
+    INSERT and commit. A worker thread drains the queue and hands batches to
+    `sink(events)` whenever `batch_size` events are waiting or
+    `flush_interval` seconds have passed. When the queue is full, `submit`
+    waits up to `put_timeout` seconds (back-pressure) and then drops the event,
+    counting it in `stats()["dropped"]`. Pending events are flushed on `close()`
+    and at interpreter exit.
+    """
+
+    def __init__(self, sink: Callable[[List[Any]], None], max_queue: int = 10000,
+                 batch_size: int = 200, flush_interval: float = 1.0,
+                 put_timeout: float = 0.0, name: str = "event-writer"):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {
+            "submitted": 0,
+            "written": 0,
+            "dropped": 0,
+            "failed": 0,
+            "batches": 0,
+        }
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # --- Public API ---
+
+    def submit(self, event: Any) -> bool:
+        """Queue one event; returns False if it had to be dropped."""
+        if self._closed:
+            self._count("dropped")
+            return False
+        try:
+            if self.put_timeout > 0:
+                self._queue.put(event, timeout=self.put_timeout)
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("submitted")
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything queued before this call has reached the sink."""
+        if self._closed:
+            return True
+        done = threading.Event()
+        # Control markers bypass the size limit so a full queue cannot deadlock a flush
+        with self._queue.not_empty:
+            self._queue.queue.append(_Flush(done))
+            self._queue.not_empty.notify()
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """Flush pending events and stop the worker thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        with self._queue.not_empty:
+            self._queue.queue.append(_STOP)
+            self._queue.not_empty.notify()
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            snapshot = dict(self._stats)
+        snapshot["pending"] = self._queue.qsize()
+        return snapshot
+
+    # --- Worker ---
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += n
+
+    def _run(self) -> None:
+        batch: List[Any] = []
+        deadline = time.monotonic() + self.flush_interval
+
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, _Flush) or item is _STOP:
+                self._write(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+                if item is _STOP:
+                    return
+                item.done.set()
+                continue
+
+            if item is not None:
+                batch.append(item)
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._write(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _write(self, batch: List[Any]) -> None:
+        if not batch:
+            return
+        try:
+            self.sink(batch)
+            self._count("written", len(batch))
+            self._count("batches")
+        except Exception as e:
+            self._count("failed", len(batch))
+            print(f"Error writing event batch: {e}")
+
+
+class _Flush:
+    def __init__(self, done: threading.Event):
+        self.done = done
+
+
+_STOP = object()
@@ -0,0 +1,29 @@
+import re
+from typing import Optional
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def match_any(text: str, max_terms: int = 32) -> Optional[str]:
+    """
+    FTS5 MATCH expression matching any word of free text: its first
+    `max_terms` distinct tokens, quoted and OR-ed, so user input can never be
+    read as FTS5 syntax. None when the text has no words.
+    """
+    terms = []
+    for token in _TOKEN_RE.findall((text or "").lower()):
+        if token not in terms:
+            terms.append(token)
+            if len(terms) == max_terms:
+                break
+    if not terms:
+        return None
+    return "(" + " OR ".join(f'"{t}"' for t in terms) + ")"
+
+
+def match_phrase_start(column: str, value: str) -> Optional[str]:
+    """FTS5 filter for `column` starting with the words of `value`."""
+    tokens = _TOKEN_RE.findall((value or "").lower())
+    if not tokens:
+        return None
+    return f'{column} : ^"{" ".join(tokens)}"'
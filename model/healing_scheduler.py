@@ -0,0 +1,233 @@
+from .chunk_embedding_data_model import ChunkEmbeddingDataModel
+from .rag_history_model import RAGHistoryModel
+import heapq
+import itertools
+import json
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+
+class HealingScheduler:
+    """
+    Priority-queue scheduler for chunk healing.
+
+    Candidates (quality_score below `threshold`) are pulled worst-first in
+    pages of `refill_size` along the quality_score index, scored and pushed on
+    a heap, so a cycle never scans the whole table. Priority combines:
+      - quality deficit (1 - quality_score)
+      - time since last_healed (saturating after `age_horizon_days`)
+      - how often the chunk's document was queried in the last `query_window_days`
+      - a penalty for chunks that have already been reindexed many times
+    Jobs run `handler(chunk, suggestion)` on a thread pool of `max_workers`,
+    with at most `per_doc_limit` concurrent jobs per document. The handler
+    returns a dict that may hold `quality_score` (after healing) and `action`.
+    Outcomes update the chunk and are logged through RAGHistoryModel.log_healing.
+    """
+
+    weights = {"quality": 1.0, "age": 0.3, "frequency": 0.5, "reindex": 0.4}
+
+    def __init__(self, handler: Callable[[Dict, Dict], Dict], conn=None, threshold: float = 0.7,
+                 max_workers: int = 4, per_doc_limit: int = 1, refill_size: int = 200,
+                 query_window_days: int = 7, age_horizon_days: int = 30,
+                 agent_id: str = "rl_healing_agent"):
+        self.handler = handler
+        self.threshold = threshold
+        self.max_workers = max_workers
+        self.per_doc_limit = per_doc_limit
+        self.refill_size = refill_size
+        self.query_window_days = query_window_days
+        self.age_horizon_days = age_horizon_days
+        self.agent_id = agent_id
+
+        self.chunks = ChunkEmbeddingDataModel(conn)
+        self.chunks.ensure_indexes()
+        self.history = RAGHistoryModel(conn)
+
+        # (-priority, seq, chunk) entries; seq keeps heap ordering stable
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._queued: set = set()
+        # Keyset cursor (quality_score, chunk_id) of the last candidate read
+        self._cursor: Optional[tuple] = None
+        self._stop = threading.Event()
+
+    # --- Queue ---
+
+    def _fetch_candidates(self) -> List[Dict]:
+        where, params = "quality_score < ?", [self.threshold]
+        if self._cursor is not None:
+            where += " AND (quality_score, chunk_id) > (?, ?)"
+            params.extend(self._cursor)
+        rows = list(self.chunks.iter_query(f"""
+            SELECT chunk_id, doc_id, quality_score, reindex_count, healing_suggestions, last_healed
+            FROM {self.chunks.table}
+            WHERE {where}
+            ORDER BY quality_score, chunk_id
+            LIMIT ?
+        """, params + [self.refill_size]))
+        # An exhausted cursor starts the next pass from the worst chunk again
+        self._cursor = (rows[-1]['quality_score'], rows[-1]['chunk_id']) if rows else None
+        return rows
+
+    def _query_frequency(self, doc_ids: List[str]) -> Dict[str, int]:
+        if not doc_ids:
+            return {}
+        since = (datetime.now() - timedelta(days=self.query_window_days)).isoformat()
+        placeholders = ', '.join('?' for _ in doc_ids)
+        cur = self.history.conn.execute(f"""
+            SELECT target_doc_id, COUNT(*)
+            FROM {self.history.partitions().source_for(since)}
+            WHERE target_doc_id IN ({placeholders}) AND timestamp >= ? AND event_type = 'QUERY'
+            GROUP BY target_doc_id
+        """, list(doc_ids) + [since])
+        return {row[0]: row[1] for row in cur.fetchall()}
+
+    def priority(self, chunk: Dict, query_count: int, max_query_count: int) -> float:
+        quality = chunk.get('quality_score') or 0.0
+        age_days = self.age_horizon_days
+        if chunk.get('last_healed'):
+            try:
+                healed = datetime.fromisoformat(str(chunk['last_healed']).replace(' ', 'T'))
+                age_days = (datetime.now() - healed).total_seconds() / 86400
+            except ValueError:
+                pass
+        frequency = math.log1p(query_count) / math.log1p(max_query_count) if max_query_count else 0.0
+
+        return (
+            self.weights["quality"] * (1.0 - quality)
+            + self.weights["age"] * min(max(age_days, 0.0) / self.age_horizon_days, 1.0)
+            + self.weights["frequency"] * frequency
+            - self.weights["reindex"] * min((chunk.get('reindex_count') or 0) / 5.0, 1.0)
+        )
+
+    def refill(self) -> int:
+        """Score the next page of candidates onto the heap; returns how many were added."""
+        rows = [r for r in self._fetch_candidates() if r['chunk_id'] not in self._queued]
+        counts = self._query_frequency(sorted({r['doc_id'] for r in rows if r['doc_id']}))
+        max_count = max(counts.values(), default=0)
+        for row in rows:
+            score = self.priority(row, counts.get(row['doc_id'], 0), max_count)
+            heapq.heappush(self._heap, (-score, next(self._seq), row))
+            self._queued.add(row['chunk_id'])
+        return len(rows)
+
+    def _pop(self, running_docs: Dict[str, int]) -> Optional[tuple]:
+        """Highest-priority chunk whose document is under its concurrency limit."""
+        deferred, picked = [], None
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            if running_docs.get(entry[2]['doc_id'], 0) < self.per_doc_limit:
+                picked = entry
+                break
+            deferred.append(entry)
+        for entry in deferred:
+            heapq.heappush(self._heap, entry)
+        return picked
+
+    # --- Dispatch ---
+
+    def run_cycle(self, max_jobs: int = None) -> Dict[str, int]:
+        """
+        Heal candidates in priority order until the queue is drained (or
+        `max_jobs` have been dispatched). Returns counters for the cycle.
+        """
+        stats = {"dispatched": 0, "healed": 0, "failed": 0}
+        running: Dict = {}
+        running_docs: Dict[str, int] = {}
+
+        if not self._heap:
+            self.refill()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="healing") as pool:
+            while not self._stop.is_set():
+                while len(running) < self.max_workers and (max_jobs is None or stats["dispatched"] < max_jobs):
+                    if len(self._heap) < self.max_workers and self._cursor is not None:
+                        self.refill()
+                    entry = self._pop(running_docs)
+                    if entry is None:
+                        break
+                    neg_priority, _, chunk = entry
+                    suggestion = _parse_json(chunk.get('healing_suggestions'))
+                    future = pool.submit(self._timed, chunk, suggestion)
+                    running[future] = (chunk, suggestion, -neg_priority)
+                    running_docs[chunk['doc_id']] = running_docs.get(chunk['doc_id'], 0) + 1
+                    stats["dispatched"] += 1
+
+                if not running:
+                    break
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk, suggestion, priority = running.pop(future)
+                    running_docs[chunk['doc_id']] -= 1
+                    self._queued.discard(chunk['chunk_id'])
+                    ok = self._record(chunk, suggestion, priority, *future.result())
+                    stats["healed" if ok else "failed"] += 1
+
+        return stats
+
+    def run_forever(self, interval: float = 60.0) -> None:
+        """Run cycles every `interval` seconds until stop() is called."""
+        while not self._stop.is_set():
+            self.run_cycle()
+            self._stop.wait(interval)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _timed(self, chunk: Dict, suggestion: Dict) -> tuple:
+        started = time.perf_counter()
+        try:
+            outcome, error = self.handler(chunk, suggestion) or {}, None
+        except Exception as e:
+            outcome, error = {}, str(e)
+        return outcome, error, (time.perf_counter() - started) * 1000
+
+    def _record(self, chunk: Dict, suggestion: Dict, priority: float,
+                outcome: Dict, error: Optional[str], duration_ms: float) -> bool:
+        quality_before = chunk.get('quality_score')
+        quality_after = outcome.get('quality_score')
+        action = outcome.get('action') or suggestion.get('strategy') or 're_embed'
+
+        if error is None:
+            if quality_after is not None:
+                self.chunks.update_quality_score(chunk['chunk_id'], quality_after)
+            self.chunks.increment_reindex_count(chunk['chunk_id'])
+        else:
+            print(f"Error healing chunk {chunk['chunk_id']}: {error}")
+
+        # improvement_delta stays null when either quality score is unknown
+        delta = None
+        if error is None and quality_after is not None and quality_before is not None:
+            delta = quality_after - quality_before
+        reward = delta or 0.0
+        self.history.log_healing(
+            target_doc_id=chunk['doc_id'],
+            target_chunk_id=chunk['chunk_id'],
+            metrics_json=json.dumps({
+                "quality_before": quality_before,
+                "quality_after": quality_after,
+                "improvement_delta": delta,
+                "priority": round(priority, 4),
+                "latency": round(duration_ms, 2),
+            }),
+            context_json=json.dumps({"suggestion": suggestion, "error": error}),
+            action_taken=action.upper(),
+            reward_signal=reward,
+            agent_id=self.agent_id,
+        )
+        return error is None
+
+
+def _parse_json(value) -> Dict:
+    if not value:
+        return {}
+    try:
+        parsed = json.loads(value)
+    except (TypeError, ValueError):
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
@@ -0,0 +1,289 @@
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without a network call while an endpoint's circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `failure_threshold` failures in a row the circuit opens and calls
+    are refused for `reset_timeout` seconds. After that one trial call is let
+    through (half-open). Its success closes the circuit again; its failure
+    re-opens it for another `reset_timeout`.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._cooled_down():
+                return self.HALF_OPEN
+            return self._state
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets a trial call through."""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if not self._cooled_down():
+                    return False
+                self._state = self.HALF_OPEN
+            # Half-open: a single trial call at a time
+            if self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self) -> bool:
+        """Count a failure; returns True if it opened the circuit."""
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                opened = self._state != self.OPEN
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                return opened
+            return False
+
+    def _cooled_down(self) -> bool:
+        return time.monotonic() - self._opened_at >= self.reset_timeout
+
+
+class HttpClient:
+    """
+    Keep-alive HTTP client for one service (the RAG API, Ollama, Chroma).
+
+    One requests.Session per client keeps up to `pool_size` connections open,
+    shared by every thread. Every call has a (connect, read) timeout.
+    Connection errors, timeouts and `retry_statuses` responses are retried
+    up to `retries` times with full-jitter exponential backoff. Only
+    idempotent methods are retried, or a POST the caller marks
+    `idempotent=True`. A streamed response is only retried until its
+    headers arrive. Failures feed a CircuitBreaker, so a dead backend is
+    refused immediately instead of holding a worker thread for a timeout.
+    """
+
+    IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+    def __init__(self, base_url: str, name: str = None, connect_timeout: float = 3.05,
+                 read_timeout: float = 30.0, retries: int = 2, backoff: float = 0.2,
+                 max_backoff: float = 2.0, retry_statuses=(429, 502, 503, 504),
+                 failure_threshold: int = 5, reset_timeout: float = 30.0, pool_size: int = 16):
+        self.base_url = base_url.rstrip("/")
+        self.name = name or self.base_url
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = frozenset(retry_statuses)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        self.session = requests.Session()
+        # Retries are handled here, not by urllib3, so they are counted and jittered
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "attempts": 0,
+            "retries": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "server_errors": 0,
+            "rejected": 0,
+            "circuit_opened": 0,
+            "total_latency_ms": 0.0,
+            "max_latency_ms": 0.0,
+        }
+
+    # --- Public API ---
+
+    def request(self, method: str, path: str, timeout=None, idempotent: bool = None,
+                **kwargs) -> requests.Response:
+        """
+        Send `method` to base_url + `path`; `kwargs` go to requests
+        (json=, params=, stream=, headers=, ...). Returns the last response,
+        even an error status. Raises CircuitOpenError while the circuit is
+        open, the final Timeout / ConnectionError once retries run out, or any
+        other RequestException straight away.
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in self.IDEMPOTENT_METHODS
+        attempts = 1 + (self.retries if idempotent else 0)
+        url = f"{self.base_url}/{path.lstrip('/')}" if path else self.base_url
+        self._count("requests")
+
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                self._count("rejected")
+                raise CircuitOpenError(
+                    f"{self.name} circuit is open; retry in {self.breaker.retry_after():.0f}s"
+                )
+            if attempt:
+                self._count("retries")
+            self._count("attempts")
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                self._observe(started)
+                self._count("timeouts" if isinstance(e, requests.exceptions.Timeout) else "errors")
+                self._failure()
+                if attempt + 1 == attempts:
+                    raise
+                self._sleep(attempt)
+                continue
+            except requests.exceptions.RequestException:
+                # Not retried, but still settles the breaker so a half-open trial never sticks
+                self._observe(started)
+                self._count("errors")
+                self._failure()
+                raise
+
+            self._observe(started)
+            if response.status_code >= 500 or response.status_code in self.retry_statuses:
+                if response.status_code >= 500:
+                    self._count("server_errors")
+                    self._failure()
+                else:
+                    # Throttling says nothing about the backend's health
+                    self.breaker.record_success()
+                if attempt + 1 < attempts and response.status_code in self.retry_statuses:
+                    response.close()
+                    self._sleep(attempt, response.headers.get("Retry-After"))
+                    continue
+                return response
+
+            self.breaker.record_success()
+            return response
+
+    def get(self, path: str = "", **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str = "", **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of request, retry, error and latency counters, plus the circuit state."""
+        with self._lock:
+            snapshot = dict(self._stats)
+        snapshot["name"] = self.name
+        snapshot["base_url"] = self.base_url
+        snapshot["circuit"] = self.breaker.state
+        snapshot["avg_latency_ms"] = (
+            snapshot["total_latency_ms"] / snapshot["attempts"] if snapshot["attempts"] else 0.0
+        )
+        return snapshot
+
+    def close(self) -> None:
+        self.session.close()
+
+    # --- Internals ---
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def _observe(self, started: float) -> None:
+        # Time to response headers; a streamed body is read later by the caller
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._stats["total_latency_ms"] += elapsed
+            self._stats["max_latency_ms"] = max(self._stats["max_latency_ms"], elapsed)
+
+    def _failure(self) -> None:
+        if self.breaker.record_failure():
+            self._count("circuit_opened")
+
+    def _sleep(self, attempt: int, retry_after: str = None) -> None:
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), self.max_backoff))
+        time.sleep(delay)
+
+
+def _endpoint_urls() -> Dict[str, Optional[str]]:
+    chroma_host = os.getenv("CHROMA_HOST")
+    return {
+        "api": os.getenv("API_URL", "http://localhost:8001"),
+        "ollama": os.getenv("OLLAMA_URL"),
+        "chroma": f"http://{chroma_host}:{os.getenv('CHROMA_PORT', '8000')}" if chroma_host else None,
+    }
+
+
+# Per-endpoint defaults; each is overridable as HTTP_<ENDPOINT>_<SETTING>
+_ENDPOINT_DEFAULTS = {
+    # /query waits for LLM generation
+    "api": {"read_timeout": 120.0},
+    "ollama": {"read_timeout": 120.0},
+    "chroma": {"read_timeout": 10.0},
+}
+
+_clients: Dict[str, HttpClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(endpoint: str) -> HttpClient:
+    """Process-wide client for a configured endpoint: 'api', 'ollama' or 'chroma'."""
+    client = _clients.get(endpoint)
+    if client is not None:
+        return client
+    with _clients_lock:
+        if endpoint not in _clients:
+            base_url = _endpoint_urls().get(endpoint)
+            if not base_url:
+                raise ValueError(f"No URL configured for HTTP endpoint '{endpoint}'")
+            options = dict(_ENDPOINT_DEFAULTS.get(endpoint, {}))
+            prefix = f"HTTP_{endpoint.upper()}_"
+            for setting, cast in (("connect_timeout", float), ("read_timeout", float),
+                                  ("retries", int), ("failure_threshold", int),
+                                  ("reset_timeout", float), ("pool_size", int)):
+                value = os.getenv(prefix + setting.upper())
+                if value:
+                    options[setting] = cast(value)
+            _clients[endpoint] = HttpClient(base_url, name=endpoint, **options)
+        return _clients[endpoint]
+
+
+def client_stats() -> list:
+    """Counters of every client created so far."""
+    with _clients_lock:
+        clients = list(_clients.values())
+    return [client.stats() for client in clients]
@@ -0,0 +1,174 @@
+from .chunk_embedding_data_model import ChunkEmbeddingDataModel
+from .embedders import get_embedder
+from .rag_history_model import RAGHistoryModel
+from .vector_store import VectorStore
+import heapq
+import json
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+class HybridRetriever:
+    """
+    In-process hybrid retrieval over the chunk store.
+
+    Two candidate pools are built for a question: the `lexical_k` best chunks
+    by BM25 over chunk_text (ChunkEmbeddingDataModel.search_text) and the
+    `vector_k` nearest chunk embeddings (VectorStore.search). Both are
+    filtered by rbac_namespace. They are fused with reciprocal-rank fusion:
+    each chunk scores sum(weight / (rrf_k + rank)) over the pools it appears
+    in. So chunks found by both rise to the top, and neither score scale has
+    to be calibrated against the other. Per-stage timings and pool sizes are
+    logged as a QUERY event through `history` (a RAGHistoryModel on `conn`
+    by default).
+    """
+
+    def __init__(self, conn=None, embedder=None, lexical_k: int = 50, vector_k: int = 50,
+                 rrf_k: int = 60, lexical_weight: float = 1.0, vector_weight: float = 1.0,
+                 store_path: str = None, history: RAGHistoryModel = None,
+                 agent_id: str = "hybrid_retriever"):
+        self.embedder = embedder or get_embedder()
+        self.lexical_k = lexical_k
+        self.vector_k = vector_k
+        self.rrf_k = rrf_k
+        self.lexical_weight = lexical_weight
+        self.vector_weight = vector_weight
+        self.agent_id = agent_id
+
+        self.chunks = ChunkEmbeddingDataModel(conn)
+        self.store = VectorStore(conn, store_path)
+        self.history = history or RAGHistoryModel(conn)
+
+    def retrieve(self, question: str, k: int = 5, rbac_namespace: str = None, vector=None,
+                 log: bool = True, user_id: str = None, session_id: str = None) -> List[Dict]:
+        """
+        Top-k fused chunks for `question`, best first. Each hit has chunk_id,
+        doc_id, chunk_text, the fused `score` and its `lexical_rank` /
+        `vector_rank` (None if that stage did not find it). `vector` skips
+        embedding the question when the caller already has it.
+        """
+        timings = {}
+        started = time.perf_counter()
+        if vector is None:
+            vector = self.embedder.embed_one(question)
+        timings["embed_ms"] = _elapsed_ms(started)
+
+        hits, lexical, semantic = self.search(question, k, rbac_namespace, vector, timings)
+        timings["latency"] = _elapsed_ms(started)
+
+        if log:
+            self.log_retrieval(question, hits, lexical, semantic, timings, rbac_namespace, user_id, session_id)
+        return hits
+
+    def retrieve_namespaces(self, question: str, k: int = 5, rbac_namespaces: List[str] = (),
+                            vector=None, log: bool = True, user_id: str = None,
+                            session_id: str = None) -> List[Dict]:
+        """
+        Top-k fused chunks across several namespaces, best first. The question
+        is embedded once (or `vector` is used) and one QUERY event covers the
+        whole search.
+        """
+        return retrieve_across([(namespace, self) for namespace in rbac_namespaces], question, k,
+                               vector, log, user_id, session_id)
+
+    def search(self, question: str, k: int, rbac_namespace: Optional[str], vector,
+                timings: Dict) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+        """
+        Fused hits plus both candidate pools for one namespace, without
+        logging; stage times are added to `timings`.
+        """
+        mark = time.perf_counter()
+        lexical = self.chunks.search_text(question, self.lexical_k, rbac_namespace=rbac_namespace)
+        timings["lexical_ms"] = timings.get("lexical_ms", 0.0) + _elapsed_ms(mark)
+
+        mark = time.perf_counter()
+        semantic = self.store.search(vector, self.vector_k, rbac_namespace=rbac_namespace)
+        timings["vector_ms"] = timings.get("vector_ms", 0.0) + _elapsed_ms(mark)
+
+        mark = time.perf_counter()
+        hits = self.fuse(lexical, semantic)[:k]
+        texts = self.chunks.get_texts([hit["chunk_id"] for hit in hits])
+        for hit in hits:
+            hit["chunk_text"] = texts.get(hit["chunk_id"])
+        timings["fusion_ms"] = timings.get("fusion_ms", 0.0) + _elapsed_ms(mark)
+        return hits, lexical, semantic
+
+    def fuse(self, lexical: List[Dict], semantic: List[Dict]) -> List[Dict]:
+        """Reciprocal-rank fusion of two ranked hit lists, best first."""
+        fused: Dict[str, Dict] = {}
+        for stage, hits, weight in (("lexical", lexical, self.lexical_weight),
+                                    ("vector", semantic, self.vector_weight)):
+            for rank, hit in enumerate(hits, 1):
+                entry = fused.setdefault(hit["chunk_id"], {
+                    "chunk_id": hit["chunk_id"], "doc_id": hit["doc_id"], "score": 0.0,
+                    "lexical_rank": None, "vector_rank": None,
+                })
+                entry["score"] += weight / (self.rrf_k + rank)
+                entry[f"{stage}_rank"] = rank
+        return sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)
+
+    def log_retrieval(self, question: str, hits: List[Dict], lexical: List[Dict], semantic: List[Dict],
+             timings: Dict, rbac_namespace: str, user_id: str, session_id: str) -> None:
+        lexical_ids = {hit["chunk_id"] for hit in lexical}
+        metrics = {
+            **{name: round(value, 2) for name, value in timings.items()},
+            "lexical_pool": self.lexical_k,
+            "vector_pool": self.vector_k,
+            "lexical_hits": len(lexical),
+            "vector_hits": len(semantic),
+            "overlap": sum(1 for hit in semantic if hit["chunk_id"] in lexical_ids),
+            "returned": len(hits),
+        }
+        context = {
+            "retriever": "hybrid_rrf",
+            "rrf_k": self.rrf_k,
+            "rbac_namespace": rbac_namespace,
+            "chunk_ids": [hit["chunk_id"] for hit in hits],
+        }
+        self.history.log_query(
+            query_text=question,
+            target_doc_id=hits[0]["doc_id"] if hits else None,
+            metrics_json=json.dumps(metrics),
+            context_json=json.dumps(context),
+            agent_id=self.agent_id,
+            user_id=user_id,
+            session_id=session_id,
+        )
+
+
+def retrieve_across(parts: Sequence[Tuple[str, HybridRetriever]], question: str, k: int = 5,
+                    vector=None, log: bool = True, user_id: str = None,
+                    session_id: str = None) -> List[Dict]:
+    """
+    Top-k fused chunks over (rbac_namespace, retriever) pairs, best first;
+    the retrievers may sit on different databases (namespace shards). The
+    question is embedded once by the first retriever unless `vector` is
+    given, and one QUERY event is logged through it for the merged result.
+    Each hit carries its rbac_namespace.
+    """
+    if not parts:
+        return []
+    first = parts[0][1]
+    timings = {}
+    started = time.perf_counter()
+    if vector is None:
+        vector = first.embedder.embed_one(question)
+    timings["embed_ms"] = _elapsed_ms(started)
+
+    hits, lexical, semantic = [], [], []
+    for namespace, retriever in parts:
+        found, pool_lexical, pool_semantic = retriever.search(question, k, namespace, vector, timings)
+        hits.extend({**hit, "rbac_namespace": namespace} for hit in found)
+        lexical.extend(pool_lexical)
+        semantic.extend(pool_semantic)
+    hits = heapq.nlargest(k, hits, key=lambda hit: hit["score"])
+    timings["latency"] = _elapsed_ms(started)
+
+    if log:
+        first.log_retrieval(question, hits, lexical, semantic, timings,
+                            [namespace for namespace, _ in parts], user_id, session_id)
+    return hits
+
+
+def _elapsed_ms(since: float) -> float:
+    return (time.perf_counter() - since) * 1000
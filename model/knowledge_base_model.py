@@ -0,0 +1,210 @@
+from .base_model import BaseModel
+from .fts import match_any, match_phrase_start
+from typing import Dict, List, Optional
+
+
+class KnowledgeBaseModel(BaseModel):
+    """
+    Model for the knowledge_base table of past incidents (cause, description,
+    rca, remediation_steps, ...).
+
+    knowledge_base_fts is an external-content FTS5 index over the text
+    columns, kept in sync by triggers. It stores only the inverted index, not
+    a second copy of the text. Searches are ranked by BM25, with the cause
+    weighted highest. environment / resource_type are indexed as well, so
+    their filters narrow the match inside FTS5 before any row is read.
+
+    Only the newest `max_candidates` matches of a query are scored. FTS5 walks
+    matches in rowid order and stops there, so a search costs about the same
+    however large the table grows. Recent incidents are also the more useful
+    neighbours.
+    """
+
+    table = 'knowledge_base'
+    fields = [
+        'id', 'cause', 'description', 'impact', 'remediation_steps', 'rca',
+        'business_impact', 'estimated_recovery_time', 'dollar_impact',
+        'resource_type', 'environment', 'created_at'
+    ]
+    primary_key = 'id'
+
+    fts_table = 'knowledge_base_fts'
+    # Indexed columns, in FTS column order
+    fts_columns = ['cause', 'description', 'rca', 'remediation_steps', 'environment', 'resource_type']
+    # BM25 weight per fts_columns entry; the filter columns do not contribute to the rank
+    bm25_weights = (4.0, 2.0, 1.5, 1.0, 0.0, 0.0)
+    # Longer inputs (whole log excerpts) are cut to this many distinct terms
+    max_query_terms = 32
+    max_candidates = 2000
+
+    search_schema = [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_base_fts USING fts5(
+            {', '.join(fts_columns)},
+            content='knowledge_base', content_rowid='rowid',
+            tokenize='porter unicode61'
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_knowledge_base_fts_insert
+        AFTER INSERT ON knowledge_base BEGIN
+            INSERT INTO knowledge_base_fts (rowid, {', '.join(fts_columns)})
+            VALUES (NEW.rowid, {', '.join('NEW.' + c for c in fts_columns)});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_knowledge_base_fts_delete
+        AFTER DELETE ON knowledge_base BEGIN
+            INSERT INTO knowledge_base_fts (knowledge_base_fts, rowid, {', '.join(fts_columns)})
+            VALUES ('delete', OLD.rowid, {', '.join('OLD.' + c for c in fts_columns)});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_knowledge_base_fts_update
+        AFTER UPDATE OF {', '.join(fts_columns)} ON knowledge_base BEGIN
+            INSERT INTO knowledge_base_fts (knowledge_base_fts, rowid, {', '.join(fts_columns)})
+            VALUES ('delete', OLD.rowid, {', '.join('OLD.' + c for c in fts_columns)});
+            INSERT INTO knowledge_base_fts (rowid, {', '.join(fts_columns)})
+            VALUES (NEW.rowid, {', '.join('NEW.' + c for c in fts_columns)});
+        END
+        """,
+    ]
+    # Database files whose FTS5 index is known to exist
+    _search_ready: set = set()
+
+    def __init__(self, conn=None):
+        """Initialize with optional connection. If none provided, use the pooled connection."""
+        super().__init__(conn)
+
+    def ensure_search_index(self) -> None:
+        """
+        Create the FTS5 index and its triggers, and build it from the existing
+        rows, the first time it is needed (checked once per process and database).
+        """
+        database = self.database_key()
+        if database in KnowledgeBaseModel._search_ready:
+            return
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_knowledge_base_fts_update'"
+        ).fetchone()
+        if not exists:
+            self.apply_migration(self.search_schema + [
+                f"INSERT INTO {self.fts_table} ({self.fts_table}) VALUES ('rebuild')",
+            ])
+        KnowledgeBaseModel._search_ready.add(database)
+
+    def rebuild_search_index(self) -> None:
+        """Rebuild the FTS5 index from knowledge_base, e.g. after a bulk load with triggers off."""
+        self.ensure_search_index()
+        self.apply_migration([f"INSERT INTO {self.fts_table} ({self.fts_table}) VALUES ('rebuild')"])
+
+    def optimize_search_index(self) -> None:
+        """Merge the FTS5 index b-trees into one; worth running after large loads."""
+        self.ensure_search_index()
+        self.apply_migration([f"INSERT INTO {self.fts_table} ({self.fts_table}) VALUES ('optimize')"])
+
+    # --- Readers ---
+
+    def get_by_id(self, record_id: str) -> Optional[Dict]:
+        """Get a knowledge base record by id."""
+        try:
+            cur = self.conn.execute(f"""
+                SELECT {', '.join(self.fields)}
+                FROM {self.table}
+                WHERE id = ?
+            """, (record_id,))
+            return self._row_to_dict(cur.fetchone())
+
+        except Exception as e:
+            print(f"Error getting knowledge base record: {e}")
+            return None
+
+    def get_filter_values(self) -> Dict[str, List[str]]:
+        """Distinct environments and resource types, for search filters."""
+        try:
+            return {
+                column: [row[0] for row in self.conn.execute(
+                    f"SELECT DISTINCT {column} FROM {self.table} WHERE {column} IS NOT NULL ORDER BY {column}"
+                ).fetchall()]
+                for column in ('environment', 'resource_type')
+            }
+
+        except Exception as e:
+            print(f"Error getting knowledge base filters: {e}")
+            return {"environment": [], "resource_type": []}
+
+    # --- Search ---
+
+    @classmethod
+    def _match_expression(cls, text: str, environment: str = None, resource_type: str = None) -> Optional[str]:
+        """FTS5 query: any word of `text`, restricted to the given environment / resource_type."""
+        expression = match_any(text, cls.max_query_terms)
+        if expression is None:
+            return None
+        for column, value in (('environment', environment), ('resource_type', resource_type)):
+            column_filter = match_phrase_start(column, value)
+            if column_filter:
+                # Equality is re-checked in SQL; this narrows the match inside FTS5
+                expression += f" AND {column_filter}"
+        return expression
+
+    def search(self, query: str, environment: str = None, resource_type: str = None,
+               limit: int = 10) -> List[Dict]:
+        """
+        Knowledge base records matching any term of `query`, best BM25 match
+        first, optionally restricted to one environment / resource_type. Each
+        record has a `score` (higher is better) and a highlighted `snippet` of
+        its description.
+        """
+        try:
+            self.ensure_search_index()
+            expression = self._match_expression(query, environment, resource_type)
+            if expression is None:
+                return []
+
+            where, params = "1 = 1", [expression, self.max_candidates]
+            if environment:
+                where += " AND kb.environment = ?"
+                params.append(environment)
+            if resource_type:
+                where += " AND kb.resource_type = ?"
+                params.append(resource_type)
+
+            weights = ', '.join(str(w) for w in self.bm25_weights)
+            cur = self.conn.execute(f"""
+                SELECT {', '.join('kb.' + f for f in self.fields)}, kb.rowid AS fts_rowid, -m.rank AS score
+                FROM (
+                    SELECT rowid, bm25({self.fts_table}, {weights}) AS rank
+                    FROM {self.fts_table}
+                    WHERE {self.fts_table} MATCH ?
+                    ORDER BY rowid DESC
+                    LIMIT ?
+                ) m
+                JOIN {self.table} kb ON kb.rowid = m.rowid
+                WHERE {where}
+                ORDER BY m.rank
+                LIMIT ?
+            """, params + [limit])
+            records = [self._row_to_dict(row) for row in cur.fetchall()]
+            if not records:
+                return []
+
+            # Snippets only for the rows returned, not for every scored candidate
+            rowids = [r.pop('fts_rowid') for r in records]
+            snippets = dict(self.conn.execute(f"""
+                SELECT rowid, snippet({self.fts_table}, 1, '**', '**', '...', 16)
+                FROM {self.fts_table}
+                WHERE {self.fts_table} MATCH ? AND rowid IN ({', '.join('?' for _ in rowids)})
+            """, [expression] + rowids).fetchall())
+            for record, rowid in zip(records, rowids):
+                record['snippet'] = snippets.get(rowid)
+            return records
+
+        except Exception as e:
+            print(f"Error searching knowledge base: {e}")
+            return []
+
+    def find_similar(self, incident_text: str, environment: str = None,
+                     resource_type: str = None, limit: int = 5) -> List[Dict]:
+        """Past incidents most similar to an incident's title / description / logs."""
+        return self.search(incident_text, environment, resource_type, limit)
@@ -0,0 +1,324 @@
+from .answer_cache import AnswerCache
+from .chunk_embedding_data_model import ChunkEmbeddingDataModel
+from .connection_pool import ConnectionPool
+from .document_metadata_model import DocumentMetadataModel
+from .near_duplicate_index import NearDuplicateIndex
+from .rag_history_model import RAGHistoryModel
+from .vector_store import VectorStore
+import heapq
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# Namespaces become directory names, so only plain identifiers are accepted
+_NAMESPACE_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# Primary-database tables whose schema every shard starts from
+SHARDED_TABLES = (DocumentMetadataModel.table, ChunkEmbeddingDataModel.table)
+
+
+def sharding_enabled() -> bool:
+    return os.getenv("RBAC_SHARDING", "").lower() in ("1", "true", "yes", "on")
+
+
+def default_shard_root() -> str:
+    return os.getenv("SHARD_DIR", os.path.join("data", "shards"))
+
+
+class NamespaceShards:
+    """
+    Per-rbac_namespace storage: each namespace gets its own SQLite file
+    (document_metadata, chunk_embedding_data, chunk_vectors, ...) and its own
+    vector store directory under `root`:
+
+        <root>/<namespace>/shard.db
+        <root>/<namespace>/vectors/
+
+    A query only opens the shards of the namespaces it may see, so its cost
+    follows the size of those namespaces rather than of the whole corpus.
+    Table definitions are copied from the primary database the first time a
+    shard is opened. Each shard has its own ConnectionPool, so a script run
+    checks out an already opened connection and hands it back when its thread
+    ends, like the primary pool. Writes are committed directly on them.
+    """
+
+    def __init__(self, root: str = None, primary=None):
+        self.root = root or default_shard_root()
+        # Connection to the primary database; None means the pooled one
+        self.primary = primary
+        # Shard database path -> its connection pool
+        self._pools: Dict[str, ConnectionPool] = {}
+        self._ready: set = set()
+        self._lock = threading.Lock()
+
+    # --- Layout ---
+
+    def _check(self, namespace: str) -> str:
+        if not namespace or not _NAMESPACE_RE.match(namespace):
+            raise ValueError(f"Invalid rbac_namespace '{namespace}' for sharded storage")
+        return namespace
+
+    def shard_dir(self, namespace: str) -> str:
+        return os.path.join(self.root, self._check(namespace))
+
+    def db_path(self, namespace: str) -> str:
+        return os.path.join(self.shard_dir(namespace), "shard.db")
+
+    def vector_path(self, namespace: str) -> str:
+        return os.path.join(self.shard_dir(namespace), "vectors")
+
+    def exists(self, namespace: str) -> bool:
+        return os.path.exists(self.db_path(namespace))
+
+    def namespaces(self) -> List[str]:
+        """Namespaces that already have a shard."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if _NAMESPACE_RE.match(name) and os.path.exists(os.path.join(self.root, name, "shard.db"))
+        )
+
+    # --- Connections ---
+
+    def connection(self, namespace: str):
+        """This thread's connection to the namespace's shard, creating the shard if needed."""
+        conn = self.pool(namespace).acquire()
+        self._initialise(namespace, conn)
+        return conn
+
+    def pool(self, namespace: str) -> ConnectionPool:
+        """Connection pool of the namespace's shard."""
+        path = self.db_path(namespace)
+        pool = self._pools.get(path)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(path)
+                if pool is None:
+                    os.makedirs(self.shard_dir(namespace), exist_ok=True)
+                    pool = self._pools[path] = ConnectionPool(
+                        factory=lambda: _open_shard(path),
+                        max_size=int(os.getenv("SHARD_POOL_SIZE", "4")),
+                        timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+                    )
+        return pool
+
+    def close(self) -> None:
+        """Close idle shard connections and stop handing any out; used on shutdown."""
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            pool.close_all()
+
+    def _initialise(self, namespace: str, conn) -> None:
+        with self._lock:
+            if namespace in self._ready:
+                return
+            try:
+                for sql in self._primary_schema():
+                    conn.execute(sql)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            # Companion tables and indexes come from their models, checked per database file
+            ChunkEmbeddingDataModel(conn).ensure_indexes()
+            DocumentMetadataModel(conn).ensure_terms_index()
+            VectorStore(conn, self.vector_path(namespace)).ensure_schema()
+            NearDuplicateIndex(conn).ensure_schema()
+            self._ready.add(namespace)
+
+    def _primary_schema(self) -> List[str]:
+        """CREATE statements of the sharded tables and their indexes, from the primary database."""
+        chunks = ChunkEmbeddingDataModel(self.primary)
+        documents = DocumentMetadataModel(self.primary)
+        # Bring the primary up to date first so shards and primary share one column set
+        chunks.ensure_text_column()
+        chunks.ensure_hash_column()
+        documents.ensure_hash_column()
+
+        placeholders = ', '.join('?' for _ in SHARDED_TABLES)
+        rows = chunks.conn.execute(f"""
+            SELECT type, sql FROM sqlite_master
+            WHERE tbl_name IN ({placeholders}) AND type IN ('table', 'index') AND sql IS NOT NULL
+            ORDER BY type = 'index', name
+        """, SHARDED_TABLES).fetchall()
+        if sum(1 for row in rows if row[0] == 'table') < len(SHARDED_TABLES):
+            raise ValueError(f"Primary database is missing one of {', '.join(SHARDED_TABLES)}")
+        return [re.sub(r"^CREATE (UNIQUE )?(TABLE|INDEX) ", r"CREATE \1\2 IF NOT EXISTS ", row[1])
+                for row in rows]
+
+    # --- Models ---
+
+    def documents(self, namespace: str) -> DocumentMetadataModel:
+        return DocumentMetadataModel(self.connection(namespace))
+
+    def chunks(self, namespace: str) -> ChunkEmbeddingDataModel:
+        return ChunkEmbeddingDataModel(self.connection(namespace), vector_store_path=self.vector_path(namespace))
+
+    def vectors(self, namespace: str) -> VectorStore:
+        return VectorStore(self.connection(namespace), self.vector_path(namespace))
+
+    def ingestor(self, namespace: str, **options):
+        """DocumentIngestor writing into the namespace's shard, invalidating the primary answer cache."""
+        from .document_ingestion import DocumentIngestor
+        options.setdefault("answer_cache", AnswerCache(self.primary))
+        return DocumentIngestor(self.connection(namespace), store_path=self.vector_path(namespace), **options)
+
+    def retriever(self, namespace: str, **options):
+        """HybridRetriever over the namespace's shard, logging to the primary rag_history."""
+        from .hybrid_retriever import HybridRetriever
+        return HybridRetriever(self.connection(namespace), store_path=self.vector_path(namespace),
+                               history=RAGHistoryModel(self.primary), **options)
+
+    # --- Queries ---
+
+    def get_by_namespace(self, rbac_namespace: str) -> List[Dict]:
+        if not self.exists(rbac_namespace):
+            return []
+        return self.documents(rbac_namespace).get_by_namespace(rbac_namespace)
+
+    def search_similar(self, vector, k: int = 10, rbac_namespaces: Iterable[str] = None,
+                       doc_id: str = None) -> List[Dict]:
+        """
+        Top-k chunks over the shards of `rbac_namespaces` (all existing
+        shards by default), best first. Each hit carries its rbac_namespace.
+        """
+        namespaces = self.namespaces() if rbac_namespaces is None else \
+            [ns for ns in rbac_namespaces if self.exists(ns)]
+        hits = []
+        for namespace in namespaces:
+            for hit in self.chunks(namespace).search_similar(vector, k, doc_id=doc_id):
+                hits.append({**hit, "rbac_namespace": namespace})
+        return heapq.nlargest(k, hits, key=lambda hit: hit["score"])
+
+    def retrieve(self, question: str, k: int = 5, rbac_namespaces: Iterable[str] = None,
+                 embedder=None, vector=None, log: bool = True, user_id: str = None,
+                 session_id: str = None, **options) -> List[Dict]:
+        """
+        Hybrid retrieval over the shards of `rbac_namespaces` (all existing
+        shards by default). The question is embedded once, or not at all when
+        the caller passes its `vector`. Each shard fuses its own pools; the
+        best fused hits across shards are returned and logged as one QUERY
+        event in the primary rag_history.
+        """
+        from .hybrid_retriever import retrieve_across
+        namespaces = self.namespaces() if rbac_namespaces is None else \
+            [ns for ns in rbac_namespaces if self.exists(ns)]
+        retrievers = [(ns, self.retriever(ns, embedder=embedder, **options)) for ns in namespaces]
+        return retrieve_across(retrievers, question, k, vector, log, user_id, session_id)
+
+    def stats(self) -> List[Dict]:
+        """Document, chunk and vector counts of every shard."""
+        result = []
+        for namespace in self.namespaces():
+            conn = self.connection(namespace)
+            result.append({
+                "rbac_namespace": namespace,
+                "documents": conn.execute(f"SELECT COUNT(*) FROM {DocumentMetadataModel.table}").fetchone()[0],
+                "chunks": conn.execute(f"SELECT COUNT(*) FROM {ChunkEmbeddingDataModel.table}").fetchone()[0],
+                "vectors": conn.execute(f"SELECT COUNT(*) FROM {VectorStore.table}").fetchone()[0],
+                "size_mb": round(os.path.getsize(self.db_path(namespace)) / (1024 * 1024), 2),
+            })
+        return result
+
+    # --- Migration ---
+
+    def import_namespace(self, namespace: str, batch_size: int = 500,
+                         source_vector_path: str = None) -> Dict[str, int]:
+        """
+        Copy one namespace's documents, chunks and vectors from the primary
+        database and vector store into its shard. Safe to re-run, since rows
+        are upserted.
+        """
+        shard_conn = self.connection(namespace)
+        documents = DocumentMetadataModel(self.primary)
+        chunks = ChunkEmbeddingDataModel(self.primary)
+        counts = {"documents": 0, "chunks": 0, "vectors": 0}
+
+        doc_rows = documents.iter_query(
+            f"SELECT * FROM {documents.table} WHERE rbac_namespace = ?", (namespace,), batch_size
+        )
+        counts["documents"] = self._copy_rows(shard_conn, documents.table, doc_rows, batch_size)
+
+        chunk_rows = chunks.iter_query(f"""
+            SELECT c.* FROM {chunks.table} c
+            JOIN {documents.table} d ON d.doc_id = c.doc_id
+            WHERE d.rbac_namespace = ?
+        """, (namespace,), batch_size)
+        counts["chunks"] = self._copy_rows(shard_conn, chunks.table, chunk_rows, batch_size)
+
+        source = VectorStore(self.primary, source_vector_path)
+        target = self.vectors(namespace)
+        source.ensure_schema()
+        if source.file.dim is not None:
+            batch = []
+            rows = source.iter_query(f"""
+                SELECT chunk_id, slot, doc_id FROM {source.table}
+                WHERE rbac_namespace = ? ORDER BY slot
+            """, (namespace,), batch_size)
+            for row in rows:
+                batch.append(row)
+                if len(batch) == batch_size:
+                    counts["vectors"] += self._copy_vectors(source, target, namespace, batch)
+                    batch = []
+            if batch:
+                counts["vectors"] += self._copy_vectors(source, target, namespace, batch)
+        return counts
+
+    @staticmethod
+    def _copy_rows(conn, table: str, rows: Iterable[Dict], batch_size: int) -> int:
+        copied, batch = 0, []
+
+        def flush():
+            columns = list(batch[0])
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                [tuple(row[c] for c in columns) for row in batch]
+            )
+            conn.commit()
+
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                flush()
+                copied += len(batch)
+                batch = []
+        if batch:
+            flush()
+            copied += len(batch)
+        return copied
+
+    @staticmethod
+    def _copy_vectors(source: VectorStore, target: VectorStore, namespace: str,
+                      rows: Sequence[Dict]) -> int:
+        slots = [row["slot"] for row in rows]
+        return target.add_vectors(
+            [row["chunk_id"] for row in rows], source.file.rows(slots),
+            doc_ids=[row["doc_id"] for row in rows],
+            rbac_namespaces=[namespace] * len(rows),
+        )
+
+
+def _open_shard(path: str):
+    # Pooled shard connections move between script-run threads
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+_default_shards: Optional[NamespaceShards] = None
+_default_shards_lock = threading.Lock()
+
+
+def get_shards() -> NamespaceShards:
+    """Process-wide shard router over the default shard root."""
+    global _default_shards
+    if _default_shards is None:
+        with _default_shards_lock:
+            if _default_shards is None:
+                _default_shards = NamespaceShards()
+    return _default_shards
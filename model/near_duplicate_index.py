@@ -0,0 +1,232 @@
+from .base_model import BaseModel
+import hashlib
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Prime just above 2**32; signatures are 32-bit MinHash values modulo it
+_PRIME = np.uint64(4294967311)
+
+
+class NearDuplicateIndex(BaseModel):
+    """
+    MinHash / LSH index of chunk texts, kept next to chunk_embedding_data.
+
+    Each chunk gets a `num_perm`-value MinHash signature of its word
+    shingles, stored in chunk_minhash. Only canonical chunks are banded
+    into chunk_minhash_bands (`bands` bands of num_perm / bands rows), so a
+    lookup touches a handful of buckets. Candidates are confirmed on the
+    estimated Jaccard similarity. Near-duplicates keep a link to their
+    canonical chunk in chunk_minhash.canonical_chunk_id. index_many() links
+    and stores a whole ingest batch in one transaction.
+    """
+
+    table = 'chunk_minhash'
+    fields = ['chunk_id', 'signature', 'canonical_chunk_id', 'similarity', 'updated_at']
+    primary_key = 'chunk_id'
+
+    schema = [
+        """
+        CREATE TABLE IF NOT EXISTS chunk_minhash (
+            chunk_id TEXT PRIMARY KEY,
+            signature BLOB NOT NULL,
+            canonical_chunk_id TEXT,
+            similarity REAL,
+            updated_at TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_chunk_minhash_canonical ON chunk_minhash (canonical_chunk_id)",
+        """
+        CREATE TABLE IF NOT EXISTS chunk_minhash_bands (
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            chunk_id TEXT NOT NULL,
+            PRIMARY KEY (band, bucket, chunk_id)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_chunk_minhash_bands_chunk ON chunk_minhash_bands (chunk_id)",
+    ]
+
+    def __init__(self, conn=None, num_perm: int = 128, bands: int = 16, shingle_size: int = 5, seed: int = 1):
+        super().__init__(conn)
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # a < 2**31 and x < 2**32 keep a * x + b inside uint64
+        self._a = rng.integers(1, 2 ** 31, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2 ** 31, num_perm, dtype=np.uint64)
+
+    def ensure_schema(self) -> None:
+        if not self.columns():
+            self.apply_migration(self.schema)
+
+    # --- Signatures ---
+
+    def _shingles(self, text: str) -> np.ndarray:
+        tokens = _TOKEN_RE.findall((text or "").lower())
+        n = self.shingle_size
+        grams = {" ".join(tokens[i:i + n]) for i in range(max(len(tokens) - n + 1, 1))}
+        return np.fromiter(
+            (int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "little") for g in grams),
+            dtype=np.uint64, count=len(grams)
+        )
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature (num_perm uint32 values) of the text's word shingles."""
+        shingles = self._shingles(text)
+        hashed = (np.outer(shingles, self._a) + self._b) % _PRIME
+        return hashed.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, int]]:
+        keys = []
+        for band in range(self.bands):
+            part = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            bucket = int.from_bytes(hashlib.blake2b(part, digest_size=8).digest(), "little", signed=True)
+            keys.append((band, bucket))
+        return keys
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        """Estimated Jaccard similarity of two signatures."""
+        return float(np.mean(a == b))
+
+    # --- Lookup ---
+
+    def find_duplicate(self, signature: np.ndarray, threshold: float = 0.9,
+                       exclude: Sequence[str] = ()) -> Optional[Tuple[str, float]]:
+        """Most similar canonical chunk at or above `threshold`, as (chunk_id, similarity)."""
+        self.ensure_schema()
+        return self._find_duplicate(self.conn, signature, threshold, exclude)
+
+    def _find_duplicate(self, conn, signature: np.ndarray, threshold: float,
+                        exclude: Sequence[str] = ()) -> Optional[Tuple[str, float]]:
+        keys = self._band_keys(signature)
+        cur = conn.execute(f"""
+            SELECT DISTINCT b.chunk_id, m.signature
+            FROM chunk_minhash_bands b
+            JOIN {self.table} m ON m.chunk_id = b.chunk_id
+            WHERE (b.band, b.bucket) IN (VALUES {', '.join('(?, ?)' for _ in keys)})
+        """, [value for key in keys for value in key])
+
+        best = None
+        for chunk_id, blob in cur.fetchall():
+            if chunk_id in exclude:
+                continue
+            score = self.similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+            if score >= threshold and (best is None or score > best[1]):
+                best = (chunk_id, score)
+        return best
+
+    def duplicates_of(self, canonical_chunk_id: str) -> List[Dict]:
+        self.ensure_schema()
+        return list(self.iter_query(f"""
+            SELECT chunk_id, similarity FROM {self.table}
+            WHERE canonical_chunk_id = ?
+            ORDER BY similarity DESC
+        """, (canonical_chunk_id,)))
+
+    def get_canonical_map(self, chunk_ids: Sequence[str]) -> Dict[str, str]:
+        """{chunk_id: canonical_chunk_id} for those of `chunk_ids` that are duplicates."""
+        self.ensure_schema()
+        result = {}
+        for start in range(0, len(chunk_ids), 500):
+            batch = list(chunk_ids[start:start + 500])
+            cur = self.conn.execute(f"""
+                SELECT chunk_id, canonical_chunk_id FROM {self.table}
+                WHERE chunk_id IN ({', '.join('?' for _ in batch)}) AND canonical_chunk_id IS NOT NULL
+            """, batch)
+            result.update((row[0], row[1]) for row in cur.fetchall())
+        return result
+
+    def stats(self) -> Dict:
+        self.ensure_schema()
+        row = self.conn.execute(f"""
+            SELECT COUNT(*), COUNT(canonical_chunk_id) FROM {self.table}
+        """).fetchone()
+        return {"chunks": row[0], "duplicates": row[1], "canonical": row[0] - row[1]}
+
+    # --- Maintenance ---
+
+    def add(self, chunk_id: str, signature: np.ndarray, canonical_chunk_id: str = None,
+            similarity: float = None) -> None:
+        """Store a chunk's signature; canonical chunks (no canonical_chunk_id) are also banded."""
+        self.ensure_schema()
+        now_iso = datetime.now().isoformat()
+        self._run_write(lambda conn: self._store(conn, chunk_id, signature, canonical_chunk_id, similarity, now_iso))
+
+    def index_many(self, items: Sequence[Tuple[str, np.ndarray]],
+                   threshold: float = 0.9) -> List[Optional[Tuple[str, float]]]:
+        """
+        Link and store (chunk_id, signature) pairs in one transaction. Each
+        signature is matched against the canonical chunks, including those
+        stored earlier in the same call, then stored as a duplicate of its
+        match or banded as canonical. Returns the match per item, or None.
+        """
+        self.ensure_schema()
+        now_iso = datetime.now().isoformat()
+
+        def work(conn):
+            matches = []
+            for chunk_id, signature in items:
+                # Runs on the writing connection, so it sees this batch's uncommitted rows
+                match = self._find_duplicate(conn, signature, threshold, exclude=(chunk_id,))
+                self._store(conn, chunk_id, signature, *(match or (None, None)), now_iso)
+                matches.append(match)
+            return matches
+
+        return self._run_write(work) if items else []
+
+    def _store(self, conn, chunk_id: str, signature: np.ndarray, canonical_chunk_id: Optional[str],
+               similarity: Optional[float], now_iso: str) -> None:
+        conn.execute("DELETE FROM chunk_minhash_bands WHERE chunk_id = ?", (chunk_id,))
+        conn.execute(f"""
+            INSERT OR REPLACE INTO {self.table} (chunk_id, signature, canonical_chunk_id, similarity, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (chunk_id, signature.astype(np.uint32).tobytes(), canonical_chunk_id, similarity, now_iso))
+        if canonical_chunk_id is None:
+            conn.executemany(
+                "INSERT OR IGNORE INTO chunk_minhash_bands (band, bucket, chunk_id) VALUES (?, ?, ?)",
+                [(band, bucket, chunk_id) for band, bucket in self._band_keys(signature)]
+            )
+
+    def remove(self, chunk_ids: Sequence[str]) -> List[str]:
+        """
+        Drop chunks from the index. Duplicates that pointed at a removed
+        canonical chunk lose their link; their ids are returned so the caller
+        can embed them in their own right.
+        """
+        self.ensure_schema()
+        chunk_ids = list(chunk_ids)
+
+        def work(conn):
+            orphaned = []
+            for start in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[start:start + 500]
+                placeholders = ', '.join('?' for _ in batch)
+                orphaned.extend(row[0] for row in conn.execute(f"""
+                    SELECT chunk_id FROM {self.table}
+                    WHERE canonical_chunk_id IN ({placeholders}) AND chunk_id NOT IN ({placeholders})
+                """, batch + batch).fetchall())
+                conn.execute(f"DELETE FROM chunk_minhash_bands WHERE chunk_id IN ({placeholders})", batch)
+                conn.execute(f"DELETE FROM {self.table} WHERE chunk_id IN ({placeholders})", batch)
+            now_iso = datetime.now().isoformat()
+            for start in range(0, len(orphaned), 500):
+                batch = orphaned[start:start + 500]
+                rows = conn.execute(f"""
+                    SELECT chunk_id, signature FROM {self.table}
+                    WHERE chunk_id IN ({', '.join('?' for _ in batch)})
+                """, batch).fetchall()
+                # Orphans become canonical and so need their bands
+                for chunk_id, blob in rows:
+                    self._store(conn, chunk_id, np.frombuffer(blob, dtype=np.uint32), None, None, now_iso)
+            return orphaned
+
+        return self._run_write(work)
@@ -1,14 +1,26 @@
 from .base_model import BaseModel 
+from .connection_pool import get_pool
+from .event_writer import EventWriter
+from .rag_history_rollup_model import RAGHistoryRollupModel
+from .rag_history_partition_model import RAGHistoryPartitionModel
 import json
+import os
 import sqlite3
+import threading
+import time
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 import pandas as pd
 
 class RAGHistoryModel(BaseModel):
     """
     Model for rag_history_and_optimization table in optimized schema.
     Unified historical log for queries, healing operations, and synthetic tests.
+
+    The log_* methods return the new history_id only when the event is
+    written inline. Models on a pooled connection hand events to the
+    background EventWriter and return None; call `get_event_writer().flush()`
+    before reading back events just logged.
     """
     
     # --- Class-level Configuration (Adopting BaseModel Structure) ---
@@ -19,6 +31,76 @@ class RAGHistoryModel(BaseModel):
         'action_taken', 'state_before', 'state_after', 'agent_id', 'user_id', 
         'session_id'
     ]
+    primary_key = 'history_id'
+
+    # Hot metrics_json fields promoted to typed, indexable generated columns
+    metric_columns = {
+        'accuracy': '$.accuracy',
+        'latency': '$.latency',
+        'cost': '$.cost',
+        'improvement_delta': '$.improvement_delta',
+    }
+
+    def migrate_metric_columns(self) -> None:
+        """
+        Add the typed metric columns (virtual generated columns over metrics_json)
+        and the indexes used for filtering and charting. Safe to call repeatedly.
+        """
+        statements = []
+        for column, path in self.metric_columns.items():
+            if not self.has_column(column):
+                statements.append(f"""
+                    ALTER TABLE {self.table} ADD COLUMN {column} REAL
+                    GENERATED ALWAYS AS (
+                        CASE WHEN json_valid(metrics_json)
+                             THEN json_extract(metrics_json, '{path}') END
+                    ) VIRTUAL
+                """)
+        statements += [
+            f"CREATE INDEX IF NOT EXISTS idx_rag_history_event_time ON {self.table} (event_type, timestamp)",
+            f"CREATE INDEX IF NOT EXISTS idx_rag_history_doc_time ON {self.table} (target_doc_id, timestamp)",
+            f"CREATE INDEX IF NOT EXISTS idx_rag_history_event_accuracy ON {self.table} (event_type, accuracy)",
+        ]
+        self.apply_migration(statements)
+
+    def ensure_schema(self) -> None:
+        """Run the metric-column migration once per process."""
+        if not all(self.has_column(c) for c in self.metric_columns):
+            self.migrate_metric_columns()
+
+    def get_metric_series(self, event_types: List[str] = None, start_time: str = None,
+                          end_time: str = None, min_accuracy: float = None,
+                          max_latency: float = None, limit: int = 5000) -> pd.DataFrame:
+        """
+        Per-event typed metrics (accuracy, latency, cost, improvement_delta, reward)
+        with all filtering done in SQL over the indexed columns.
+        """
+        self.ensure_schema()
+        query = f"""
+            SELECT history_id, timestamp, event_type, target_doc_id, action_taken,
+                   {', '.join(self.metric_columns)}, reward_signal
+            FROM {self.table}
+            WHERE 1=1
+        """
+        params = []
+        if event_types:
+            query += f" AND event_type IN ({', '.join('?' for _ in event_types)})"
+            params.extend(event_types)
+        if start_time:
+            query += " AND timestamp >= ?"
+            params.append(start_time)
+        if end_time:
+            query += " AND timestamp <= ?"
+            params.append(end_time)
+        if min_accuracy is not None:
+            query += " AND accuracy >= ?"
+            params.append(min_accuracy)
+        if max_latency is not None:
+            query += " AND latency <= ?"
+            params.append(max_latency)
+        query += " ORDER BY timestamp DESC LIMIT ?"
+        params.append(limit)
+        return pd.read_sql_query(query, self.conn, params=params)
 
     def get_metrix(self) -> pd.DataFrame:
         """
@@ -40,14 +122,77 @@ class RAGHistoryModel(BaseModel):
 
         return df
     
-    def __init__(self, conn=None):
-        """Initialize RAG History Model with database connection"""
-        if conn is None:
-            # Get connection using the project's standard connection method
-            from ..db.connection import get_connection
-            conn = get_connection()
+    # Insert column order for event tuples (history_id is auto-increment)
+    event_columns = [
+        'event_type', 'timestamp', 'query_text', 'target_doc_id', 'target_chunk_id',
+        'metrics_json', 'context_json', 'reward_signal', 'action_taken', 'state_before',
+        'state_after', 'agent_id', 'user_id', 'session_id'
+    ]
+
+    def __init__(self, conn=None, event_writer: EventWriter = None):
+        """
+        Initialize RAG History Model with database connection (pooled by default).
+        Models on a pooled connection, whether passed in or not, log through the
+        shared background EventWriter unless RAG_HISTORY_ASYNC_WRITES=0; pass
+        `event_writer` to use a specific one.
+        """
         super().__init__(conn)
-        self.db_path = getattr(conn, 'db_path', 'unknown')  # For debugging
+        self.db_path = getattr(self.conn, 'db_path', 'unknown')  # For debugging
+        if event_writer is None and self._pooled:
+            event_writer = get_event_writer()
+        self.event_writer = event_writer
+        if self._pooled:
+            start_history_maintenance()
+
+    def _log_event(self, data_ordered: tuple) -> int | None:
+        """
+        Record one event tuple. Returns the history_id when written inline, or
+        None when it was handed to the background writer.
+        """
+        if self.event_writer is not None:
+            self.event_writer.submit(data_ordered)
+            return None
+        rollups = self.rollups()
+        rollups.ensure_schema()
+        rollup_rows = rollups.aggregate([dict(zip(self.event_columns, data_ordered))])
+
+        def work(conn):
+            cur = conn.execute(f"""
+                INSERT INTO {self.table} ({', '.join(self.event_columns)})
+                VALUES ({', '.join('?' for _ in self.event_columns)})
+            """, data_ordered)
+            rollups.upsert(conn, rollup_rows, cur.lastrowid)
+            return cur.lastrowid
+
+        return self._run_write(work)
+
+    def partitions(self) -> RAGHistoryPartitionModel:
+        """Partition registry on the same connection (or pool) as this model."""
+        return RAGHistoryPartitionModel(None if self._pooled else self.conn)
+
+    def rollups(self) -> RAGHistoryRollupModel:
+        """Rollup model on the same connection (or pool) as this model."""
+        return RAGHistoryRollupModel(None if self._pooled else self.conn)
+
+    def insert_events(self, events: List[tuple]) -> int:
+        """
+        Write a batch of event tuples (ordered as `event_columns`) and fold them
+        into the minute/hour/day rollups, all in one transaction.
+        """
+        sql = f"""
+            INSERT INTO {self.table} ({', '.join(self.event_columns)})
+            VALUES ({', '.join('?' for _ in self.event_columns)})
+        """
+        rollups = self.rollups()
+        rollups.ensure_schema()
+        rollup_rows = rollups.aggregate(dict(zip(self.event_columns, e)) for e in events)
+
+        def work(conn):
+            conn.executemany(sql, events)
+            rollups.upsert(conn, rollup_rows, conn.execute("SELECT last_insert_rowid()").fetchone()[0])
+            return len(events)
+
+        return self._run_write(work)
     
     def _row_to_dict(self, row) -> Dict | None:
         """Helper to convert sqlite3.Row or tuple to a dictionary based on self.fields."""
@@ -63,7 +208,7 @@ class RAGHistoryModel(BaseModel):
 
     def log_query(self, query_text: str, target_doc_id: str, metrics_json: str,
                   context_json: str = None, agent_id: str = "langgraph_agent",
-                  user_id: str = None, session_id: str = None) -> int:
+                  user_id: str = None, session_id: str = None) -> int | None:
         """
         Log a query event with metadata.
         """
@@ -83,16 +228,7 @@ class RAGHistoryModel(BaseModel):
                 "QUERY", None, None, agent_id, user_id, session_id
             )
             
-            cur = self.conn.execute(f"""
-                INSERT INTO {self.table} 
-                (event_type, timestamp, query_text, target_doc_id, target_chunk_id,
-                 metrics_json, context_json, reward_signal, action_taken, state_before,
-                 state_after, agent_id, user_id, session_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, data_ordered)
-            
-            self.conn.commit()
-            return cur.lastrowid
+            return self._log_event(data_ordered)
             
         except Exception as e:
             print(f"Error logging query: {e}")
@@ -101,7 +237,7 @@ class RAGHistoryModel(BaseModel):
     def log_healing(self, target_doc_id: str, target_chunk_id: str, metrics_json: str,
                     context_json: str, action_taken: str = "RE_EMBED",
                     reward_signal: float = 0.0, agent_id: str = "rl_healing_agent",
-                    session_id: str = None) -> int:
+                    session_id: str = None) -> int | None:
         """
         Log a healing/optimization event with metrics and reward signal.
         """
@@ -114,16 +250,7 @@ class RAGHistoryModel(BaseModel):
                 None, None, agent_id, None, session_id
             )
             
-            cur = self.conn.execute(f"""
-                INSERT INTO {self.table} 
-                (event_type, timestamp, query_text, target_doc_id, target_chunk_id,
-                 metrics_json, context_json, reward_signal, action_taken, state_before,
-                 state_after, agent_id, user_id, session_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, data_ordered)
-            
-            self.conn.commit()
-            return cur.lastrowid
+            return self._log_event(data_ordered)
             
         except Exception as e:
             print(f"Error logging healing: {e}")
@@ -132,7 +259,7 @@ class RAGHistoryModel(BaseModel):
     def log_synthetic_test(self, query_text: str, target_doc_id: str, 
                           metrics_json: str, context_json: str,
                           reward_signal: float = 0.0, agent_id: str = "synthetic_test_agent",
-                          session_id: str = None) -> int:
+                          session_id: str = None) -> int | None:
         """
         Log a synthetic test event (for evaluating RAG pipeline quality).
         """
@@ -145,33 +272,31 @@ class RAGHistoryModel(BaseModel):
                 None, None, agent_id, None, session_id
             )
             
-            cur = self.conn.execute(f"""
-                INSERT INTO {self.table} 
-                (event_type, timestamp, query_text, target_doc_id, target_chunk_id,
-                 metrics_json, context_json, reward_signal, action_taken, state_before,
-                 state_after, agent_id, user_id, session_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, data_ordered)
-            
-            self.conn.commit()
-            return cur.lastrowid
+            return self._log_event(data_ordered)
             
         except Exception as e:
             print(f"Error logging synthetic test: {e}")
             return None
 
+    def _recent_events(self, event_type: str, limit: int) -> List[Dict]:
+        """Newest events of a type, read from the live table and only falling back to archives if short."""
+        sql = f"""
+            SELECT {', '.join(self.fields)}
+            FROM {{source}}
+            WHERE event_type = ?
+            ORDER BY timestamp DESC
+            LIMIT ?
+        """
+        rows = list(self.iter_query(sql.format(source=self.table), (event_type, limit)))
+        source = self.partitions().source_for()
+        if len(rows) < limit and source != self.table:
+            rows = list(self.iter_query(sql.format(source=source), (event_type, limit)))
+        return rows
+
     def get_recent_queries(self, limit: int = 10) -> List[Dict]:
         """Get recent query events."""
         try:
-            cur = self.conn.execute(f"""
-                SELECT {', '.join(self.fields)}
-                FROM {self.table}
-                WHERE event_type = 'QUERY'
-                ORDER BY timestamp DESC
-                LIMIT ?
-            """, (limit,))
-            
-            return [self._row_to_dict(row) for row in cur.fetchall()]
+            return self._recent_events('QUERY', limit)
             
         except Exception as e:
             print(f"Error getting recent queries: {e}")
@@ -180,47 +305,48 @@ class RAGHistoryModel(BaseModel):
     def get_recent_healings(self, limit: int = 10) -> List[Dict]:
         """Get recent healing events."""
         try:
-            cur = self.conn.execute(f"""
-                SELECT {', '.join(self.fields)}
-                FROM {self.table}
-                WHERE event_type = 'HEAL'
-                ORDER BY timestamp DESC
-                LIMIT ?
-            """, (limit,))
-            
-            return [self._row_to_dict(row) for row in cur.fetchall()]
+            return self._recent_events('HEAL', limit)
             
         except Exception as e:
             print(f"Error getting recent healings: {e}")
             return []
 
-    def get_doc_performance_history(self, target_doc_id: str) -> List[Dict]:
+    def iter_doc_performance_history(self, target_doc_id: str, start_time: str = None,
+                                     batch_size: int = None) -> Iterator[Dict]:
+        """
+        Stream performance history for a specific document, oldest first.
+        With `start_time` inside the live window, archived partitions are not read.
+        """
+        source = self.partitions().source_for(start_time)
+        return self.iter_query(f"""
+            SELECT {', '.join(self.fields)}
+            FROM {source}
+            WHERE target_doc_id = ? AND timestamp >= ?
+            ORDER BY timestamp ASC
+        """, (target_doc_id, start_time or ''), batch_size)
+
+    def get_doc_performance_history(self, target_doc_id: str, start_time: str = None) -> List[Dict]:
         """Get performance history for a specific document."""
         try:
-            cur = self.conn.execute(f"""
-                SELECT {', '.join(self.fields)}
-                FROM {self.table}
-                WHERE target_doc_id = ?
-                ORDER BY timestamp ASC
-            """, (target_doc_id,))
-            
-            return [self._row_to_dict(row) for row in cur.fetchall()]
+            return list(self.iter_doc_performance_history(target_doc_id, start_time))
             
         except Exception as e:
             print(f"Error getting doc performance history: {e}")
             return []
 
+    def iter_agent_performance(self, agent_id: str, batch_size: int = None) -> Iterator[Dict]:
+        """Stream events for a specific agent, newest first."""
+        return self.iter_query(f"""
+            SELECT {', '.join(self.fields)}
+            FROM {self.partitions().source_for()}
+            WHERE agent_id = ?
+            ORDER BY timestamp DESC
+        """, (agent_id,), batch_size)
+
     def get_agent_performance(self, agent_id: str) -> List[Dict]:
         """Get performance metrics for a specific agent."""
         try:
-            cur = self.conn.execute(f"""
-                SELECT {', '.join(self.fields)}
-                FROM {self.table}
-                WHERE agent_id = ?
-                ORDER BY timestamp DESC
-            """, (agent_id,))
-            
-            return [self._row_to_dict(row) for row in cur.fetchall()]
+            return list(self.iter_agent_performance(agent_id))
             
         except Exception as e:
             print(f"Error getting agent performance: {e}")
@@ -228,10 +354,15 @@ class RAGHistoryModel(BaseModel):
 
     def search_by_filters(self, event_type: str = None, target_doc_id: str = None,
                          agent_id: str = None, start_time: str = None, 
-                         end_time: str = None, limit: int = 100) -> List[Dict]:
-        """Search history with multiple filters."""
+                         end_time: str = None, limit: int = 100,
+                         min_accuracy: float = None, max_latency: float = None) -> List[Dict]:
+        """Search history with multiple filters (metric filters use the typed columns)."""
         try:
-            query = f"SELECT {', '.join(self.fields)} FROM {self.table} WHERE 1=1"
+            if min_accuracy is not None or max_latency is not None:
+                self.ensure_schema()
+            # Windows that start inside the live range never touch archive partitions
+            source = self.partitions().source_for(start_time)
+            query = f"SELECT {', '.join(self.fields)} FROM {source} WHERE 1=1"
             params = []
             
             if event_type:
@@ -253,19 +384,26 @@ class RAGHistoryModel(BaseModel):
             if end_time:
                 query += " AND timestamp <= ?"
                 params.append(end_time)
+
+            if min_accuracy is not None:
+                query += " AND accuracy >= ?"
+                params.append(min_accuracy)
+
+            if max_latency is not None:
+                query += " AND latency <= ?"
+                params.append(max_latency)
                 
             query += " ORDER BY timestamp DESC LIMIT ?"
             params.append(limit)
             
-            cur = self.conn.execute(query, params)
-            return [self._row_to_dict(row) for row in cur.fetchall()]
+            return list(self.iter_query(query, params))
             
         except Exception as e:
             print(f"Error searching history: {e}")
             return []
 
     def log_guardrail_check(self, target_doc_id: str, checks_json: str, is_safe: bool = True,
-                           agent_id: str = "langgraph_agent", session_id: str = None) -> int:
+                           agent_id: str = "langgraph_agent", session_id: str = None) -> int | None:
         """
         Log a guardrails validation check event.
         
@@ -291,22 +429,87 @@ class RAGHistoryModel(BaseModel):
                 action_taken, None, None, agent_id, None, session_id
             )
             
-            cur = self.conn.execute(f"""
-                INSERT INTO {self.table} 
-                (event_type, timestamp, query_text, target_doc_id, target_chunk_id,
-                 metrics_json, context_json, reward_signal, action_taken, state_before,
-                 state_after, agent_id, user_id, session_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, data_ordered)
-            
-            self.conn.commit()
-            return cur.lastrowid
+            return self._log_event(data_ordered)
             
         except Exception as e:
             print(f"Error logging guardrail check: {e}")
             return None
 
     def close(self):
-        """Close database connection."""
-        if hasattr(self, 'conn') and self.conn:
+        """
+        Close a connection this model was handed. Pooled connections are shared
+        by every model in the script run, so they are left alone and go back to
+        the pool when the run's thread ends.
+        """
+        if hasattr(self, 'conn') and self.conn and not get_pool().owns(self.conn):
             self.conn.close()
+
+
+_event_writer: EventWriter | None = None
+_event_writer_lock = threading.Lock()
+
+
+def get_event_writer() -> EventWriter | None:
+    """Process-wide batched writer for history events, or None when disabled."""
+    global _event_writer
+    if os.getenv("RAG_HISTORY_ASYNC_WRITES", "1").lower() in ("0", "false", "no"):
+        return None
+    if _event_writer is None:
+        with _event_writer_lock:
+            if _event_writer is None:
+                _event_writer = EventWriter(
+                    sink=lambda events: RAGHistoryModel().insert_events(events),
+                    max_queue=int(os.getenv("RAG_HISTORY_QUEUE_SIZE", "10000")),
+                    batch_size=int(os.getenv("RAG_HISTORY_BATCH_SIZE", "200")),
+                    flush_interval=float(os.getenv("RAG_HISTORY_FLUSH_INTERVAL", "1.0")),
+                    name="rag-history-writer",
+                )
+    return _event_writer
+
+
+_maintenance_thread: threading.Thread | None = None
+_maintenance_lock = threading.Lock()
+
+
+def maintain_history() -> Dict[str, List]:
+    """
+    One round of history upkeep on the pooled database: fold rows written
+    around the model into the rollups, then partition old events and apply
+    retention. Returns RAGHistoryPartitionModel.maintain's result.
+    """
+    history = RAGHistoryModel()
+    rollups = history.rollups()
+    rollups.ensure_schema()
+    if rollups.is_stale():
+        rollups.rebuild()
+    return history.partitions().maintain()
+
+
+def start_history_maintenance() -> threading.Thread | None:
+    """
+    Start the process-wide timer that runs maintain_history() now and then
+    every RAG_HISTORY_MAINTENANCE_INTERVAL seconds (3600; 0 disables it).
+    Safe to call repeatedly; returns the timer thread, or None when disabled.
+    """
+    global _maintenance_thread
+    interval = float(os.getenv("RAG_HISTORY_MAINTENANCE_INTERVAL", "3600"))
+    if interval <= 0:
+        return None
+    if _maintenance_thread is None:
+        with _maintenance_lock:
+            if _maintenance_thread is None:
+                _maintenance_thread = threading.Thread(
+                    target=_run_maintenance, args=(interval,),
+                    name="rag-history-maintenance", daemon=True,
+                )
+                _maintenance_thread.start()
+    return _maintenance_thread
+
+
+def _run_maintenance(interval: float) -> None:
+    while True:
+        try:
+            maintain_history()
+        except Exception as e:
+            print(f"Error maintaining history: {e}")
+        time.sleep(interval)
@@ -0,0 +1,260 @@
+from .base_model import BaseModel
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+class RAGHistoryPartitionModel(BaseModel):
+    """
+    Model for rag_history_partitions, the registry of monthly archive tables
+    (rag_history_p_YYYYMM) split off rag_history_and_optimization.
+
+    The live table only keeps recent events. Older months are moved into their
+    own indexed tables and stitched back together by the rag_history_all view,
+    so queries over recent windows touch a bounded amount of data. Months past
+    the retention period are compacted into the rollups and dropped.
+    """
+
+    table = 'rag_history_partitions'
+    fields = ['partition_name', 'month', 'row_count', 'created_at', 'compacted_at']
+    primary_key = 'partition_name'
+
+    hot_table = 'rag_history_and_optimization'
+    view_name = 'rag_history_all'
+
+    # Columns carried into archive partitions; metric columns become plain REALs there
+    history_columns = [
+        'history_id', 'event_type', 'timestamp', 'query_text', 'target_doc_id',
+        'target_chunk_id', 'metrics_json', 'context_json', 'reward_signal',
+        'action_taken', 'state_before', 'state_after', 'agent_id', 'user_id',
+        'session_id', 'accuracy', 'latency', 'cost', 'improvement_delta'
+    ]
+
+    schema = [
+        """
+        CREATE TABLE IF NOT EXISTS rag_history_partitions (
+            partition_name TEXT PRIMARY KEY,
+            month TEXT NOT NULL UNIQUE,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL,
+            compacted_at TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_rag_history_time ON rag_history_and_optimization (timestamp)",
+    ]
+
+    # Boundary cache shared by all instances: database file -> (checked_at, boundary)
+    _boundary_cache: Dict[str, tuple] = {}
+    boundary_ttl = 60.0
+
+    def ensure_schema(self) -> None:
+        if not self.columns():
+            from .rag_history_model import RAGHistoryModel
+            # Partitions copy the typed metric columns, so the live table needs them first
+            RAGHistoryModel(None if self._pooled else self.conn).ensure_schema()
+            self.apply_migration(self.schema)
+            self.rebuild_view()
+
+    # --- Routing ---
+
+    def boundary(self) -> Optional[str]:
+        """
+        Start of the live table's range: every event older than this lives in an
+        archive partition. None when nothing has been partitioned.
+        """
+        database = self.database_key()
+        cached = RAGHistoryPartitionModel._boundary_cache.get(database)
+        if cached and time.monotonic() - cached[0] < self.boundary_ttl:
+            return cached[1]
+
+        boundary = None
+        if self.columns():
+            row = self.conn.execute(f"SELECT MAX(month) FROM {self.table}").fetchone()
+            if row and row[0]:
+                boundary = _next_month(row[0]) + "-01"
+        RAGHistoryPartitionModel._boundary_cache[database] = (time.monotonic(), boundary)
+        return boundary
+
+    def source_for(self, start_time: str = None) -> str:
+        """Table or view a query starting at `start_time` has to read."""
+        boundary = self.boundary()
+        if boundary is None or (start_time and start_time >= boundary):
+            return self.hot_table
+        return self.view_name
+
+    def _reset_boundary(self) -> None:
+        RAGHistoryPartitionModel._boundary_cache.pop(self.database_key(), None)
+
+    # --- Partition maintenance ---
+
+    def maintain(self, hot_months: int = None, retention_months: int = None,
+                 vacuum: bool = None) -> Dict[str, List]:
+        """
+        Periodic upkeep: partition_old_events() then apply_retention(). Defaults
+        come from RAG_HISTORY_HOT_MONTHS (1), RAG_HISTORY_RETENTION_MONTHS (12)
+        and RAG_HISTORY_VACUUM (off). Returns {"partitioned": [...], "dropped": [...]}.
+        """
+        if hot_months is None:
+            hot_months = int(os.getenv("RAG_HISTORY_HOT_MONTHS", "1"))
+        if retention_months is None:
+            retention_months = int(os.getenv("RAG_HISTORY_RETENTION_MONTHS", "12"))
+        if vacuum is None:
+            vacuum = os.getenv("RAG_HISTORY_VACUUM", "0").lower() in ("1", "true", "yes")
+        return {
+            "partitioned": self.partition_old_events(hot_months),
+            "dropped": self.apply_retention(retention_months, vacuum),
+        }
+
+    def partition_old_events(self, hot_months: int = 1) -> List[Dict]:
+        """
+        Move every event older than the last `hot_months` calendar months out of
+        the live table into its monthly partition. Each month moves in one
+        transaction. Returns the partitions touched with their row counts.
+        """
+        self.ensure_schema()
+        cutoff = _add_months(datetime.now().strftime("%Y-%m"), -(hot_months - 1)) + "-01"
+        months = [
+            row[0] for row in self.conn.execute(f"""
+                SELECT DISTINCT substr(timestamp, 1, 7)
+                FROM {self.hot_table}
+                WHERE timestamp < ?
+            """, (cutoff,)).fetchall()
+        ]
+
+        compacted = {
+            row[0] for row in self.conn.execute(
+                f"SELECT month FROM {self.table} WHERE compacted_at IS NOT NULL"
+            ).fetchall()
+        }
+
+        moved = []
+        for month in sorted(months):
+            name = self.partition_name(month)
+            start, end = month + "-01", _next_month(month) + "-01"
+            columns = ', '.join(self.history_columns)
+
+            if month in compacted:
+                # Late events for a month already past retention were rolled up when
+                # they were logged; their raw rows are not kept
+                self._execute_write(
+                    f"DELETE FROM {self.hot_table} WHERE timestamp >= ? AND timestamp < ?", (start, end)
+                )
+                continue
+
+            def work(conn, name=name, month=month, start=start, end=end, columns=columns):
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {name} (
+                        history_id INTEGER PRIMARY KEY,
+                        event_type TEXT, timestamp TEXT, query_text TEXT,
+                        target_doc_id TEXT, target_chunk_id TEXT,
+                        metrics_json TEXT, context_json TEXT, reward_signal REAL,
+                        action_taken TEXT, state_before TEXT, state_after TEXT,
+                        agent_id TEXT, user_id TEXT, session_id TEXT,
+                        accuracy REAL, latency REAL, cost REAL, improvement_delta REAL
+                    )
+                """)
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_event_time ON {name} (event_type, timestamp)")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_doc_time ON {name} (target_doc_id, timestamp)")
+                cur = conn.execute(f"""
+                    INSERT OR REPLACE INTO {name} ({columns})
+                    SELECT {columns} FROM {self.hot_table}
+                    WHERE timestamp >= ? AND timestamp < ?
+                """, (start, end))
+                count = cur.rowcount
+                conn.execute(f"DELETE FROM {self.hot_table} WHERE timestamp >= ? AND timestamp < ?", (start, end))
+                conn.execute(f"""
+                    INSERT INTO {self.table} (partition_name, month, row_count, created_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (partition_name) DO UPDATE SET row_count = row_count + excluded.row_count
+                """, (name, month, count, datetime.now().isoformat()))
+                return count
+
+            moved.append({"partition": name, "month": month, "rows": self._run_write(work)})
+
+        if moved:
+            BaseModel.invalidate_schema()
+            self.rebuild_view()
+        self._reset_boundary()
+        return moved
+
+    def apply_retention(self, retention_months: int = 12, vacuum: bool = False) -> List[str]:
+        """
+        Compact partitions older than `retention_months` into the rollups and
+        drop their raw rows. With `vacuum`, reclaim_space() runs afterwards.
+        Returns the dropped partitions.
+        """
+        from .rag_history_rollup_model import RAGHistoryRollupModel
+
+        self.ensure_schema()
+        cutoff = _add_months(datetime.now().strftime("%Y-%m"), -retention_months)
+        expired = self.conn.execute(f"""
+            SELECT partition_name, month FROM {self.table}
+            WHERE month < ? AND compacted_at IS NULL
+            ORDER BY month
+        """, (cutoff,)).fetchall()
+
+        rollups = RAGHistoryRollupModel(None if self._pooled else self.conn)
+        dropped = []
+        for name, month in expired:
+            # Rollups for the month are recomputed from the raw rows before they go
+            rollups.rebuild(month + "-01", _next_month(month) + "-01", source=name)
+
+            def work(conn, name=name):
+                conn.execute(f"UPDATE {self.table} SET compacted_at = ? WHERE partition_name = ?",
+                             (datetime.now().isoformat(), name))
+
+            self._run_write(work)
+            # The view must stop referencing the partition before it is dropped
+            self.rebuild_view()
+            self.apply_migration([f"DROP TABLE IF EXISTS {name}"])
+            dropped.append(name)
+
+        if dropped and vacuum:
+            self.reclaim_space()
+        self._reset_boundary()
+        return dropped
+
+    def reclaim_space(self) -> None:
+        """
+        Hand pages freed by dropped partitions back to the filesystem. On an
+        auto_vacuum=INCREMENTAL database this is a cheap incremental_vacuum;
+        otherwise it is a full VACUUM. Either way it runs on this model's own
+        connection rather than through the writer queue, so queued writes are
+        not held behind it.
+        """
+        if self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            # execute() stops after the first page; executescript steps it to completion
+            self.conn.executescript("PRAGMA incremental_vacuum")
+        else:
+            self.conn.execute("VACUUM")
+
+    def rebuild_view(self) -> None:
+        """Recreate rag_history_all over the live table and every live partition."""
+        columns = ', '.join(self.history_columns)
+        live = [
+            row[0] for row in self.conn.execute(f"""
+                SELECT partition_name FROM {self.table}
+                WHERE compacted_at IS NULL ORDER BY month
+            """).fetchall()
+        ]
+        selects = [f"SELECT {columns} FROM {self.hot_table}"]
+        selects += [f"SELECT {columns} FROM {name}" for name in live]
+        self.apply_migration([
+            f"DROP VIEW IF EXISTS {self.view_name}",
+            f"CREATE VIEW {self.view_name} AS " + "\nUNION ALL\n".join(selects),
+        ])
+
+    @staticmethod
+    def partition_name(month: str) -> str:
+        return "rag_history_p_" + month.replace("-", "")
+
+
+def _add_months(month: str, delta: int) -> str:
+    year, mon = int(month[:4]), int(month[5:7])
+    index = year * 12 + (mon - 1) + delta
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _next_month(month: str) -> str:
+    return _add_months(month[:7], 1)
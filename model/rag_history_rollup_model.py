@@ -0,0 +1,335 @@
+from .base_model import BaseModel
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+import pandas as pd
+
+
+class RAGHistoryRollupModel(BaseModel):
+    """
+    Model for rag_history_rollup: per-minute, per-hour and per-day aggregates of
+    rag_history_and_optimization, keyed by event_type and action_taken.
+    Maintained incrementally as events are written so dashboards never scan raw history.
+    rag_history_rollup_watermark holds the highest history_id folded in, moved
+    in the same transaction as the rollups it covers.
+    """
+
+    table = 'rag_history_rollup'
+    fields = [
+        'granularity', 'bucket_start', 'event_type', 'action_taken', 'event_count',
+        'accuracy_sum', 'accuracy_count', 'accuracy_min', 'accuracy_max',
+        'latency_sum', 'latency_count', 'latency_min', 'latency_max',
+        'reward_sum', 'reward_count'
+    ]
+
+    granularities = ('minute', 'hour', 'day')
+    watermark_table = 'rag_history_rollup_watermark'
+
+    schema = [
+        """
+        CREATE TABLE IF NOT EXISTS rag_history_rollup (
+            granularity TEXT NOT NULL,
+            bucket_start TEXT NOT NULL,
+            event_type TEXT NOT NULL,
+            action_taken TEXT NOT NULL DEFAULT '',
+            event_count INTEGER NOT NULL DEFAULT 0,
+            accuracy_sum REAL NOT NULL DEFAULT 0,
+            accuracy_count INTEGER NOT NULL DEFAULT 0,
+            accuracy_min REAL,
+            accuracy_max REAL,
+            latency_sum REAL NOT NULL DEFAULT 0,
+            latency_count INTEGER NOT NULL DEFAULT 0,
+            latency_min REAL,
+            latency_max REAL,
+            reward_sum REAL NOT NULL DEFAULT 0,
+            reward_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (granularity, bucket_start, event_type, action_taken)
+        ) WITHOUT ROWID
+        """,
+    ]
+
+    watermark_schema = [
+        """
+        CREATE TABLE IF NOT EXISTS rag_history_rollup_watermark (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            history_id INTEGER NOT NULL
+        )
+        """,
+    ]
+    # Database files whose watermark table is known to exist
+    _watermark_ready: set = set()
+
+    _upsert_sql = """
+        INSERT INTO rag_history_rollup (
+            granularity, bucket_start, event_type, action_taken, event_count,
+            accuracy_sum, accuracy_count, accuracy_min, accuracy_max,
+            latency_sum, latency_count, latency_min, latency_max,
+            reward_sum, reward_count
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (granularity, bucket_start, event_type, action_taken) DO UPDATE SET
+            event_count = event_count + excluded.event_count,
+            accuracy_sum = accuracy_sum + excluded.accuracy_sum,
+            accuracy_count = accuracy_count + excluded.accuracy_count,
+            accuracy_min = COALESCE(MIN(accuracy_min, excluded.accuracy_min), accuracy_min, excluded.accuracy_min),
+            accuracy_max = COALESCE(MAX(accuracy_max, excluded.accuracy_max), accuracy_max, excluded.accuracy_max),
+            latency_sum = latency_sum + excluded.latency_sum,
+            latency_count = latency_count + excluded.latency_count,
+            latency_min = COALESCE(MIN(latency_min, excluded.latency_min), latency_min, excluded.latency_min),
+            latency_max = COALESCE(MAX(latency_max, excluded.latency_max), latency_max, excluded.latency_max),
+            reward_sum = reward_sum + excluded.reward_sum,
+            reward_count = reward_count + excluded.reward_count
+    """
+
+    # SQL expressions bucketing a history timestamp ("YYYY-MM-DD HH:MM:SS" or ISO "T" form)
+    _bucket_sql = {
+        'minute': "substr(replace(timestamp, 'T', ' '), 1, 16) || ':00'",
+        'hour': "substr(replace(timestamp, 'T', ' '), 1, 13) || ':00:00'",
+        'day': "substr(timestamp, 1, 10) || ' 00:00:00'",
+    }
+
+    def ensure_schema(self) -> None:
+        """Create the rollup and watermark tables on first use."""
+        if not self.columns():
+            self.apply_migration(self.schema)
+        database = self.database_key()
+        if database not in RAGHistoryRollupModel._watermark_ready:
+            self.apply_migration(self.watermark_schema)
+            RAGHistoryRollupModel._watermark_ready.add(database)
+
+    # --- Incremental maintenance ---
+
+    @staticmethod
+    def bucket(timestamp: str, granularity: str) -> str:
+        ts = timestamp.replace('T', ' ')
+        if granularity == 'minute':
+            return ts[:16] + ':00'
+        if granularity == 'hour':
+            return ts[:13] + ':00:00'
+        return ts[:10] + ' 00:00:00'
+
+    def aggregate(self, events: Iterable[Dict]) -> List[Tuple]:
+        """
+        Fold history events (dicts with event_type, timestamp, action_taken,
+        metrics_json, reward_signal) into rollup rows ready for `upsert`.
+        """
+        acc: Dict[Tuple, List] = {}
+        for event in events:
+            metrics = _parse_metrics(event.get('metrics_json'))
+            accuracy = _as_float(metrics.get('accuracy'))
+            latency = _as_float(metrics.get('latency'))
+            reward = _as_float(event.get('reward_signal'))
+
+            for granularity in self.granularities:
+                key = (
+                    granularity,
+                    self.bucket(event['timestamp'], granularity),
+                    event['event_type'],
+                    event.get('action_taken') or '',
+                )
+                row = acc.setdefault(key, [0, 0.0, 0, None, None, 0.0, 0, None, None, 0.0, 0])
+                row[0] += 1
+                if accuracy is not None:
+                    row[1] += accuracy
+                    row[2] += 1
+                    row[3] = accuracy if row[3] is None else min(row[3], accuracy)
+                    row[4] = accuracy if row[4] is None else max(row[4], accuracy)
+                if latency is not None:
+                    row[5] += latency
+                    row[6] += 1
+                    row[7] = latency if row[7] is None else min(row[7], latency)
+                    row[8] = latency if row[8] is None else max(row[8], latency)
+                if reward is not None:
+                    row[9] += reward
+                    row[10] += 1
+
+        return [key + tuple(values) for key, values in acc.items()]
+
+    def upsert(self, conn, rows: List[Tuple], last_history_id: int = None) -> None:
+        """
+        Merge aggregated rows into the rollup inside the caller's transaction
+        and move the watermark up to `last_history_id`, the newest event they cover.
+        """
+        if rows:
+            conn.executemany(self._upsert_sql, rows)
+        if last_history_id is not None:
+            self._set_watermark(conn, last_history_id)
+
+    def _set_watermark(self, conn, history_id: int, replace: bool = False) -> None:
+        conn.execute(f"""
+            INSERT INTO {self.watermark_table} (id, history_id) VALUES (1, ?)
+            ON CONFLICT (id) DO UPDATE SET history_id =
+                {'excluded.history_id' if replace else 'MAX(history_id, excluded.history_id)'}
+        """, (history_id,))
+
+    def rebuild(self, start_time: str = None, end_time: str = None, source: str = None) -> None:
+        """
+        Recompute rollups from raw history (for backfill or after bulk imports),
+        optionally limited to [start_time, end_time) aligned on day boundaries.
+        `source` defaults to the rag_history_all view once history has been
+        partitioned (live table plus archive partitions), else the live table.
+        Months compacted away by retention have no raw rows left, so a default
+        rebuild keeps their rollups and starts after them. A full rebuild
+        (no range, default source) also resets the watermark.
+        """
+        full = source is None and start_time is None and end_time is None
+        if source is None:
+            source = self.history_source()
+            floor = self.compacted_until()
+            if floor and (not start_time or start_time[:10] < floor):
+                start_time = floor
+        self.ensure_schema()
+        where, params = "WHERE 1=1", []
+        if start_time:
+            where += " AND timestamp >= ?"
+            params.append(start_time[:10])
+        if end_time:
+            where += " AND timestamp < ?"
+            params.append(end_time[:10])
+
+        # Prefer the typed generated columns once the history table has them
+        history_columns = {
+            row[1] for row in self.conn.execute(f"PRAGMA table_xinfo({source})")
+        }
+        accuracy = "accuracy" if "accuracy" in history_columns else \
+            "CASE WHEN json_valid(metrics_json) THEN json_extract(metrics_json, '$.accuracy') END"
+        latency = "latency" if "latency" in history_columns else \
+            "CASE WHEN json_valid(metrics_json) THEN json_extract(metrics_json, '$.latency') END"
+
+        def work(conn):
+            delete_sql = "DELETE FROM rag_history_rollup WHERE 1=1"
+            delete_params = []
+            if start_time:
+                delete_sql += " AND bucket_start >= ?"
+                delete_params.append(start_time[:10])
+            if end_time:
+                delete_sql += " AND bucket_start < ?"
+                delete_params.append(end_time[:10])
+            conn.execute(delete_sql, delete_params)
+
+            for granularity, bucket in self._bucket_sql.items():
+                conn.execute(f"""
+                    INSERT INTO rag_history_rollup
+                    SELECT ?, {bucket}, event_type, COALESCE(action_taken, ''), COUNT(*),
+                           COALESCE(SUM(acc), 0), COUNT(acc), MIN(acc), MAX(acc),
+                           COALESCE(SUM(lat), 0), COUNT(lat), MIN(lat), MAX(lat),
+                           COALESCE(SUM(reward_signal), 0), COUNT(reward_signal)
+                    FROM (
+                        SELECT timestamp, event_type, action_taken, reward_signal,
+                               {accuracy} AS acc, {latency} AS lat
+                        FROM {source}
+                        {where}
+                    )
+                    GROUP BY 2, 3, 4
+                """, [granularity] + params)
+
+            if full:
+                newest = conn.execute("SELECT MAX(history_id) FROM rag_history_and_optimization").fetchone()[0]
+                self._set_watermark(conn, newest or 0, replace=True)
+
+        self._run_write(work)
+
+    # --- Dashboard readers ---
+
+    def _filters(self, granularity: str, event_types: List[str] = None,
+                 start_time: str = None) -> Tuple[str, List]:
+        where = "WHERE granularity = ?"
+        params: List = [granularity]
+        if event_types:
+            where += f" AND event_type IN ({', '.join('?' for _ in event_types)})"
+            params.extend(event_types)
+        if start_time:
+            where += " AND bucket_start >= ?"
+            params.append(self.bucket(start_time, granularity))
+        return where, params
+
+    def get_series(self, granularity: str = 'hour', event_types: List[str] = None,
+                   start_time: str = None) -> pd.DataFrame:
+        """Per-bucket counts and mean accuracy / latency / reward by event_type."""
+        where, params = self._filters(granularity, event_types, start_time)
+        return pd.read_sql_query(f"""
+            SELECT bucket_start AS timestamp, event_type,
+                   SUM(event_count) AS event_count,
+                   SUM(accuracy_sum) / NULLIF(SUM(accuracy_count), 0) AS accuracy,
+                   MIN(accuracy_min) AS accuracy_min, MAX(accuracy_max) AS accuracy_max,
+                   SUM(latency_sum) / NULLIF(SUM(latency_count), 0) AS latency,
+                   MIN(latency_min) AS latency_min, MAX(latency_max) AS latency_max,
+                   SUM(reward_sum) / NULLIF(SUM(reward_count), 0) AS reward_signal
+            FROM {self.table}
+            {where}
+            GROUP BY bucket_start, event_type
+            ORDER BY bucket_start
+        """, self.conn, params=params)
+
+    def get_totals(self, granularity: str = 'day', event_types: List[str] = None,
+                   start_time: str = None) -> pd.DataFrame:
+        """Event counts by event_type and action_taken over the selected window."""
+        where, params = self._filters(granularity, event_types, start_time)
+        df = pd.read_sql_query(f"""
+            SELECT event_type, action_taken, SUM(event_count) AS event_count
+            FROM {self.table}
+            {where}
+            GROUP BY event_type, action_taken
+        """, self.conn, params=params)
+        df["action_taken"] = df["action_taken"].replace('', None)
+        return df
+
+    def get_event_types(self) -> List[str]:
+        cur = self.conn.execute(
+            f"SELECT DISTINCT event_type FROM {self.table} WHERE granularity = 'day' ORDER BY event_type"
+        )
+        return [row[0] for row in cur.fetchall()]
+
+    def is_empty(self) -> bool:
+        return self.conn.execute(f"SELECT 1 FROM {self.table} LIMIT 1").fetchone() is None
+
+    # --- Consistency ---
+
+    def _exists(self, name: str) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = ? AND type IN ('table', 'view')", (name,)
+        ).fetchone() is not None
+
+    def history_source(self) -> str:
+        """rag_history_all when archive partitions exist, else the live table."""
+        return 'rag_history_all' if self._exists('rag_history_all') else 'rag_history_and_optimization'
+
+    def compacted_until(self) -> Optional[str]:
+        """First day after the last month compacted by retention, or None."""
+        if not self._exists('rag_history_partitions'):
+            return None
+        row = self.conn.execute(
+            "SELECT MAX(month) FROM rag_history_partitions WHERE compacted_at IS NOT NULL"
+        ).fetchone()
+        if not row or not row[0]:
+            return None
+        year, month = int(row[0][:4]), int(row[0][5:7])
+        return f"{year + month // 12:04d}-{month % 12 + 1:02d}-01"
+
+    def is_stale(self) -> bool:
+        """
+        True when the live table holds events past the watermark, i.e. rows
+        inserted around the model (seeders, imports) that only a rebuild()
+        folds in. One statement over the rowid and a one-row table, so it is
+        cheap and sees a consistent snapshot.
+        """
+        newest, watermark = self.conn.execute(f"""
+            SELECT (SELECT MAX(history_id) FROM rag_history_and_optimization),
+                   (SELECT history_id FROM {self.watermark_table} WHERE id = 1)
+        """).fetchone()
+        return newest is not None and (watermark is None or newest > watermark)
+
+
+def _parse_metrics(metrics_json) -> Dict:
+    if not metrics_json:
+        return {}
+    try:
+        metrics = json.loads(metrics_json)
+    except (TypeError, ValueError):
+        return {}
+    return metrics if isinstance(metrics, dict) else {}
+
+
+def _as_float(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
@@ -48,6 +48,10 @@ class UserModel(BaseModel):
         cur = self.conn.execute(sql, (user_id,))
         return [dict(row) for row in cur.fetchall()]
     def user_full_profile(self):
+        return list(self.iter_user_full_profile())
+
+    def iter_user_full_profile(self, batch_size=None):
+        """Stream the joined profile of every user without materialising the whole result"""
         sql = '''
         SELECT u.id,u.name,u.email,
             cu.company_id, c.name as company_name, cu.role as company_role,
@@ -61,7 +65,25 @@ class UserModel(BaseModel):
         LEFT JOIN user_roles ur ON u.id = ur.user_id
         LEFT JOIN roles r ON ur.role_id = r.id
         '''
-        cur = self.conn.execute(sql)
+        return self.iter_query(sql, (), batch_size)
+
+    def user_full_profile_page(self, last_id=None, limit=50):
+        """Keyset page of joined profiles: `limit` users with id greater than `last_id`"""
+        sql = '''
+        SELECT u.id,u.name,u.email,
+            cu.company_id, c.name as company_name, cu.role as company_role,
+            du.department_id, d.name as department_name,
+            r.name as role_name, r.guard,u.created_at,u.updated_at
+        FROM (SELECT * FROM users WHERE id > ? ORDER BY id LIMIT ?) u
+        LEFT JOIN company_users cu ON u.id = cu.user_id
+        LEFT JOIN companies c ON cu.company_id = c.id
+        LEFT JOIN department_users du ON u.id = du.user_id
+        LEFT JOIN departments d ON du.department_id = d.id
+        LEFT JOIN user_roles ur ON u.id = ur.user_id
+        LEFT JOIN roles r ON ur.role_id = r.id
+        ORDER BY u.id
+        '''
+        cur = self.conn.execute(sql, (last_id if last_id is not None else 0, limit))
         return [dict(row) for row in cur.fetchall()]
 
     def find_user_full_profile(self, user_id):
@@ -7,9 +7,8 @@ class UserRoleModel(BaseModel):
 
     def assign(self, user_id, role_id, company_id=None):
         try:
-            cur = self.conn.execute('INSERT INTO user_roles (user_id, role_id, company_id) VALUES (?, ?, ?)', (user_id, role_id, company_id))
-            self.conn.commit()
-            return cur.lastrowid
+            lastrowid, _ = self._execute_write('INSERT INTO user_roles (user_id, role_id, company_id) VALUES (?, ?, ?)', (user_id, role_id, company_id))
+            return lastrowid
         except Exception as e:
         # could be unique constraint violation
             return None
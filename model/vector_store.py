@@ -0,0 +1,421 @@
+from .base_model import BaseModel
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def default_vector_store_path() -> str:
+    return os.getenv("VECTOR_STORE_DIR", os.path.join("data", "vector_store"))
+
+
+class _VectorFile:
+    """
+    Growable float32 matrix backed by a memory-mapped file, plus the IVF
+    centroids stored next to it. One instance per directory is shared by every
+    VectorStore in the process.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.meta_path = os.path.join(path, "meta.json")
+        self.data_path = os.path.join(path, "vectors.f32")
+        self.centroids_path = os.path.join(path, "centroids.npy")
+        self.lock = threading.RLock()
+
+        self.dim: Optional[int] = None
+        self.capacity = 0
+        self.centroids: Optional[np.ndarray] = None
+        self._map: Optional[np.memmap] = None
+
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            self.dim, self.capacity = meta["dim"], meta["capacity"]
+            self._open()
+        if os.path.exists(self.centroids_path):
+            self.centroids = np.load(self.centroids_path)
+
+    def _open(self) -> None:
+        self._map = self._mapping(self.capacity)
+
+    def _mapping(self, capacity: int) -> Optional[np.memmap]:
+        return np.memmap(self.data_path, dtype=np.float32, mode='r+',
+                         shape=(capacity, self.dim)) if capacity else None
+
+    def _save_meta(self) -> None:
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"dim": self.dim, "capacity": self.capacity}, f)
+        os.replace(tmp, self.meta_path)
+
+    def reserve(self, rows: int, dim: int) -> None:
+        """Make room for `rows` vectors, doubling the file as it grows."""
+        with self.lock:
+            if self.dim is None:
+                self.dim = dim
+            elif dim != self.dim:
+                raise ValueError(f"Vector dimension {dim} does not match store dimension {self.dim}")
+            if rows <= self.capacity:
+                return
+            capacity = max(rows, self.capacity * 2, 1024)
+            if self._map is not None:
+                self._map.flush()
+            with open(self.data_path, "ab") as f:
+                f.truncate(capacity * self.dim * 4)
+            # Readers don't take the lock: publish the grown mapping in one
+            # assignment; searches holding the old one keep a valid view of its rows
+            self._map = self._mapping(capacity)
+            self.capacity = capacity
+            self._save_meta()
+
+    def write(self, slots: np.ndarray, vectors: np.ndarray) -> None:
+        with self.lock:
+            self._map[slots] = vectors
+            self._map.flush()
+
+    def rows(self, slots: np.ndarray) -> np.ndarray:
+        mapping = self._map
+        return mapping[slots]
+
+    def span(self, start: int, stop: int) -> np.ndarray:
+        mapping = self._map
+        return mapping[start:stop]
+
+    def save_centroids(self, centroids: np.ndarray) -> None:
+        with self.lock:
+            tmp = self.centroids_path + ".tmp.npy"
+            np.save(tmp, centroids)
+            os.replace(tmp, self.centroids_path)
+            self.centroids = centroids
+
+
+_files: Dict[str, _VectorFile] = {}
+_files_lock = threading.Lock()
+
+
+def _vector_file(path: str) -> _VectorFile:
+    key = os.path.realpath(path)
+    with _files_lock:
+        if key not in _files:
+            _files[key] = _VectorFile(path)
+        return _files[key]
+
+
+class VectorStore(BaseModel):
+    """
+    Embedded vector store for chunk embeddings.
+
+    Vectors are stored L2-normalised as rows ("slots") of a memory-mapped
+    float32 file; chunk_vectors maps each chunk_id to its slot together with
+    the doc_id and rbac_namespace used for filtering. An IVF index (k-means
+    centroids, one list_id per row) narrows large searches to the `nprobe`
+    closest lists. Everything runs in-process, with no vector database service.
+    """
+
+    table = 'chunk_vectors'
+    fields = ['chunk_id', 'slot', 'doc_id', 'rbac_namespace', 'list_id', 'updated_at']
+    primary_key = 'chunk_id'
+
+    schema = [
+        """
+        CREATE TABLE IF NOT EXISTS chunk_vectors (
+            chunk_id TEXT PRIMARY KEY,
+            slot INTEGER NOT NULL UNIQUE,
+            doc_id TEXT,
+            rbac_namespace TEXT,
+            list_id INTEGER,
+            updated_at TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_chunk_vectors_list ON chunk_vectors (list_id, slot)",
+        "CREATE INDEX IF NOT EXISTS idx_chunk_vectors_doc ON chunk_vectors (doc_id, slot)",
+        "CREATE INDEX IF NOT EXISTS idx_chunk_vectors_namespace ON chunk_vectors (rbac_namespace, slot)",
+    ]
+
+    # Below this many vectors a flat scan is cheap enough to skip the IVF lists
+    exact_search_threshold = 20000
+    nprobe = 8
+    # Rows scored per matrix product, capped so queries x rows stays under score_budget
+    block_size = 65536
+    score_budget = 16 * 1024 * 1024
+
+    def __init__(self, conn=None, path: str = None):
+        super().__init__(conn)
+        self.path = path or default_vector_store_path()
+        self.file = _vector_file(self.path)
+
+    def ensure_schema(self) -> None:
+        if not self.columns():
+            self.apply_migration(self.schema)
+
+    # --- Writes ---
+
+    def add_vectors(self, chunk_ids: Sequence[str], vectors, doc_ids: Sequence[str] = None,
+                    rbac_namespaces: Sequence[str] = None) -> int:
+        """
+        Insert or replace the vectors for `chunk_ids` (an N x D array-like).
+        Existing chunks keep their slot. Returns the number of vectors written.
+        """
+        if len(chunk_ids) == 0:
+            return 0
+        self.ensure_schema()
+        vectors = _normalise(np.asarray(vectors, dtype=np.float32).reshape(len(chunk_ids), -1))
+        doc_ids = doc_ids or [None] * len(chunk_ids)
+        rbac_namespaces = rbac_namespaces or [None] * len(chunk_ids)
+        lists = self._nearest_lists(vectors) if self.file.centroids is not None else [None] * len(chunk_ids)
+        now_iso = datetime.now().isoformat()
+
+        def work(conn):
+            slots_by_id = {}
+            for batch in _batches(list(chunk_ids), 500):
+                cur = conn.execute(
+                    f"SELECT chunk_id, slot FROM {self.table} WHERE chunk_id IN ({', '.join('?' for _ in batch)})",
+                    batch
+                )
+                slots_by_id.update((row[0], row[1]) for row in cur.fetchall())
+            next_slot = conn.execute(f"SELECT COALESCE(MAX(slot) + 1, 0) FROM {self.table}").fetchone()[0]
+
+            slots = []
+            for chunk_id in chunk_ids:
+                if chunk_id not in slots_by_id:
+                    slots_by_id[chunk_id] = next_slot
+                    next_slot += 1
+                slots.append(slots_by_id[chunk_id])
+
+            # Vectors land before the rows that point at them
+            self.file.reserve(max(slots) + 1, vectors.shape[1])
+            self.file.write(np.asarray(slots), vectors)
+
+            conn.executemany(f"""
+                INSERT INTO {self.table} (chunk_id, slot, doc_id, rbac_namespace, list_id, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (chunk_id) DO UPDATE SET
+                    doc_id = excluded.doc_id,
+                    rbac_namespace = excluded.rbac_namespace,
+                    list_id = excluded.list_id,
+                    updated_at = excluded.updated_at
+            """, [
+                (chunk_id, slot, doc_id, namespace, None if list_id is None else int(list_id), now_iso)
+                for chunk_id, slot, doc_id, namespace, list_id
+                in zip(chunk_ids, slots, doc_ids, rbac_namespaces, lists)
+            ])
+            return len(slots)
+
+        return self._run_write(work)
+
+    def delete_vectors(self, chunk_ids: Sequence[str]) -> int:
+        """Forget the given chunks; their slots are left unused."""
+        self.ensure_schema()
+
+        def work(conn):
+            deleted = 0
+            for batch in _batches(list(chunk_ids), 500):
+                cur = conn.execute(
+                    f"DELETE FROM {self.table} WHERE chunk_id IN ({', '.join('?' for _ in batch)})", batch
+                )
+                deleted += cur.rowcount
+            return deleted
+
+        return self._run_write(work)
+
+    # --- Readers ---
+
+    def get_vector(self, chunk_id: str) -> Optional[np.ndarray]:
+        self.ensure_schema()
+        row = self.conn.execute(f"SELECT slot FROM {self.table} WHERE chunk_id = ?", (chunk_id,)).fetchone()
+        return np.array(self.file.rows(row[0])) if row else None
+
+    def stats(self) -> Dict:
+        self.ensure_schema()
+        count = self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        return {
+            "path": self.path,
+            "vectors": count,
+            "dim": self.file.dim,
+            "capacity": self.file.capacity,
+            "ivf_lists": 0 if self.file.centroids is None else len(self.file.centroids),
+        }
+
+    # --- Search ---
+
+    def search(self, vector, k: int = 10, nprobe: int = None, rbac_namespace: str = None,
+               doc_ids: Sequence[str] = None) -> List[Dict]:
+        """
+        Top-k chunks by cosine similarity to `vector`, best first, as
+        [{'chunk_id', 'doc_id', 'score'}]. Optional rbac_namespace / doc_ids
+        filters are applied before scoring.
+        """
+        self.ensure_schema()
+        if self.file.dim is None:
+            return []
+        query = self._prepare_queries(vector)
+
+        lists = None
+        if self.file.centroids is not None and self._slot_bound() > self.exact_search_threshold:
+            nprobe = min(nprobe or self.nprobe, len(self.file.centroids))
+            lists = np.argpartition(-(self.file.centroids @ query[0]), nprobe - 1)[:nprobe]
+
+        slots = self._candidate_slots(lists, rbac_namespace, doc_ids)
+        top_slots, scores = self._top_k(query, slots, k)
+        return self._hits(top_slots, scores)[0]
+
+    def search_batch(self, queries, k: int = 10, rbac_namespace: str = None,
+                     doc_ids: Sequence[str] = None) -> List[List[Dict]]:
+        """
+        Exact top-k for every row of an (N x D) query matrix, in the same format
+        as `search`. The filtered candidates are scored block by block with one
+        matrix product per block, so the work runs in BLAS rather than Python.
+        """
+        self.ensure_schema()
+        if self.file.dim is None:
+            return [[] for _ in range(len(queries))]
+        queries = self._prepare_queries(queries)
+        slots = self._candidate_slots(None, rbac_namespace, doc_ids)
+        top_slots, scores = self._top_k(queries, slots, k)
+        return self._hits(top_slots, scores)
+
+    def _prepare_queries(self, queries) -> np.ndarray:
+        queries = np.asarray(queries, dtype=np.float32)
+        queries = _normalise(queries.reshape(-1, queries.shape[-1]))
+        if queries.shape[1] != self.file.dim:
+            raise ValueError(f"Query dimension {queries.shape[1]} does not match store dimension {self.file.dim}")
+        return queries
+
+    def _slot_bound(self) -> int:
+        row = self.conn.execute(f"SELECT COALESCE(MAX(slot) + 1, 0) FROM {self.table}").fetchone()
+        return row[0]
+
+    def _candidate_slots(self, lists=None, rbac_namespace: str = None,
+                         doc_ids: Sequence[str] = None) -> np.ndarray:
+        where, params = "WHERE 1=1", []
+        if lists is not None:
+            where += f" AND list_id IN ({', '.join('?' for _ in lists)})"
+            params.extend(int(l) for l in lists)
+        if rbac_namespace:
+            where += " AND rbac_namespace = ?"
+            params.append(rbac_namespace)
+        if doc_ids:
+            where += f" AND doc_id IN ({', '.join('?' for _ in doc_ids)})"
+            params.extend(doc_ids)
+        cur = self.conn.execute(f"SELECT slot FROM {self.table} {where} ORDER BY slot", params)
+        return np.fromiter((row[0] for row in cur), dtype=np.int64)
+
+    def _top_k(self, queries: np.ndarray, slots: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Best `k` slots per query row as two (N x k) arrays sorted by score.
+        Blocks are sized so one block of scores stays within `score_budget` floats.
+        """
+        n = len(queries)
+        best_slots = np.empty((n, 0), dtype=np.int64)
+        best_scores = np.empty((n, 0), dtype=np.float32)
+        block_size = max(256, min(self.block_size, self.score_budget // max(n, 1)))
+
+        for start in range(0, len(slots), block_size):
+            block = slots[start:start + block_size]
+            if block[-1] - block[0] + 1 == len(block):
+                # Dense run of slots: score a slice of the map without copying it
+                matrix = self.file.span(int(block[0]), int(block[-1]) + 1)
+            else:
+                matrix = self.file.rows(block)
+            scores = queries @ matrix.T
+
+            if scores.shape[1] > k:
+                keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, keep, axis=1)
+                block_slots = block[keep]
+            else:
+                block_slots = np.broadcast_to(block, scores.shape)
+
+            best_slots = np.concatenate([best_slots, block_slots], axis=1)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_slots = np.take_along_axis(best_slots, keep, axis=1)
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        return np.take_along_axis(best_slots, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def _hits(self, slots: np.ndarray, scores: np.ndarray) -> List[List[Dict]]:
+        unique = [int(s) for s in np.unique(slots)]
+        by_slot = {}
+        for batch in _batches(unique, 500):
+            cur = self.conn.execute(
+                f"SELECT slot, chunk_id, doc_id FROM {self.table} WHERE slot IN ({', '.join('?' for _ in batch)})",
+                batch
+            )
+            by_slot.update((row[0], (row[1], row[2])) for row in cur.fetchall())
+        return [
+            [
+                {"chunk_id": by_slot[int(slot)][0], "doc_id": by_slot[int(slot)][1], "score": float(score)}
+                for slot, score in zip(row_slots, row_scores) if int(slot) in by_slot
+            ]
+            for row_slots, row_scores in zip(slots, scores)
+        ]
+
+    # --- IVF index ---
+
+    def build_index(self, n_lists: int = None, iterations: int = 10, seed: int = 0) -> Dict:
+        """
+        (Re)train the IVF centroids with spherical k-means on a sample of the
+        stored vectors and assign every vector to its nearest list.
+        Defaults to sqrt(N) lists.
+        """
+        self.ensure_schema()
+        slots = self._candidate_slots()
+        if len(slots) == 0:
+            return {"vectors": 0, "lists": 0}
+
+        n_lists = max(1, min(n_lists or int(np.sqrt(len(slots))), len(slots)))
+        rng = np.random.default_rng(seed)
+        sample = slots
+        if len(slots) > 256 * n_lists:
+            sample = np.sort(rng.choice(slots, 256 * n_lists, replace=False))
+        data = np.asarray(self.file.rows(sample))
+
+        centroids = data[rng.choice(len(data), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            counts = np.bincount(assign, minlength=n_lists)
+            order = np.argsort(assign, kind='stable')
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            filled = counts > 0
+            centroids[filled] = np.add.reduceat(data[order], starts[filled], axis=0)
+            # Re-seed empty lists from random sample points
+            empty = np.flatnonzero(~filled)
+            if len(empty):
+                centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+            centroids = _normalise(centroids)
+
+        self.file.save_centroids(centroids.astype(np.float32))
+
+        updates = []
+        for start in range(0, len(slots), self.block_size):
+            block = slots[start:start + self.block_size]
+            lists = self._nearest_lists(self.file.rows(block))
+            updates.extend(zip((int(l) for l in lists), (int(s) for s in block)))
+
+        def work(conn):
+            conn.executemany(f"UPDATE {self.table} SET list_id = ? WHERE slot = ?", updates)
+
+        self._run_write(work)
+        return {"vectors": len(slots), "lists": n_lists}
+
+    def _nearest_lists(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(np.asarray(vectors) @ self.file.centroids.T, axis=1)
+
+
+def _normalise(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def _batches(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -0,0 +1,107 @@
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+from .connection_pool import get_pool
+
+
+class WriteQueue:
+    """
+    Serialises every write onto one dedicated writer thread and connection.
+
+    Callers submit `work(conn)` callables; each runs as its own committed
+    transaction (rolled back on error) and the caller blocks on the returned
+    Future. With WAL enabled this leaves readers free to run concurrently while
+    writers never fight over the database file lock.
+    """
+
+    _STOP = object()
+
+    def __init__(self, factory: Callable, maxsize: int = 10000):
+        self.factory = factory
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._started = threading.Event()
+        self._start_error: Optional[BaseException] = None
+        self._stats = {"submitted": 0, "committed": 0, "failed": 0}
+        self._stats_lock = threading.Lock()
+        self._thread.start()
+        self._started.wait()
+        if self._start_error is not None:
+            raise self._start_error
+
+    def submit(self, work: Callable[[Any], Any]) -> Future:
+        future: Future = Future()
+        if threading.current_thread() is self._thread:
+            # Re-entrant write from inside a job: run inline on the writer connection
+            future.set_result(work(self._conn))
+            return future
+        self._queue.put((work, future))
+        with self._stats_lock:
+            self._stats["submitted"] += 1
+        return future
+
+    def run(self, work: Callable[[Any], Any]) -> Any:
+        """Submit and wait for the result."""
+        return self.submit(work).result()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        snapshot["pending"] = self._queue.qsize()
+        return snapshot
+
+    def close(self) -> None:
+        self._queue.put((self._STOP, None))
+        self._thread.join()
+
+    def _run(self) -> None:
+        try:
+            self._conn = self.factory()
+        except BaseException as e:
+            self._start_error = e
+            self._started.set()
+            return
+        self._started.set()
+
+        while True:
+            work, future = self._queue.get()
+            if work is self._STOP:
+                break
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = work(self._conn)
+                self._conn.commit()
+                with self._stats_lock:
+                    self._stats["committed"] += 1
+                future.set_result(result)
+            except BaseException as e:
+                self._conn.rollback()
+                with self._stats_lock:
+                    self._stats["failed"] += 1
+                future.set_exception(e)
+
+        self._conn.close()
+
+
+_write_queue: Optional[WriteQueue] = None
+_write_queue_lock = threading.Lock()
+
+
+def write_queue_enabled() -> bool:
+    return os.getenv("SQLITE_WRITE_QUEUE", "1").lower() not in ("0", "false", "no")
+
+
+def get_write_queue() -> Optional[WriteQueue]:
+    """Process-wide writer bound to the pool's database, or None when disabled."""
+    global _write_queue
+    if not write_queue_enabled():
+        return None
+    if _write_queue is None:
+        with _write_queue_lock:
+            if _write_queue is None:
+                _write_queue = WriteQueue(get_pool().create_connection)
+    return _write_queue
@@ -2,8 +2,12 @@ import streamlit as st
 import pandas as pd
 import altair as alt
 import json
+from itertools import islice
 from epoch_explorer.database.models.chunk_embedding_data_model import ChunkEmbeddingDataModel
-from epoch_explorer.database.db.connection import get_connection
+from epoch_explorer.database.models.connection_pool import get_pooled_connection
+
+# Chunks below this quality are offered for healing review
+HEALING_THRESHOLD = 0.7
 
 def show():
     st.title("🧩 Chunk Embedding Dashboard")
@@ -14,66 +18,83 @@ def show():
     compact_mode = st.toggle("🧩 Compact Mode", value=True)
 
     # --- Load Data ---
-    conn = get_connection()
+    # Everything below is aggregated in SQL; no raw chunk rows are pulled
+    conn = get_pooled_connection()
     chunk_model = ChunkEmbeddingDataModel(conn)
-    df = chunk_model.get_all_chunks()
+    versions_df = chunk_model.get_model_versions()
 
     # --- Filters ---
     st.subheader("Filters")
+    models = versions_df.embedding_model.dropna().unique()
     model_filter = st.multiselect(
         "Embedding Model",
-        df.embedding_model.unique(),
-        df.embedding_model.unique()
+        models,
+        models
     )
 
+    versions = versions_df.embedding_version.dropna().unique()
     version_filter = st.multiselect(
         "Embedding Version",
-        df.embedding_version.dropna().unique(),
-        df.embedding_version.dropna().unique()
+        versions,
+        versions
     )
 
-    if model_filter:
-        df = df[df.embedding_model.isin(model_filter)]
-    if version_filter:
-        df = df[df.embedding_version.isin(version_filter)]
+    filters = {
+        "embedding_models": list(model_filter) or None,
+        "embedding_versions": list(version_filter) or None,
+    }
+
+    # --- Quality Percentiles ---
+    percentiles = chunk_model.get_quality_percentiles(**filters)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Chunks", percentiles["count"])
+    for col, key in zip((col2, col3, col4), ("p50", "p90", "p99")):
+        value = percentiles[key]
+        col.metric(f"Quality {key}", "–" if value is None else f"{value:.2f}")
 
     # -------------------------
     # 📌 Prepare Chart Objects
     # -------------------------
 
     # 1️⃣ Chunk Count by Embedding Model
+    model_counts = versions_df
+    if model_filter:
+        model_counts = model_counts[model_counts.embedding_model.isin(model_filter)]
+    if version_filter:
+        model_counts = model_counts[model_counts.embedding_version.isin(version_filter)]
     chart_model = (
-        alt.Chart(df)
+        alt.Chart(model_counts)
         .mark_bar()
         .encode(
             x="embedding_model:N",
-            y="count():Q",
+            y="sum(chunk_count):Q",
             color="embedding_model:N",
-            tooltip=["embedding_model", "count()"]
+            tooltip=["embedding_model", "sum(chunk_count)"]
         )
         .properties(title="Chunk Count by Embedding Model")
     )
 
     # 2️⃣ Quality Score Distribution
     quality_chart = (
-        alt.Chart(df)
+        alt.Chart(chunk_model.get_quality_histogram(bins=20, **filters))
         .mark_bar()
         .encode(
-            x=alt.X("quality_score:Q", bin=alt.Bin(maxbins=20)),
-            y="count():Q",
-            tooltip=["count()"]
+            x=alt.X("bucket_start:Q", bin="binned", title="quality_score"),
+            x2="bucket_end:Q",
+            y="count:Q",
+            tooltip=["bucket_start", "bucket_end", "count"]
         )
         .properties(title="Quality Score Distribution")
     )
 
     # 3️⃣ Reindex Count Distribution
     reindex_chart = (
-        alt.Chart(df)
+        alt.Chart(chunk_model.get_reindex_histogram(**filters))
         .mark_bar()
         .encode(
-            x=alt.X("reindex_count:Q", bin=alt.Bin(maxbins=20)),
-            y="count():Q",
-            tooltip=["count()"]
+            x="reindex_count:O",
+            y="count:Q",
+            tooltip=["reindex_count", "count"]
         )
         .properties(title="Reindex Count Distribution")
     )
@@ -100,21 +121,36 @@ def show():
         for chart in charts:
             st.altair_chart(chart, use_container_width=True)
 
+    # -------------------------
+    # 📐 Quality by Model / Version
+    # -------------------------
+    st.subheader("📐 Quality by Model / Version")
+    st.dataframe(chunk_model.get_group_quality_stats("model_version", **filters), use_container_width=True)
+
     # -------------------------
     # 🕒 Recent Activity Table
     # -------------------------
     st.subheader("🕒 Recent Chunk Activity")
-    recent_df = df.sort_values("created_at", ascending=False).head(10)
-    st.table(recent_df[["chunk_id", "doc_id", "embedding_model", "created_at", "last_healed"]])
+    recent_df = chunk_model.get_recent_chunks(limit=100, **filters)
+    st.table(recent_df.head(10)[["chunk_id", "doc_id", "embedding_model", "created_at", "last_healed"]])
 
     # -------------------------
     # 🛠 Healing Suggestions
     # -------------------------
     st.subheader("🛠 Healing Suggestions")
 
-    if len(df) > 0:
-        selected_chunk = st.selectbox("Select Chunk", df.chunk_id)
-        suggestions_str = df[df.chunk_id == selected_chunk]["healing_suggestions"].values[0]
+    # The worst chunks are the ones that need healing; stream just the first page
+    worst = [c["chunk_id"] for c in islice(chunk_model.iter_low_quality_chunks(HEALING_THRESHOLD), 200)]
+    typed_chunk = st.text_input("Chunk ID", placeholder="Search any chunk by id")
+    selected_chunk = typed_chunk.strip() or (
+        st.selectbox(f"Or pick one of the worst chunks (quality < {HEALING_THRESHOLD})", worst) if worst else None
+    )
+
+    if selected_chunk:
+        chunk = chunk_model.get_by_id(selected_chunk)
+        if chunk is None:
+            st.warning(f"No chunk with id {selected_chunk}")
+        suggestions_str = (chunk or {}).get("healing_suggestions")
 
         if suggestions_str:
             try:
@@ -125,4 +161,4 @@ def show():
         else:
             st.info("No healing suggestions for this chunk.")
     else:
-        st.info("No records available.")
+        st.info(f"No chunks below quality {HEALING_THRESHOLD}; enter a chunk id to inspect any other.")
@@ -1,6 +1,7 @@
 import streamlit as st
-from epoch_explorer.database.db.connection import get_connection
+from epoch_explorer.database.models.connection_pool import get_pooled_connection
 from epoch_explorer.database.models.companies import CompaniesModel
+from pages.pagination import keyset_pager
 
 
 def show():
@@ -12,7 +13,7 @@ def show():
         st.error("⚠️ You must login first!")
         st.stop()
 
-    conn = get_connection()
+    conn = get_pooled_connection()
     company_model = CompaniesModel(conn)
 
     # -----------------------------
@@ -66,7 +67,7 @@ def show():
     # -----------------------------
     elif action == "View Companies":
         st.subheader("📋 All Companies")
-        companies = company_model.all()
+        companies = keyset_pager("companies", company_model.page_after)
         if companies:
             st.dataframe(companies, use_container_width=True, hide_index=True)
         else:
@@ -82,12 +83,11 @@ def show():
 
         st.subheader("✏️ Update Company")
 
-        companies = company_model.all()
-        if not companies:
+        company_map = {c["name"]: c["id"] for c in company_model.iter_all()}
+        if not company_map:
             st.warning("No companies to update.")
             st.stop()
 
-        company_map = {c["name"]: c["id"] for c in companies}
         selected = st.selectbox("Select Company", list(company_map.keys()))
         company_id = company_map[selected]
         company = company_model.find(company_id)
@@ -117,12 +117,11 @@ def show():
 
         st.subheader("🗑️ Delete Company")
 
-        companies = company_model.all()
-        if not companies:
+        company_map = {c["name"]: c["id"] for c in company_model.iter_all()}
+        if not company_map:
             st.warning("No companies to delete.")
             st.stop()
 
-        company_map = {c["name"]: c["id"] for c in companies}
         selected = st.selectbox("Select Company to Delete", list(company_map.keys()))
         company_id = company_map[selected]
 
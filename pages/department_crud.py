@@ -1,6 +1,7 @@
 import streamlit as st
-from epoch_explorer.database.db.connection import get_connection
+from epoch_explorer.database.models.connection_pool import get_pooled_connection
 from epoch_explorer.database.models.department import DepartmentModel
+from pages.pagination import keyset_pager
 
 
 def show():
@@ -14,7 +15,7 @@ def show():
         st.error("⚠️ You must login first!")
         st.stop()
 
-    conn = get_connection()
+    conn = get_pooled_connection()
     dept_model = DepartmentModel(conn)
 
     # -----------------------------
@@ -77,7 +78,9 @@ def show():
     # ============================================================
     elif action == "View Departments":
         st.subheader("📋 All Departments")
-        departments = dept_model.for_company_with_name()
+        departments = keyset_pager(
+            "departments", dept_model.for_company_with_name_page, id_field="department_id"
+        )
 
         if departments:
             st.dataframe(departments, use_container_width=True)
@@ -94,12 +97,11 @@ def show():
 
         st.subheader("✏️ Update Department")
 
-        departments = dept_model.all()
-        if not departments:
+        dept_map = {f"{d['id']} - {d['name']}": d["id"] for d in dept_model.iter_all()}
+        if not dept_map:
             st.warning("No departments to update.")
             st.stop()
 
-        dept_map = {f"{d['id']} - {d['name']}": d["id"] for d in departments}
         selected = st.selectbox("Select Department", list(dept_map.keys()))
         dept_id = dept_map[selected]
 
@@ -129,12 +131,11 @@ def show():
 
         st.subheader("🗑️ Delete Department")
 
-        departments = dept_model.all()
-        if not departments:
+        dept_map = {f"{d['id']} - {d['name']}": d["id"] for d in dept_model.iter_all()}
+        if not dept_map:
             st.warning("No departments to delete.")
             st.stop()
 
-        dept_map = {f"{d['id']} - {d['name']}": d["id"] for d in departments}
         selected = st.selectbox("Select Department", list(dept_map.keys()))
         dept_id = dept_map[selected]
 
@@ -2,6 +2,8 @@ import streamlit as st
 import json
 from datetime import datetime
 from components.pipeline import render_pipeline, run_pipeline_animation, create_incident_pipeline
+from epoch_explorer.database.models.knowledge_base_model import KnowledgeBaseModel
+from epoch_explorer.database.models.connection_pool import get_pooled_connection
 
 def show():
     st.title("🔍 AI-Powered Incident Analysis")
@@ -161,9 +163,15 @@ def analyze_incident(log_data: str, title: str, service: str):
                 "Max connections reached (200/200)",
                 "Slow query execution times (>5s)"
             ],
-            "similar_incidents": ["INC-2024-001", "INC-2023-089"]
+            "similar_incidents": []
         }
 
+        # Past incidents from the knowledge base's full-text index
+        similar_incidents = KnowledgeBaseModel(get_pooled_connection()).find_similar(
+            f"{title} {service} {log_data[:2000]}", limit=5
+        )
+        diagnosis_result["similar_incidents"] = [inc["id"] for inc in similar_incidents]
+
         # Stage 3: Remediation
         status_text.text("🛠️ Remediation Agent: Generating solution...")
         progress_bar.progress(60)
@@ -245,8 +253,14 @@ def analyze_incident(log_data: str, title: str, service: str):
 
         # Similar Incidents
         st.subheader("📚 Similar Incidents")
-        for inc_id in diagnosis_result['similar_incidents']:
-            st.write(f"• {inc_id}")
+        if not similar_incidents:
+            st.caption("No similar incidents found in the knowledge base")
+        for inc in similar_incidents:
+            with st.expander(f"{inc['cause']} ({inc['environment']}, {inc['resource_type']})"):
+                st.markdown(inc.get('snippet') or inc['description'])
+                st.write(f"**RCA:** {inc['rca']}")
+                st.write(f"**Remediation:** {inc['remediation_steps']}")
+                st.caption(f"`{inc['id']}` · recovery {inc['estimated_recovery_time']} · score {inc['score']:.2f}")
 
         # Actions
         st.subheader("⚡ Quick Actions")
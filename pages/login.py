@@ -1,6 +1,6 @@
 from pathlib import Path
 import streamlit as st
-from epoch_explorer.database.db.connection import get_connection
+from epoch_explorer.database.models.connection_pool import get_pooled_connection
 from epoch_explorer.database.models.user import UserModel
 
 def show():
@@ -10,7 +10,7 @@ def show():
     password = st.text_input("Password", type="password", value="Password@123")
 
     if st.button("Login"):
-        conn = get_connection()
+        conn = get_pooled_connection()
         user = UserModel(conn)
         user_data = user.authenticate(email, password)
 
@@ -0,0 +1,29 @@
+import streamlit as st
+
+
+def keyset_pager(key, fetch_page, id_field="id", page_size=25):
+    """
+    Render Prev / Next controls for a keyset-paginated reader and return the current page.
+
+    `fetch_page(last_id, limit)` must return rows ordered by `id_field`; the cursor of
+    every visited page is kept in session state so Prev is just a pop.
+    """
+    cursors = st.session_state.setdefault(f"{key}_cursors", [None])
+
+    rows = fetch_page(cursors[-1], page_size)
+    # One-row seek past the end of this page tells us whether Next is possible
+    has_next = bool(rows) and bool(fetch_page(rows[-1][id_field], 1))
+
+    col_prev, col_info, col_next = st.columns([1, 4, 1])
+    with col_prev:
+        if st.button("⬅️ Prev", key=f"{key}_prev", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with col_info:
+        st.caption(f"Page {len(cursors)}")
+    with col_next:
+        if st.button("Next ➡️", key=f"{key}_next", disabled=not has_next):
+            cursors.append(rows[-1][id_field])
+            st.rerun()
+
+    return rows
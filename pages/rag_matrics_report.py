@@ -1,25 +1,52 @@
 
 import streamlit as st
 import altair as alt
+from datetime import datetime, timedelta
 from epoch_explorer.database.models.rag_history_model import RAGHistoryModel
-from epoch_explorer.database.db.connection import get_connection
+from epoch_explorer.database.models.connection_pool import get_pooled_connection
 
 def show():
     st.title("📊 RAG Observability Dashboard")
 
-    conn = get_connection()
+    conn = get_pooled_connection()
     rag_history = RAGHistoryModel(conn)
-    df = rag_history.get_metrix()
+
+    # Charts read the pre-aggregated rollups, never the raw history table
+    rollups = rag_history.rollups()
+    rollups.ensure_schema()
+    # Rows written around the model (seeders, imports) sit past the watermark;
+    # folding them in is left to the button or the maintenance job, never a render
+    if rollups.is_stale():
+        st.warning("Rollups are behind raw history (rows were added outside the app). Use 🔄 Rebuild rollups.")
 
     # -------------------------
     # 🔘 Compact Mode Toggle
     # -------------------------
     compact_mode = st.toggle("🧩 Compact Mode", value=True)
+    if st.button("🔄 Rebuild rollups"):
+        with st.spinner("Recomputing rollups from raw history..."):
+            rollups.rebuild()
+        st.success("Rollups rebuilt")
 
     # Filters
-    event_filter = st.multiselect("Event Type", df.event_type.unique())
-    if event_filter:
-        df = df[df.event_type.isin(event_filter)]
+    col_event, col_window, col_grain = st.columns([3, 1, 1])
+    with col_event:
+        event_filter = st.multiselect("Event Type", rollups.get_event_types())
+    with col_window:
+        window = st.selectbox("Window", ["Last 24 hours", "Last 7 days", "Last 30 days", "All time"], index=1)
+    with col_grain:
+        granularity = st.selectbox("Granularity", ["minute", "hour", "day"], index=1)
+
+    window_days = {"Last 24 hours": 1, "Last 7 days": 7, "Last 30 days": 30}.get(window)
+    start_time = (datetime.now() - timedelta(days=window_days)).isoformat() if window_days else None
+
+    series = rollups.get_series(granularity, event_filter, start_time)
+    totals = rollups.get_totals("day", event_filter, start_time)
+
+    # Per-event metrics come from the typed, indexed columns filtered in SQL
+    rag_history.ensure_schema()
+    heal_df = rag_history.get_metric_series(["HEAL"], start_time=start_time)
+    cost_df = rag_history.get_metric_series(["QUERY"], start_time=start_time)
 
     # -------------------------
     # 📌 Prepare Chart Objects
@@ -27,28 +54,25 @@ def show():
 
     # 1️⃣ Event Distribution
     event_dist_chart = (
-        alt.Chart(df)
+        alt.Chart(totals)
         .mark_bar()
-        .encode(x="event_type", y="count()", color="event_type")
+        .encode(x="event_type", y="sum(event_count):Q", color="event_type")
         .properties(title="Event Type Distribution")
     )
 
     # 2️⃣ Accuracy Charts
-    acc_df = df[df.event_type.isin(["QUERY", "SYNTHETIC_TEST"])].copy()
-    acc_df["accuracy"] = acc_df["metrics"].apply(lambda m: m.get("accuracy") if m else None)
-    acc_df = acc_df.dropna(subset=["accuracy"])
+    acc_df = series[series.event_type.isin(["QUERY", "SYNTHETIC_TEST"])]
 
     accuracy_chart = (
-        alt.Chart(acc_df)
+        alt.Chart(acc_df.dropna(subset=["accuracy"]))
         .mark_line(point=True)
         .encode(x="timestamp:T", y="accuracy:Q", color="event_type")
         .properties(title="Accuracy Over Time")
     )
 
     # 3️⃣ Latency
-    acc_df["latency"] = acc_df["metrics"].apply(lambda m: m.get("latency") if m else None)
     latency_chart = (
-        alt.Chart(acc_df)
+        alt.Chart(acc_df.dropna(subset=["latency"]))
         .mark_line(point=True)
         .encode(x="timestamp:T", y="latency:Q", color="event_type")
         .properties(title="Latency Over Time")
@@ -56,20 +80,36 @@ def show():
 
     # 4️⃣ RL Agent Actions
     action_chart = (
-        alt.Chart(df[df.action_taken.notnull()])
+        alt.Chart(totals[totals.action_taken.notnull()])
         .mark_bar()
-        .encode(x="action_taken", y="count()", color="action_taken")
+        .encode(x="action_taken", y="sum(event_count):Q", color="action_taken")
         .properties(title="RL Agent Actions")
     )
 
     # 5️⃣ Reward Signal
     reward_chart = (
-        alt.Chart(df.dropna(subset=["reward_signal"]))
+        alt.Chart(series.dropna(subset=["reward_signal"]))
         .mark_line(point=True)
-        .encode(x="timestamp:T", y="reward_signal:Q")
+        .encode(x="timestamp:T", y="mean(reward_signal):Q")
         .properties(title="Reward Signal Trend")
     )
 
+    # 6️⃣ Healing Improvement
+    improvement_chart = (
+        alt.Chart(heal_df.dropna(subset=["improvement_delta"]))
+        .mark_circle(size=60)
+        .encode(x="timestamp:T", y="improvement_delta:Q", tooltip=["target_doc_id", "improvement_delta"])
+        .properties(title="Healing Improvement Delta")
+    )
+
+    # 7️⃣ Query Cost
+    cost_chart = (
+        alt.Chart(cost_df.dropna(subset=["cost"]))
+        .mark_circle(size=60)
+        .encode(x="timestamp:T", y="cost:Q", tooltip=["cost", "latency"])
+        .properties(title="Query Cost")
+    )
+
     # -------------------------
     # 🧩 Render Charts
     # -------------------------
@@ -79,6 +119,8 @@ def show():
         latency_chart,
         action_chart,
         reward_chart,
+        improvement_chart,
+        cost_chart,
     ]
 
     if compact_mode:
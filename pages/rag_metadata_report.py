@@ -2,7 +2,7 @@ import streamlit as st
 import altair as alt
 import pandas as pd
 from epoch_explorer.database.models.document_metadata_model import DocumentMetadataModel
-from epoch_explorer.database.db.connection import get_connection
+from epoch_explorer.database.models.connection_pool import get_pooled_connection
 import json
 
 def show():
@@ -14,7 +14,7 @@ def show():
     compact_mode = st.toggle("🧩 Compact Mode", value=True)
 
     # Load data
-    conn = get_connection()
+    conn = get_pooled_connection()
     doc_model = DocumentMetadataModel(conn)
     df = doc_model.get_all_documents()
 
@@ -31,10 +31,26 @@ def show():
         df.chunk_strategy.unique()
     )
 
+    # Metadata filters are answered by the metadata term index, not by parsing metadata_json
+    meta_keys = {"Tag": "tags", "Keyword": "keywords", "Doc Type": "doc_type", "Category": "categories"}
+    meta_col1, meta_col2 = st.columns(2)
+    with meta_col1:
+        meta_label = st.selectbox("Metadata Field", list(meta_keys))
+    with meta_col2:
+        term_counts = doc_model.get_term_counts(meta_keys[meta_label])
+        meta_value = st.selectbox(
+            "Value",
+            ["(any)"] + list(term_counts),
+            format_func=lambda v: v if v == "(any)" else f"{v} ({term_counts[v]})"
+        )
+
     if rbac_filter:
         df = df[df.rbac_namespace.isin(rbac_filter)]
     if chunk_filter:
         df = df[df.chunk_strategy.isin(chunk_filter)]
+    if meta_value != "(any)":
+        matching = {d["doc_id"] for d in doc_model.find_by_term(meta_keys[meta_label], meta_value)}
+        df = df[df.doc_id.isin(matching)]
 
     # -------------------------
     # 📌 Prepare Chart Objects
@@ -1,8 +1,143 @@
 import streamlit as st
 import requests
+import io
+import json
 import os
+import time
+import uuid
+from epoch_explorer.database.models.answer_cache import AnswerCache
+from epoch_explorer.database.models.connection_pool import get_pooled_connection
+from epoch_explorer.database.models.document_ingestion import DocumentIngestor
+from epoch_explorer.database.models.document_metadata_model import DocumentMetadataModel
+from epoch_explorer.database.models.embedders import get_embedder
+from epoch_explorer.database.models.http_client import CircuitOpenError, get_client
+from epoch_explorer.database.models.hybrid_retriever import HybridRetriever
+from epoch_explorer.database.models.namespace_shards import get_shards, sharding_enabled
+from epoch_explorer.database.models.rag_history_model import RAGHistoryModel
 
-API_URL = os.getenv("API_URL", "http://localhost:8001")
+# "local" retrieves context from the embedded vector store instead of the API's Chroma lookup
+RETRIEVAL_BACKEND = os.getenv("RAG_RETRIEVAL_BACKEND", "chroma")
+RETRIEVAL_TOP_K = int(os.getenv("RAG_RETRIEVAL_TOP_K", "5"))
+# Candidate pool sizes of the BM25 and vector stages fused by the hybrid retriever
+RETRIEVAL_POOLS = {
+    "lexical_k": int(os.getenv("RAG_LEXICAL_POOL", "50")),
+    "vector_k": int(os.getenv("RAG_VECTOR_POOL", "50")),
+}
+# Answers to repeated (or near-identical) questions are served without calling the API
+ANSWER_CACHE_ENABLED = os.getenv("RAG_ANSWER_CACHE", "1").lower() in ("1", "true", "yes", "on")
+ANSWER_CACHE_OPTIONS = {
+    "threshold": float(os.getenv("RAG_CACHE_THRESHOLD", "0.92")),
+    "ttl_seconds": int(os.getenv("RAG_CACHE_TTL", "3600")),
+    "max_entries": int(os.getenv("RAG_CACHE_MAX_ENTRIES", "1000")),
+}
+# Ask /query to stream the answer (SSE, NDJSON or chunked text) and render it as it arrives
+STREAM_ANSWERS = os.getenv("RAG_STREAM_ANSWERS", "1").lower() in ("1", "true", "yes", "on")
+
+
+def retrieve_local(question: str, rbac_namespaces: list = None, vector=None, log: bool = True) -> list:
+    """
+    Top-k chunks for the question from the in-process hybrid (BM25 + vector)
+    retriever, no network involved. With RBAC_SHARDING on, only the shards of
+    `rbac_namespaces` are read. The question is embedded at most once; pass
+    `vector` when it already has been.
+    """
+    if sharding_enabled():
+        return get_shards().retrieve(question, RETRIEVAL_TOP_K, rbac_namespaces, vector=vector, log=log,
+                                     **RETRIEVAL_POOLS)
+    retriever = HybridRetriever(get_pooled_connection(), **RETRIEVAL_POOLS)
+    if rbac_namespaces is None:
+        return retriever.retrieve(question, RETRIEVAL_TOP_K, vector=vector, log=log)
+    return retriever.retrieve_namespaces(question, RETRIEVAL_TOP_K, rbac_namespaces, vector=vector, log=log)
+
+
+def api_sources(body) -> list:
+    """Source documents reported in a /query or /add JSON body, as [{"doc_id", ...}]."""
+    if not isinstance(body, dict):
+        return []
+    reported = body.get("sources") or body.get("doc_ids") or ([body["doc_id"]] if body.get("doc_id") else [])
+    sources = []
+    for source in reported if isinstance(reported, list) else []:
+        if isinstance(source, dict) and source.get("doc_id"):
+            sources.append({k: v for k, v in source.items() if k != "chunk_text"})
+        elif isinstance(source, str):
+            sources.append({"doc_id": source})
+    return sources
+
+
+def _token(data: str) -> str:
+    """Text of one streamed event: a JSON string, a JSON object with the text under a known key, or raw text."""
+    try:
+        value = json.loads(data)
+    except ValueError:
+        return data
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        for key in ("token", "delta", "content", "text", "answer"):
+            if isinstance(value.get(key), str):
+                return value[key]
+        return ""
+    return data
+
+
+def answer_tokens(response):
+    """
+    Answer text pieces of a /query response as they arrive. Server-sent
+    events ("data: ..." lines, ended by "data: [DONE]"), NDJSON and plain
+    chunked text are streamed. A JSON body from an API without streaming
+    support is read whole.
+    """
+    content_type = response.headers.get("Content-Type", "")
+    response.encoding = response.encoding or "utf-8"
+    if content_type.startswith("application/json"):
+        yield response.json().get("answer", "No answer returned")
+    elif content_type.startswith("text/event-stream"):
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[5:].removeprefix(" ")
+            if data == "[DONE]":
+                break
+            yield _token(data)
+    elif content_type.startswith(("application/x-ndjson", "application/jsonl")):
+        for line in response.iter_lines(decode_unicode=True):
+            if line:
+                yield _token(line)
+    else:
+        for piece in response.iter_content(chunk_size=None, decode_unicode=True):
+            if piece:
+                yield piece
+
+
+def _timed(pieces, started: float, timings: dict):
+    """Pass `pieces` through, noting the time to the first non-empty one as timings["ttft"]."""
+    for piece in pieces:
+        if piece and "ttft" not in timings:
+            timings["ttft"] = (time.perf_counter() - started) * 1000
+        yield piece
+
+
+def log_answer(question: str, sources: list, timings: dict, streamed: bool, answer: str,
+               cache_metrics: dict = None, cached: dict = None) -> None:
+    """
+    Record one Ask as a single QUERY event: latency, retrieval time, time to
+    first token for streams and the answer cache outcome. The cache lookup
+    and the retriever are called with log=False so nothing is counted twice.
+    """
+    metrics = {name: round(value, 2) for name, value in timings.items()}
+    metrics.update(streamed=1 if streamed else 0, answer_chars=len(answer or ""))
+    metrics.update(cache_metrics or {})
+    context = {"backend": RETRIEVAL_BACKEND,
+               "chunk_ids": [s["chunk_id"] for s in sources if s.get("chunk_id")]}
+    if cached:
+        context.update(cache_match=cached["match"], cache_id=cached["cache_id"])
+    RAGHistoryModel(get_pooled_connection()).log_query(
+        query_text=question,
+        target_doc_id=sources[0].get("doc_id") if sources else None,
+        metrics_json=json.dumps(metrics),
+        context_json=json.dumps(context),
+        agent_id="rag_qa",
+    )
 
 def show():
     st.title("📚 RAG Question & Answer")
@@ -14,23 +149,101 @@ def show():
     with col1:
         st.subheader("💬 Ask a Question")
         question = st.text_input("Enter your question:", placeholder="What would you like to know?")
+        namespaces = None
+        if RETRIEVAL_BACKEND == "local":
+            available = get_shards().namespaces() if sharding_enabled() \
+                else DocumentMetadataModel(get_pooled_connection()).get_namespaces()
+            selected = st.multiselect("Search namespaces", available, default=available)
+            # Everything selected needs no filter; nothing selected searches nothing
+            namespaces = None if set(selected) == set(available) else selected
 
         if st.button("🔍 Ask", type="primary", use_container_width=True):
             if question.strip():
                 with st.spinner("🤔 Thinking..."):
                     try:
-                        res = requests.post(
-                            f"{API_URL}/query",
-                            json={"question": question},
-                        )
-                        if res.status_code == 200:
-                            answer = res.json().get("answer", "No answer returned")
+                        asked = time.perf_counter()
+                        cache, cached, vector, embedder = None, None, None, None
+                        cache_metrics = None
+                        if ANSWER_CACHE_ENABLED:
+                            cache = AnswerCache(get_pooled_connection(), **ANSWER_CACHE_OPTIONS)
+                            embedder = get_embedder()
+                            vector = embedder.embed_one(question)
+                            lookup_started = time.perf_counter()
+                            # One QUERY event per Ask, written by log_answer below
+                            cached = cache.lookup(question, vector, embedder.name, namespaces, log=False)
+                            cache_metrics = AnswerCache.metrics(cached, (time.perf_counter() - lookup_started) * 1000)
+
+                        if cached:
+                            answer, sources = cached["answer"], cached["sources"]
                             st.success("✅ Answer:")
                             st.markdown(f"**{answer}**")
+                            log_answer(question, sources, {"latency": (time.perf_counter() - asked) * 1000},
+                                       False, answer, cache_metrics, cached)
+                        else:
+                            payload = {"question": question}
+                            sources = []
+                            timings = {}
+                            if RETRIEVAL_BACKEND == "local":
+                                retrieval_started = time.perf_counter()
+                                # Reuses the embedding the cache lookup already computed
+                                sources = retrieve_local(question, namespaces, vector, log=False)
+                                timings["retrieval_ms"] = (time.perf_counter() - retrieval_started) * 1000
+                                payload["context_chunk_ids"] = [s["chunk_id"] for s in sources]
+                                payload["context"] = [s["chunk_text"] for s in sources if s.get("chunk_text")]
+                            started = time.perf_counter()
+                            if STREAM_ANSWERS:
+                                payload["stream"] = True
+                            # A query has no side effects, so the client may retry it
+                            res = get_client("api").post(
+                                "/query",
+                                json=payload,
+                                stream=STREAM_ANSWERS,
+                                headers={"Accept": "text/event-stream"} if STREAM_ANSWERS else None,
+                                idempotent=True,
+                            )
+                            answer = None
+                            if res.status_code == 200:
+                                st.success("✅ Answer:")
+                                if STREAM_ANSWERS:
+                                    answer = st.write_stream(_timed(answer_tokens(res), started, timings))
+                                else:
+                                    body = res.json()
+                                    answer = body.get("answer", "No answer returned")
+                                    # The API's own sources let the cache entry be invalidated by document
+                                    sources = sources or api_sources(body)
+                                    st.markdown(f"**{answer}**")
+                                timings["latency"] = (time.perf_counter() - started) * 1000
+                                log_answer(question, sources, timings, STREAM_ANSWERS, answer, cache_metrics)
+                            if cache is not None and answer:
+                                cache.put(question, answer, sources, vector, embedder.name, namespaces)
+
+                        if answer is not None:
+                            if cached:
+                                st.caption(
+                                    "⚡ Served from the answer cache "
+                                    f"({cached['match']} match, similarity {cached['similarity']:.2f})"
+                                )
+                            if sources:
+                                with st.expander(f"📎 Sources ({len(sources)})"):
+                                    for source in sources:
+                                        if "score" not in source:
+                                            # Reported by the API, not ranked here
+                                            st.markdown(f"- `{source['doc_id']}`")
+                                            continue
+                                        ranks = ", ".join(
+                                            f"{stage} #{source[f'{stage}_rank']}"
+                                            for stage in ("lexical", "vector") if source.get(f"{stage}_rank")
+                                        )
+                                        st.markdown(
+                                            f"- `{source['chunk_id']}` from `{source['doc_id']}` "
+                                            f"(RRF {source['score']:.4f}; {ranks})"
+                                        )
                         else:
                             st.error(f"❌ Error: {res.status_code} - {res.text}")
                     except requests.exceptions.Timeout:
                         st.error("⏱️ Request timed out. Please try again.")
+                    except CircuitOpenError as e:
+                        st.error(f"🚧 API is failing, not calling it for now: {e}")
                     except requests.exceptions.ConnectionError:
                         st.error("🔌 Cannot connect to API. Is the server running?")
                     except Exception as e:
@@ -47,22 +260,55 @@ def show():
                 height=200
             )
 
+            uploaded, namespace = None, "general"
+            if RETRIEVAL_BACKEND == "local":
+                uploaded = st.file_uploader("...or upload a text file", type=["txt", "md"])
+                if sharding_enabled():
+                    namespace = st.text_input("RBAC namespace", value="general")
+
             if st.button("💾 Add Document", use_container_width=True):
-                if text.strip():
+                if RETRIEVAL_BACKEND == "local" and (uploaded is not None or text.strip()):
+                    with st.spinner("📤 Chunking and indexing document..."):
+                        try:
+                            # Uploads are streamed through the chunker instead of read whole
+                            source = io.TextIOWrapper(uploaded, encoding="utf-8", errors="replace") \
+                                if uploaded is not None else text
+                            title = uploaded.name if uploaded is not None else text.strip().splitlines()[0][:80]
+                            ingestor = get_shards().ingestor(namespace) if sharding_enabled() \
+                                else DocumentIngestor(get_pooled_connection())
+                            result = ingestor.ingest(
+                                f"DOC_{uuid.uuid4().hex[:12].upper()}", source, title=title,
+                                rbac_namespace=namespace
+                            )
+                            st.success(f"✅ Document added as `{result['doc_id']}` ({result['chunks']} chunks)")
+                        except Exception as e:
+                            st.error(f"❌ Error: {str(e)}")
+                elif text.strip():
                     with st.spinner("📤 Adding document..."):
                         try:
-                            response = requests.post(
-                                f"{API_URL}/add",
+                            response = get_client("api").post(
+                                "/add",
                                 json={"text": text},
                                 timeout=30
                             )
                             if response.status_code == 200:
+                                # The API may have re-ingested a cited document; answers with
+                                # unknown sources could be built on anything, so they go too
+                                cache = AnswerCache(get_pooled_connection(), **ANSWER_CACHE_OPTIONS)
+                                try:
+                                    added = api_sources(response.json())
+                                except ValueError:
+                                    added = []
+                                cache.invalidate_docs([source["doc_id"] for source in added])
+                                cache.invalidate_unsourced()
                                 st.success("✅ Document added successfully!")
                                 st.balloons()
                             else:
                                 st.error(f"❌ Failed to add document: {response.status_code}")
                         except requests.exceptions.Timeout:
                             st.error("⏱️ Request timed out. Please try again.")
+                        except CircuitOpenError as e:
+                            st.error(f"🚧 API is failing, not calling it for now: {e}")
                         except requests.exceptions.ConnectionError:
                             st.error("🔌 Cannot connect to API. Is the server running?")
                         except Exception as e:
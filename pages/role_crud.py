@@ -1,6 +1,7 @@
 import streamlit as st
-from epoch_explorer.database.db.connection import get_connection
+from epoch_explorer.database.models.connection_pool import get_pooled_connection
 from epoch_explorer.database.models.role import RoleModel
+from pages.pagination import keyset_pager
 
 
 def tcs_footer():
@@ -22,7 +23,7 @@ def show():
         st.error("⚠️ You must login first!")
         st.stop()
 
-    conn = get_connection()
+    conn = get_pooled_connection()
     role_model = RoleModel(conn)
 
     # -------------------------------
@@ -56,7 +57,7 @@ def show():
     if action == "View Roles":
         st.subheader("📋 Available Roles")
 
-        roles = role_model.all()
+        roles = keyset_pager("roles", role_model.page_after)
         if roles:
             st.dataframe(roles, use_container_width=True)
         else:
@@ -97,13 +98,11 @@ def show():
     elif action == "Update Role":
         st.subheader("✏️ Update Existing Role")
 
-        roles = role_model.all()
-
-        if not roles:
+        role_map = {r["name"]: r["id"] for r in role_model.iter_all()}
+        if not role_map:
             st.warning("No roles available.")
             st.stop()
 
-        role_map = {r["name"]: r["id"] for r in roles}
         sel_role_name = st.selectbox("Select Role", list(role_map.keys()))
         sel_role_id = role_map[sel_role_name]
 
@@ -128,18 +127,16 @@ def show():
     elif action == "Delete Role":
         st.subheader("🗑️ Delete Role")
 
-        roles = role_model.all()
-        if not roles:
+        role_map = {r["name"]: r["id"] for r in role_model.iter_all()}
+        if not role_map:
             st.warning("No roles to delete.")
             st.stop()
 
-        role_map = {r["name"]: r["id"] for r in roles}
         sel_role_name = st.selectbox("Select Role", list(role_map.keys()))
         sel_role_id = role_map[sel_role_name]
 
         if st.button("Delete Role", type="primary"):
-            conn.execute("DELETE FROM roles WHERE id = ?", (sel_role_id,))
-            conn.commit()
+            role_model.delete(sel_role_id)
             st.session_state.success_msg = "🗑️ Role deleted successfully!"
             st.rerun()
 
@@ -1,5 +1,14 @@
 import streamlit as st
 import os
+import time
+from epoch_explorer.database.models.vector_store import VectorStore
+from epoch_explorer.database.models.connection_pool import get_pooled_connection
+from epoch_explorer.database.models.http_client import client_stats, get_client
+from epoch_explorer.database.models.namespace_shards import get_shards, sharding_enabled
+from epoch_explorer.database.models.rag_history_partition_model import RAGHistoryPartitionModel
+
+# Cheap GET per endpoint; any HTTP response counts as reachable
+HEALTH_PATHS = {"api": "/", "ollama": "/api/tags", "chroma": "/api/v1/heartbeat"}
 
 def show():
     st.title("⚙️ Settings")
@@ -16,10 +25,75 @@ def show():
         st.info(f"Model: `{os.getenv('OLLAMA_MODEL', 'Not set')}`")
 
     with col2:
-        st.markdown("**ChromaDB Settings**")
-        st.info(f"Host: `{os.getenv('CHROMA_HOST', 'Not set')}`")
-        st.info(f"Port: `{os.getenv('CHROMA_PORT', 'Not set')}`")
-        st.info(f"Collection: `{os.getenv('CHROMA_COLLECTION', 'Not set')}`")
+        if os.getenv("RAG_RETRIEVAL_BACKEND", "chroma") == "local":
+            st.markdown("**Local Vector Store**")
+            stats = VectorStore(get_pooled_connection()).stats()
+            st.info(f"Path: `{stats['path']}`")
+            st.info(f"Vectors: `{stats['vectors']}` (dim `{stats['dim']}`)")
+            st.info(f"IVF lists: `{stats['ivf_lists']}`")
+        else:
+            st.markdown("**ChromaDB Settings**")
+            st.info(f"Host: `{os.getenv('CHROMA_HOST', 'Not set')}`")
+            st.info(f"Port: `{os.getenv('CHROMA_PORT', 'Not set')}`")
+            st.info(f"Collection: `{os.getenv('CHROMA_COLLECTION', 'Not set')}`")
+
+    if sharding_enabled():
+        st.subheader("🗂️ Namespace Shards")
+        shard_stats = get_shards().stats()
+        if shard_stats:
+            st.table(shard_stats)
+        else:
+            st.info(f"No shards yet under `{get_shards().root}`")
+
+    if st.button("🔌 Test connections"):
+        for endpoint, path in HEALTH_PATHS.items():
+            try:
+                started = time.perf_counter()
+                response = get_client(endpoint).get(path)
+                st.success(f"{endpoint}: HTTP {response.status_code} in {(time.perf_counter() - started) * 1000:.0f} ms")
+            except ValueError:
+                st.info(f"{endpoint}: not configured")
+            except Exception as e:
+                st.error(f"{endpoint}: {e}")
+
+    st.subheader("🗄️ History Partitions")
+    partitions = RAGHistoryPartitionModel(get_pooled_connection())
+    st.caption(
+        f"Live table keeps {os.getenv('RAG_HISTORY_HOT_MONTHS', '1')} month(s); partitions older than "
+        f"{os.getenv('RAG_HISTORY_RETENTION_MONTHS', '12')} month(s) are compacted into the rollups. "
+        f"Runs in the background every {os.getenv('RAG_HISTORY_MAINTENANCE_INTERVAL', '3600')} s"
+    )
+    if st.button("🧹 Run history maintenance"):
+        try:
+            result = partitions.maintain()
+            st.success(
+                f"Partitioned {sum(p['rows'] for p in result['partitioned'])} event(s) "
+                f"into {len(result['partitioned'])} month(s); dropped {len(result['dropped'])} partition(s)"
+            )
+        except Exception as e:
+            st.error(f"History maintenance failed: {e}")
+    partitions.ensure_schema()
+    registry = partitions.all()
+    if registry:
+        st.table(registry)
+
+    http_stats = client_stats()
+    if http_stats:
+        st.subheader("🌐 HTTP Clients")
+        st.table([
+            {
+                "endpoint": stats["name"],
+                "url": stats["base_url"],
+                "circuit": stats["circuit"],
+                "requests": stats["requests"],
+                "retries": stats["retries"],
+                "errors": stats["errors"] + stats["timeouts"] + stats["server_errors"],
+                "rejected": stats["rejected"],
+                "avg_ms": round(stats["avg_latency_ms"], 1),
+                "max_ms": round(stats["max_latency_ms"], 1),
+            }
+            for stats in http_stats
+        ])
 
     st.divider()
 
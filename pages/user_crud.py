@@ -1,11 +1,12 @@
 import streamlit as st
-from epoch_explorer.database.db.connection import get_connection
+from epoch_explorer.database.models.connection_pool import get_pooled_connection
 from epoch_explorer.database.models.user import UserModel, _hash
 from epoch_explorer.database.models.companies import CompaniesModel
 from epoch_explorer.database.models.department import DepartmentModel
 from epoch_explorer.database.models.company_users import CompanyUserModel
 from epoch_explorer.database.models.user_role import UserRoleModel
 from epoch_explorer.database.models.department_user import DepartmentUserModel
+from pages.pagination import keyset_pager
 
 
 def show():
@@ -18,7 +19,7 @@ def show():
         st.error("⚠️ You must login first!")
         st.stop()
 
-    conn = get_connection()
+    conn = get_pooled_connection()
     user_model = UserModel(conn)
     company_model = CompaniesModel(conn)
     department_model = DepartmentModel(conn)
@@ -58,13 +59,9 @@ def show():
             st.stop()
         st.subheader("➕ Create New User")
 
-        companies = company_model.all()
-        departments = department_model.all()
-        roles = role_model.conn.execute("SELECT * FROM roles").fetchall()
-
-        company_map = {c["name"]: c["id"] for c in companies}
-        department_map = {d["name"]: d["id"] for d in departments}
-        role_map = {r["name"]: r["id"] for r in roles}
+        company_map = {c["name"]: c["id"] for c in company_model.iter_all()}
+        department_map = {d["name"]: d["id"] for d in department_model.iter_all()}
+        role_map = {r["name"]: r["id"] for r in role_model.iter_query("SELECT * FROM roles")}
 
         with st.form("create_user_form", clear_on_submit=True):
             name = st.text_input("👤 Full Name")
@@ -104,7 +101,7 @@ def show():
     # -------------------------------
     elif action == "View Users":
         st.subheader("📋 All Users")
-        users = user_model.user_full_profile()
+        users = keyset_pager("users", user_model.user_full_profile_page)
         if users:
             st.dataframe(users, use_container_width=True)
         else:
@@ -119,12 +116,11 @@ def show():
             st.stop()
         st.subheader("✏️ Update User Info & Assignments")
 
-        users = user_model.all()
-        if not users:
+        user_map = {u["email"]: u["id"] for u in user_model.iter_all()}
+        if not user_map:
             st.warning("No users to update.")
             st.stop()
 
-        user_map = {u["email"]: u["id"] for u in users}
         selected_email = st.selectbox("Select User", list(user_map.keys()))
         user_id = user_map[selected_email]
 
@@ -135,13 +131,9 @@ def show():
         user_departments = dept_user_model.for_user(user_id)
         user_roles = role_model.for_user(user_id)
 
-        companies = company_model.all()
-        departments = department_model.all()
-        roles = role_model.conn.execute("SELECT * FROM roles").fetchall()
-
-        company_map = {c["name"]: c["id"] for c in companies}
-        department_map = {d["name"]: d["id"] for d in departments}
-        role_map = {r["name"]: r["id"] for r in roles}
+        company_map = {c["name"]: c["id"] for c in company_model.iter_all()}
+        department_map = {d["name"]: d["id"] for d in department_model.iter_all()}
+        role_map = {r["name"]: r["id"] for r in role_model.iter_query("SELECT * FROM roles")}
 
         with st.form("update_user_form"):
             new_name = st.text_input("Name", value=user["name"])
@@ -198,13 +190,12 @@ def show():
             st.stop()
         st.subheader("🗑️ Delete User")
 
-        user_map = {u["email"]: u["id"] for u in user_model.all()}
+        user_map = {u["email"]: u["id"] for u in user_model.iter_all()}
         selected = st.selectbox("Select User", list(user_map.keys()))
         user_id = user_map[selected]
 
         if st.button("Delete User", type="primary"):
-            conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
-            conn.commit()
+            user_model.delete(user_id)
             st.session_state.success_msg = "🗑️ User deleted successfully!"
             st.rerun()
 